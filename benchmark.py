@@ -0,0 +1,621 @@
+"""
+性能基准测试脚本
+需要本地 MySQL 可用（与 server.py 相同的 config.py 配置）。
+
+使用方法:
+    python benchmark.py server --idle 2000 --clients 20 --requests 200
+    python benchmark.py codec --keyword "" --rounds 50
+    python benchmark.py codec --synthetic 5000     # 不连接数据库，使用生成的图书数据
+    python benchmark.py transport --requests 2000  # 对比本机 TCP 与 Unix 域套接字的 get_book 往返延迟
+    python benchmark.py db-read --clients 8 --requests 2000  # 对比读取前强制提交与自动提交连接的 get_book 吞吐
+    python benchmark.py borrow-stress --threads 32 --copies 5  # 多线程同时借同一本书，检查可借数量与借阅上限
+    python benchmark.py bulk-insert --rows 20000  # 对比逐行插入与分块多行插入的速度
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from codec import available_codecs, get_codec
+from network_client import NetworkClient
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def raise_fd_limit() -> None:
+    """尽量提高本进程可打开的文件描述符数量（仅 POSIX）"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0) -> bool:
+    """等待服务端开始监听"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def read_process_status(pid: int) -> Dict[str, str]:
+    """读取进程的内存占用与线程数（仅 Linux）"""
+    result = {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "Threads"):
+                    result[key] = value.strip()
+    except OSError:
+        pass
+    return result
+
+
+def open_idle_connections(host: str, port: int, count: int) -> List[socket.socket]:
+    """建立一批只连接不发请求的空闲连接，遇到失败即停止"""
+    sockets = []
+    for _ in range(count):
+        try:
+            sockets.append(socket.create_connection((host, port), timeout=5))
+        except OSError as e:
+            print(f"  第 {len(sockets) + 1} 个空闲连接建立失败: {e}")
+            break
+    return sockets
+
+
+def wait_for_path(path: str, timeout: float = 30.0) -> bool:
+    """等待服务端创建 Unix 域套接字文件"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def measure_latency(host: str, port: int, clients: int, requests: int,
+                    action: str, data: Optional[dict] = None,
+                    unix_socket: Optional[str] = None) -> Dict[str, float]:
+    """多个客户端并发发送请求，统计延迟分布与吞吐量；给出 unix_socket 时通过 Unix 域套接字连接"""
+    latencies: List[float] = []
+    errors = [0]
+    transports = set()
+    lock = threading.Lock()
+
+    def worker():
+        client = NetworkClient(host, port, unix_socket=unix_socket)
+        if not client.connect():
+            with lock:
+                errors[0] += requests
+            return
+        local = []
+        local_errors = 0
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = client.send_request(action, dict(data or {}))
+                local.append((time.perf_counter() - start) * 1000)
+                if not response.get('success'):
+                    local_errors += 1
+        finally:
+            client.disconnect()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            transports.add(client.transport)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies) if latencies else 0.0,
+        'transport': '/'.join(sorted(transports)) or '-',
+    }
+
+
+def bench_server_mode(mode: str, args: argparse.Namespace) -> Dict[str, object]:
+    """启动指定模式的服务端子进程并测量连接容量和延迟"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, "server.py"),
+         "--mode", mode, "--host", args.host, "--port", str(args.port)],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    idle: List[socket.socket] = []
+    try:
+        if not wait_for_port(args.host, args.port):
+            raise RuntimeError(f"{mode} 模式服务端未能启动")
+        before = read_process_status(proc.pid)
+        idle = open_idle_connections(args.host, args.port, args.idle)
+        time.sleep(1.0)
+        after = read_process_status(proc.pid)
+        latency = measure_latency(args.host, args.port, args.clients, args.requests, args.action)
+        return {
+            'mode': mode,
+            'idle_connections': len(idle),
+            'rss_before': before.get('VmRSS', '-'),
+            'rss_after': after.get('VmRSS', '-'),
+            'threads_after': after.get('Threads', '-'),
+            **latency,
+        }
+    finally:
+        for sock in idle:
+            sock.close()
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def cmd_server(args: argparse.Namespace) -> None:
+    """对比 threaded 与 asyncio 两种服务端模式"""
+    raise_fd_limit()
+    results = []
+    for mode in args.modes:
+        print(f"正在测试 {mode} 模式...")
+        results.append(bench_server_mode(mode, args))
+
+    print()
+    print(f"{'模式':<10}{'空闲连接':>10}{'RSS(前)':>14}{'RSS(后)':>14}{'线程数':>8}"
+          f"{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>6}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['idle_connections']:>10}{r['rss_before']:>14}{r['rss_after']:>14}"
+              f"{r['threads_after']:>8}{r['throughput']:>14.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['errors']:>6}")
+
+
+def cmd_transport(args: argparse.Namespace) -> None:
+    """同一个服务端同时监听 TCP 与 Unix 域套接字，对比两种传输方式下 get_book 的往返延迟"""
+    unix_socket = args.unix_socket or os.path.join(tempfile.gettempdir(), f"library-bench-{os.getpid()}.sock")
+    command = [sys.executable, os.path.join(BASE_DIR, "server.py"), "--mode", args.mode,
+               "--host", args.host, "--port", str(args.port), "--unix-socket", unix_socket]
+    if args.no_cache:
+        command.append("--no-cache")
+    proc = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        if not wait_for_port(args.host, args.port) or not wait_for_path(unix_socket):
+            raise RuntimeError("服务端未能启动或未创建 Unix 域套接字")
+        data = {'book_id': args.book_id}
+        for name, path in (("tcp", None), ("unix", unix_socket)):
+            print(f"正在测试 {name}...")
+            # 预热：建立连接池、填充响应缓存
+            measure_latency(args.host, args.port, 1, 50, "get_book", data, unix_socket=path)
+            results.append((name, measure_latency(args.host, args.port, args.clients, args.requests,
+                                                  "get_book", data, unix_socket=path)))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    print()
+    print(f"get_book(book_id={args.book_id})，{args.clients} 个客户端 x {args.requests} 个请求，{args.mode} 模式"
+          f"{'，关闭响应缓存' if args.no_cache else ''}")
+    print(f"{'传输':<8}{'实际连接':>10}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'错误':>6}")
+    for name, r in results:
+        print(f"{name:<8}{r['transport']:>10}{r['throughput']:>14.1f}{r['p50_ms']:>10.3f}"
+              f"{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}{r['errors']:>6}")
+
+
+def run_concurrently(func, clients: int, requests: int) -> Dict[str, float]:
+    """多个线程并发调用 func()，统计延迟分布与吞吐量；func 返回假值计为错误"""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        local_errors = 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            ok = func()
+            local.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def cmd_db_read(args: argparse.Namespace) -> None:
+    """直接调用数据库层，对比两种读取方式下 get_book 的吞吐、延迟与每次读取发给 MySQL 的语句数：
+    commit-before-read 为原来的做法（非自动提交连接，每次查询前先 COMMIT 以读到其他连接的更改），
+    autocommit 为现在的 BookModel.get_book（自动提交连接，一次往返）
+    """
+    from database import ConnectionPool, Database, _create_connection
+    from models import BookModel
+
+    db = Database()
+    model = BookModel(db)
+    legacy_pool = ConnectionPool(max_size=args.clients, factory=lambda: _create_connection(autocommit=False))
+
+    def legacy_get_book():
+        conn = legacy_pool.acquire()
+        try:
+            conn.commit()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM books WHERE id = %s", (args.book_id,))
+                return cursor.fetchone()
+        finally:
+            legacy_pool.release(conn)
+
+    def questions() -> int:
+        # 服务器收到的语句总数（含 COMMIT）；测试期间应没有其他客户端访问该 MySQL
+        rows = db.execute_query("SHOW GLOBAL STATUS LIKE 'Questions'")
+        return int(rows[0]['Value']) if rows else 0
+
+    variants = [
+        ("commit-before-read", legacy_get_book),
+        ("autocommit", lambda: model.get_book(args.book_id)),
+    ]
+    if not variants[1][1]():
+        print(f"图书 {args.book_id} 不存在，请用 --book-id 指定已有的图书")
+        return
+    results = []
+    for name, func in variants:
+        print(f"正在测试 {name}...")
+        run_concurrently(func, args.clients, 50)
+        before = questions()
+        result = run_concurrently(func, args.clients, args.requests)
+        # 减去读取 Questions 本身的一条语句
+        result['statements'] = (questions() - before - 1) / result['requests'] if result['requests'] else 0.0
+        results.append((name, result))
+    legacy_pool.close_all()
+
+    print()
+    print(f"get_book(book_id={args.book_id})，{args.clients} 个线程 x {args.requests} 次读取")
+    print(f"{'方式':<20}{'吞吐(次/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'语句/次':>10}{'错误':>6}")
+    for name, r in results:
+        print(f"{name:<20}{r['throughput']:>12.1f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['statements']:>10.2f}{r['errors']:>6}")
+
+
+def stress_borrow(model, user_ids: List[int], book_id: int, attempts: int,
+                  limit=None) -> Dict[str, object]:
+    """每个用户ID一个线程，同时开始，各自借阅同一本书 attempts 次，返回成功次数、失败原因与耗时"""
+    barrier = threading.Barrier(len(user_ids))
+    lock = threading.Lock()
+    outcome: Dict[str, object] = {'success': 0, 'reasons': {}}
+
+    def worker(user_id: int):
+        barrier.wait()
+        for _ in range(attempts):
+            ok, message = model.borrow_book(user_id, book_id, limit=limit)
+            with lock:
+                if ok:
+                    outcome['success'] += 1
+                else:
+                    reason = message.split('，')[0]
+                    outcome['reasons'][reason] = outcome['reasons'].get(reason, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    outcome['elapsed'] = time.perf_counter() - start
+    return outcome
+
+
+def cmd_borrow_stress(args: argparse.Namespace) -> None:
+    """并发借阅压力测试：
+    第一轮 threads 个会员各自反复借阅同一本只有 copies 本的书，成功次数应恰好等于 copies，
+    可借数量归零且状态为 unavailable，借阅记录数与成功次数一致；
+    第二轮 threads 个线程以同一个普通用户的身份借阅一本副本充足的书，成功次数应恰好等于普通用户的借阅上限。
+    测试数据在结束后删除（借阅记录随图书、用户级联删除）。
+    """
+    from database import Database
+    from models import BorrowModel, borrow_limit
+
+    db = Database()
+    model = BorrowModel(db)
+    tag = f"stress{int(time.time())}"
+    attempts = max(1, args.attempts)
+    threads = max(2, args.threads)
+    copies = max(1, args.copies)
+    user_ids: List[int] = []
+    book_ids: List[int] = []
+
+    def add_user(index: int, role: str) -> int:
+        user_id = db.execute_insert(
+            "INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)",
+            (f"{tag}_{index}", "-", role, f"压力测试{index}")
+        )
+        user_ids.append(user_id)
+        return user_id
+
+    def add_book(total: int) -> int:
+        book_id = db.execute_insert(
+            """INSERT INTO books (title, author, total_copies, available_copies, status)
+               VALUES (?, ?, ?, ?, 'available')""",
+            (f"{tag} 并发借阅", "benchmark", total, total)
+        )
+        book_ids.append(book_id)
+        return book_id
+
+    def book_state(book_id: int) -> Dict[str, object]:
+        rows = db.execute_query(
+            """SELECT b.available_copies, b.status,
+                      (SELECT COUNT(*) FROM borrow_records
+                       WHERE book_id = b.id AND status = 'borrowed') AS borrowed
+               FROM books b WHERE b.id = ?""",
+            (book_id,)
+        )
+        return rows[0] if rows else {}
+
+    def check(name: str, ok: bool, detail: str) -> bool:
+        print(f"  [{'通过' if ok else '失败'}] {name}: {detail}")
+        return ok
+
+    passed = True
+    try:
+        # 第一轮：多个用户抢同一本书的最后几本
+        members = [add_user(i, 'member') for i in range(threads)]
+        if not all(members):
+            print("创建测试用户失败")
+            return
+        book_id = add_book(copies)
+        if not book_id:
+            print("创建测试图书失败")
+            return
+        expected = min(copies, threads * min(attempts, borrow_limit('member')[0]))
+        print(f"第一轮：{threads} 个会员 x {attempts} 次借阅同一本书（{copies} 本）")
+        result = stress_borrow(model, members, book_id, attempts)
+        state = book_state(book_id)
+        print(f"  耗时 {result['elapsed'] * 1000:.1f} ms，失败原因 {result['reasons']}")
+        passed &= check("成功次数", result['success'] == expected, f"{result['success']}（应为 {expected}）")
+        passed &= check("可借数量", state.get('available_copies') == copies - expected,
+                        f"{state.get('available_copies')}（应为 {copies - expected}）")
+        passed &= check("借阅记录", state.get('borrowed') == result['success'],
+                        f"{state.get('borrowed')} 条未归还记录")
+        want_status = 'unavailable' if copies == expected else 'available'
+        passed &= check("图书状态", state.get('status') == want_status, f"{state.get('status')}（应为 {want_status}）")
+
+        # 第二轮：同一个普通用户的并发借阅不能超过借阅上限
+        user_limit = borrow_limit('user')[0]
+        single = add_user(threads, 'user')
+        book_id = add_book(threads * attempts)
+        print(f"第二轮：同一个普通用户 {threads} 个线程 x {attempts} 次借阅（上限 {user_limit} 本）")
+        result = stress_borrow(model, [single] * threads, book_id, attempts)
+        state = book_state(book_id)
+        print(f"  耗时 {result['elapsed'] * 1000:.1f} ms，失败原因 {result['reasons']}")
+        passed &= check("成功次数", result['success'] == user_limit, f"{result['success']}（应为 {user_limit}）")
+        passed &= check("可借数量", state.get('available_copies') == threads * attempts - user_limit,
+                        f"{state.get('available_copies')}（应为 {threads * attempts - user_limit}）")
+    finally:
+        for book_id in book_ids:
+            if book_id:
+                db.execute_update("DELETE FROM books WHERE id = ?", (book_id,))
+        for user_id in user_ids:
+            if user_id:
+                db.execute_update("DELETE FROM users WHERE id = ?", (user_id,))
+    print()
+    print("全部检查通过" if passed else "存在未通过的检查")
+    if not passed:
+        sys.exit(1)
+
+
+def cmd_bulk_insert(args: argparse.Namespace) -> None:
+    """对比逐行 execute_insert 与分块多行 bulk_insert 写入图书数据的速度（行/秒）
+    写入单独的 benchmark_books 表（结构同 books，测试结束后删除），不影响正式数据
+    """
+    from database import Database
+
+    db = Database()
+    rows = [
+        (b['title'], b['author'], f"bench-{i}", b['category'], b['publisher'], b['publish_date'],
+         b['total_copies'], b['available_copies'], b['status'])
+        for i, b in enumerate(synthetic_books(args.rows))
+    ]
+    columns = ('title', 'author', 'isbn', 'category', 'publisher', 'publish_date',
+               'total_copies', 'available_copies', 'status')
+    single_rows = rows[:min(len(rows), args.single_rows)]
+
+    def reset_table() -> None:
+        db.execute_update("DROP TABLE IF EXISTS benchmark_books")
+        db.execute_update("CREATE TABLE benchmark_books LIKE books")
+
+    results = []
+    try:
+        reset_table()
+        print(f"正在测试逐行插入（{len(single_rows)} 行）...")
+        query = f"INSERT INTO benchmark_books ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        start = time.perf_counter()
+        inserted = sum(1 for row in single_rows if db.execute_insert(query, row))
+        results.append(("execute_insert", inserted, time.perf_counter() - start, 0))
+
+        for chunk_size in args.chunk_sizes:
+            reset_table()
+            print(f"正在测试多行插入（{len(rows)} 行，每条语句 {chunk_size} 行）...")
+            start = time.perf_counter()
+            result = db.bulk_insert('benchmark_books', columns, rows, chunk_size)
+            results.append((f"bulk_insert/{chunk_size}", result.inserted, time.perf_counter() - start,
+                            len(result.failures)))
+    finally:
+        db.execute_update("DROP TABLE IF EXISTS benchmark_books")
+
+    print()
+    print(f"{'方式':<20}{'行数':>8}{'耗时(s)':>10}{'行/秒':>12}{'失败':>6}")
+    for name, inserted, elapsed, failures in results:
+        rate = inserted / elapsed if elapsed else 0.0
+        print(f"{name:<20}{inserted:>8}{elapsed:>10.3f}{rate:>12.0f}{failures:>6}")
+
+
+def synthetic_books(count: int) -> List[dict]:
+    """生成与 books 表字段一致的图书数据"""
+    categories = ['教育类', '科普类', '文学类', '历史类', '艺术类', '其他类']
+    created = datetime(2024, 1, 1, 8, 30)
+    return [
+        {
+            'id': i,
+            'title': f'图书标题 {i} - A Sample Book Title',
+            'author': f'作者 {i % 500}',
+            'isbn': f'978{i:010d}',
+            'category': categories[i % len(categories)],
+            'publisher': f'出版社 {i % 50}',
+            'publish_date': date(1990 + i % 30, 1 + i % 12, 1 + i % 28),
+            'total_copies': 3,
+            'available_copies': i % 4,
+            'status': 'available',
+            'created_at': created + timedelta(minutes=i),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def load_search_books(args: argparse.Namespace) -> List[dict]:
+    """取 search_books 的结果：默认直接查询数据库，--synthetic 时使用生成的数据"""
+    if args.synthetic:
+        return synthetic_books(args.synthetic)
+    from database import Database
+    from models import BookModel
+    return BookModel(Database()).search_books(args.keyword, args.category)
+
+
+def cmd_codec(args: argparse.Namespace) -> None:
+    """对比各编码处理 search_books 响应的编码/解码耗时与字节数"""
+    books = load_search_books(args)
+    response = {'success': True, 'data': books}
+    print(f"search_books 响应包含 {len(books)} 本图书，每项测试 {args.rounds} 轮")
+    print()
+    print(f"{'编码':<10}{'字节数':>12}{'编码(ms)':>12}{'解码(ms)':>12}{'合计(ms)':>12}")
+    for name in available_codecs():
+        # 服务端编码；客户端按默认方式解码（日期、Decimal 得到与 JSON 相同的表示）
+        codec = get_codec(name, native=False)
+        body = codec.encode(response)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            codec.encode(response)
+        encode_ms = (time.perf_counter() - start) * 1000 / args.rounds
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            codec.decode(body)
+        decode_ms = (time.perf_counter() - start) * 1000 / args.rounds
+        print(f"{name:<10}{len(body):>12}{encode_ms:>12.3f}{decode_ms:>12.3f}{encode_ms + decode_ms:>12.3f}")
+    if len(available_codecs()) == 1:
+        print("\n未安装 msgpack，仅测试了 JSON 编码（pip install msgpack）")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="图书管理系统性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    server_parser = subparsers.add_parser("server", help="对比服务端运行模式的连接容量与延迟")
+    server_parser.add_argument("--host", default="127.0.0.1", help="服务端地址，默认 127.0.0.1。")
+    server_parser.add_argument("--port", type=int, default=18888, help="测试用端口，默认 18888。")
+    server_parser.add_argument(
+        "--modes", nargs="+", choices=["threaded", "asyncio"],
+        default=["threaded", "asyncio"], help="需要测试的模式。",
+    )
+    server_parser.add_argument("--idle", type=int, default=2000, help="空闲连接数量，默认 2000。")
+    server_parser.add_argument("--clients", type=int, default=20, help="并发请求的客户端数，默认 20。")
+    server_parser.add_argument("--requests", type=int, default=200, help="每个客户端的请求数，默认 200。")
+    server_parser.add_argument("--action", default="get_categories", help="用于测延迟的操作，默认 get_categories。")
+    server_parser.set_defaults(func=cmd_server)
+
+    codec_parser = subparsers.add_parser("codec", help="对比 search_books 响应在各编码下的耗时与大小")
+    codec_parser.add_argument("--keyword", default="", help="search_books 的关键词，默认为空（全部图书）。")
+    codec_parser.add_argument("--category", default="", help="search_books 的分类，默认为空。")
+    codec_parser.add_argument("--synthetic", type=int, default=0,
+                              help="不查询数据库，改用生成的 N 本图书数据。")
+    codec_parser.add_argument("--rounds", type=int, default=50, help="每种编码重复的轮数，默认 50。")
+    codec_parser.set_defaults(func=cmd_codec)
+
+    transport_parser = subparsers.add_parser("transport", help="对比本机 TCP 与 Unix 域套接字的往返延迟")
+    transport_parser.add_argument("--host", default="127.0.0.1", help="服务端地址，默认 127.0.0.1。")
+    transport_parser.add_argument("--port", type=int, default=18888, help="测试用端口，默认 18888。")
+    transport_parser.add_argument("--unix-socket", default=None,
+                                  help="测试用的 Unix 域套接字路径，默认在临时目录下生成。")
+    transport_parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded",
+                                  help="服务端运行模式，默认 threaded。")
+    transport_parser.add_argument("--clients", type=int, default=1,
+                                  help="并发客户端数，默认 1（逐个请求测往返延迟）。")
+    transport_parser.add_argument("--requests", type=int, default=2000, help="每个客户端的请求数，默认 2000。")
+    transport_parser.add_argument("--book-id", type=int, default=1, help="get_book 查询的图书ID，默认 1。")
+    transport_parser.add_argument("--no-cache", action="store_true",
+                                  help="关闭服务端响应缓存（结果中会包含数据库查询时间）。")
+    transport_parser.set_defaults(func=cmd_transport)
+
+    db_read_parser = subparsers.add_parser("db-read", help="对比读取前强制提交与自动提交连接的 get_book 吞吐")
+    db_read_parser.add_argument("--clients", type=int, default=8, help="并发线程数，默认 8。")
+    db_read_parser.add_argument("--requests", type=int, default=2000, help="每个线程的读取次数，默认 2000。")
+    db_read_parser.add_argument("--book-id", type=int, default=1, help="读取的图书ID，默认 1。")
+    db_read_parser.set_defaults(func=cmd_db_read)
+
+    stress_parser = subparsers.add_parser("borrow-stress", help="多线程同时借阅同一本书，检查可借数量与借阅上限")
+    stress_parser.add_argument("--threads", type=int, default=32, help="并发线程数，默认 32。")
+    stress_parser.add_argument("--copies", type=int, default=5, help="第一轮图书的副本数，默认 5。")
+    stress_parser.add_argument("--attempts", type=int, default=3, help="每个线程的借阅次数，默认 3。")
+    stress_parser.set_defaults(func=cmd_borrow_stress)
+
+    bulk_parser = subparsers.add_parser("bulk-insert", help="对比逐行插入与分块多行插入的速度")
+    bulk_parser.add_argument("--rows", type=int, default=20000, help="多行插入的行数，默认 20000。")
+    bulk_parser.add_argument("--single-rows", type=int, default=2000,
+                             help="逐行插入的行数（较慢，只取前这么多行），默认 2000。")
+    bulk_parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 1000, 5000],
+                             help="多行插入每条语句的行数，可指定多个，默认 100 1000 5000。")
+    bulk_parser.set_defaults(func=cmd_bulk_insert)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """脚本入口"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
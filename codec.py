@@ -0,0 +1,135 @@
+"""
+消息编码模块
+服务端与客户端共用的请求/响应编码方式，连接建立时通过 hello 协商
+
+    json：默认编码，兼容所有客户端；日期转为 ISO 字符串，Decimal 转为浮点数
+    msgpack：紧凑的二进制编码（需要安装 msgpack），日期与 Decimal 使用扩展类型原样传输
+
+hello 握手本身始终使用 JSON，协商成功后该连接上的后续帧改用选定的编码。
+"""
+import json
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+
+# msgpack 扩展类型编号
+EXT_DATE = 1
+EXT_DATETIME = 2
+EXT_DECIMAL = 3
+
+_DATE = struct.Struct('>hBB')
+_DATETIME = struct.Struct('>hBBBBBI')
+
+
+def json_serialize(obj):
+    """自定义JSON序列化函数，处理datetime、date和Decimal对象"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, Decimal):
+        # 将Decimal转换为float，保留精度
+        return float(obj)
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+class JsonCodec:
+    """JSON 编码"""
+
+    name = CODEC_JSON
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=json_serialize, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data: bytes) -> Any:
+        """解码失败时抛出 ValueError"""
+        return json.loads(data.decode('utf-8'))
+
+
+class MsgpackCodec:
+    """msgpack 二进制编码
+
+    native=True 时日期、时间与 Decimal 解码为 Python 原生对象；
+    否则解码为与 JSON 编码相同的表示（ISO 字符串、浮点数），现有界面代码无需区分编码方式。
+    """
+
+    name = CODEC_MSGPACK
+
+    def __init__(self, native: bool = True):
+        self.native = native
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        """解码失败时抛出 ValueError"""
+        try:
+            return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f'msgpack 数据无效: {e}') from e
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, datetime):
+            if obj.tzinfo is not None:
+                # 带时区的时间不走定长格式，按 ISO 字符串传输
+                return obj.isoformat()
+            return msgpack.ExtType(EXT_DATETIME, _DATETIME.pack(
+                obj.year, obj.month, obj.day, obj.hour, obj.minute, obj.second, obj.microsecond
+            ))
+        if isinstance(obj, date):
+            return msgpack.ExtType(EXT_DATE, _DATE.pack(obj.year, obj.month, obj.day))
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(obj).encode('ascii'))
+        raise TypeError(f"Type {type(obj)} not serializable")
+
+    def _ext_hook(self, code: int, data: bytes):
+        if code == EXT_DATETIME:
+            value = datetime(*_DATETIME.unpack(data))
+            return value if self.native else value.isoformat()
+        if code == EXT_DATE:
+            value = date(*_DATE.unpack(data))
+            return value if self.native else value.isoformat()
+        if code == EXT_DECIMAL:
+            value = Decimal(data.decode('ascii'))
+            return value if self.native else float(value)
+        return msgpack.ExtType(code, data)
+
+
+JSON_CODEC = JsonCodec()
+
+
+def available_codecs() -> List[str]:
+    """本机可用的编码，按优先顺序排列"""
+    names = []
+    if msgpack is not None:
+        names.append(CODEC_MSGPACK)
+    names.append(CODEC_JSON)
+    return names
+
+
+def get_codec(name: Optional[str], native: bool = True):
+    """按名称取编码器，未知或不可用的编码返回 JSON"""
+    if name == CODEC_MSGPACK and msgpack is not None:
+        return MsgpackCodec(native=native)
+    return JSON_CODEC
+
+
+def choose_codec(offered: Any, supported: Optional[List[str]] = None) -> str:
+    """按对方给出的优先顺序选择第一个本机也支持的编码，都不支持时使用 JSON"""
+    supported = available_codecs() if supported is None else supported
+    if isinstance(offered, list):
+        for name in offered:
+            if name in supported:
+                return name
+    return CODEC_JSON
+
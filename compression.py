@@ -0,0 +1,135 @@
+"""
+帧压缩模块
+v2 连接在 hello 握手时协商压缩算法，之后超过阈值的帧压缩后发送，并在帧头标志中置 FLAG_COMPRESSED
+
+    zlib：标准库自带，始终可用
+    zstd：需要安装 zstandard，压缩率与速度都优于 zlib
+    lz4：需要安装 lz4，压缩最快，适合局域网
+
+decompress(data, max_size) 在解压出的数据超过 max_size 字节时停止并抛出 ValueError，
+不会先把整个结果解压到内存中，避免很小的压缩帧解压出巨大的数据（解压炸弹）。
+"""
+import zlib
+from typing import Any, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_LZ4 = 'lz4'
+
+
+def _too_large(max_size: int) -> ValueError:
+    return ValueError(f'解压后超过 {max_size} 字节')
+
+
+class ZlibCompressor:
+    """zlib 压缩，级别 1-9"""
+
+    name = COMPRESSION_ZLIB
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return zlib.compress(data, zlib.Z_DEFAULT_COMPRESSION if level is None else level)
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        """数据无效或解压后超过 max_size 字节时抛出 ValueError"""
+        try:
+            if max_size is None:
+                return zlib.decompress(data)
+            decompressor = zlib.decompressobj()
+            raw = decompressor.decompress(data, max_size + 1)
+        except zlib.error as e:
+            raise ValueError(f'zlib 数据无效: {e}') from e
+        if len(raw) > max_size:
+            raise _too_large(max_size)
+        if not decompressor.eof:
+            raise ValueError('zlib 数据无效: 数据不完整')
+        return raw
+
+
+class ZstdCompressor:
+    """zstd 压缩，级别 1-22（默认 3）"""
+
+    name = COMPRESSION_ZSTD
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        # 压缩器对象不是线程安全的，每次调用单独创建
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        """数据无效或解压后超过 max_size 字节时抛出 ValueError"""
+        try:
+            if max_size is None:
+                return zstandard.ZstdDecompressor().decompress(data)
+            # 帧头中写有原始长度时据此直接拒绝；未写时按 max_size 分配输出缓冲区，解压出的数据放不下即出错
+            content_size = zstandard.frame_content_size(data)
+            if content_size > max_size:
+                raise _too_large(max_size)
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+        except zstandard.ZstdError as e:
+            raise ValueError(f'zstd 数据无效: {e}') from e
+
+
+class Lz4Compressor:
+    """lz4 帧格式压缩，级别 0-16（默认 0）"""
+
+    name = COMPRESSION_LZ4
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return lz4_frame.compress(data, compression_level=0 if level is None else level)
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        """数据无效或解压后超过 max_size 字节时抛出 ValueError"""
+        try:
+            if max_size is None:
+                return lz4_frame.decompress(data)
+            decompressor = lz4_frame.LZ4FrameDecompressor()
+            raw = decompressor.decompress(data, max_length=max_size + 1)
+        except RuntimeError as e:
+            raise ValueError(f'lz4 数据无效: {e}') from e
+        if len(raw) > max_size:
+            raise _too_large(max_size)
+        if not decompressor.eof:
+            raise ValueError('lz4 数据无效: 数据不完整')
+        return raw
+
+
+def available_compressions() -> List[str]:
+    """本机可用的压缩算法，按优先顺序排列"""
+    names = []
+    if zstandard is not None:
+        names.append(COMPRESSION_ZSTD)
+    if lz4_frame is not None:
+        names.append(COMPRESSION_LZ4)
+    names.append(COMPRESSION_ZLIB)
+    return names
+
+
+def get_compressor(name: Optional[str]):
+    """按名称取压缩器，未知或不可用时返回 None"""
+    if name == COMPRESSION_ZLIB:
+        return ZlibCompressor()
+    if name == COMPRESSION_ZSTD and zstandard is not None:
+        return ZstdCompressor()
+    if name == COMPRESSION_LZ4 and lz4_frame is not None:
+        return Lz4Compressor()
+    return None
+
+
+def choose_compression(offered: Any, preferred: List[str]) -> Optional[str]:
+    """按本端的优先顺序选择第一个对方也支持的压缩算法，没有共同算法时返回 None"""
+    if not isinstance(offered, list):
+        return None
+    available = available_compressions()
+    for name in preferred:
+        if name in offered and name in available:
+            return name
+    return None
@@ -12,6 +12,56 @@ DB_CONFIG = {
     'charset': 'utf8mb4'      # 字符集
 }
 
+# 数据库连接池配置
+# 服务端每个工作线程从连接池借出独立的连接，用完后归还
+POOL_CONFIG = {
+    'max_size': 20,           # 连接池最大连接数
+    'min_size': 2,            # 启动时预先创建的连接数
+    'timeout': 5.0,           # 借出连接的最长等待时间（秒）
+    'ping_interval': 30.0,    # 空闲超过该秒数的连接在借出前先 ping 检查
+    'max_lifetime': 3600.0,   # 连接最长存活时间（秒），超过后关闭并重建
+}
+
+# 服务端配置
+SERVER_CONFIG = {
+    'host': '0.0.0.0',        # 监听地址
+    'port': 8888,             # 监听端口
+    'mode': 'threaded',       # 运行模式：threaded（selector + 工作线程池）或 asyncio（事件循环）
+    'processes': 1,           # 工作进程数，大于 1 时启用多进程模式（SO_REUSEPORT，见 prefork.py）
+    # 请求按操作分通道执行（见 scheduler.py），各通道线程数与后台任务线程数之和建议不超过连接池大小
+    'workers': 12,            # 交互通道（登录、借还书、查看图书等）的工作线程数
+    'queue_size': 256,        # 交互通道等待处理的请求队列上限，队列满时直接返回繁忙响应
+    'analytics_workers': 4,   # 统计分析通道（可视化数据、全表查询）的工作线程数，0 表示并入交互通道
+    'analytics_queue_size': 64,
+    'bulk_workers': 2,        # 批量通道（群发邮件、导入，以及含这类子请求的 batch）的工作线程数，0 表示并入交互通道
+    'bulk_queue_size': 32,
+    'busy_retry_ms': 200,     # 繁忙响应中建议客户端等待的毫秒数
+    'backlog': 128,           # listen 的等待连接队列长度
+    # 同时监听的 Unix 域套接字路径（如 '/tmp/library.sock'），None 表示只监听 TCP；
+    # 与服务端在同一台机器上的客户端（自助借阅终端、脚本）优先通过它连接，省去本机 TCP 回环的开销
+    'unix_socket': None,
+    # 帧压缩（仅 v2 连接，握手时协商）：允许的算法按优先顺序排列，空列表表示不压缩；
+    # zstd、lz4 需要额外安装对应的包，未安装时自动跳过
+    'compression': ['zstd', 'lz4', 'zlib'],
+    'compression_level': None,      # 压缩级别，None 表示使用算法的默认级别
+    'compression_threshold': 4096,  # 响应超过该字节数才压缩
+    'max_frame_size': 64 * 1024 * 1024,  # 压缩的请求帧解压后的最大字节数，超过时拒绝（防止解压炸弹）
+    'overdue_sweep_interval': 300,  # 检查新增逾期记录并推送提醒的间隔（秒），0 表示不检查
+    'response_cache': True,  # 是否缓存只读操作的响应（调试时可关闭）
+    'response_cache_size': 1024,  # 响应缓存最多保存的条目数
+    'coalesce_reads': True,  # 同时到达的相同只读请求只执行一次并共用响应（见 singleflight.py）
+    'job_workers': 2,  # 执行后台任务（如 Open Library 导入）的线程数
+    'resume_jobs': True,  # 启动时继续上次未完成的后台任务，False 时标记为中断
+    # 会话令牌（见 sessions.py）：login 返回令牌，之后的请求据此确定用户身份与权限
+    'require_session': True,  # 非公开操作必须带有效令牌；False 时未带令牌的请求仍按旧方式处理（兼容旧客户端）
+    'session_ttl': 8 * 3600,  # 令牌有效期（秒）
+    'session_cache_size': 10000,  # 内存中最多缓存的会话数
+    'session_secret': None,  # 令牌签名密钥，None 表示启动时随机生成（重启后需重新登录）
+    # 请求追踪（见 tracing.py）：总耗时（含排队）超过阈值的请求连同各阶段耗时与 SQL 写入慢请求日志
+    'slow_log_ms': 1000,  # 慢请求阈值（毫秒），None 表示不追踪
+    'slow_log_path': 'slow_requests.log',  # 慢请求日志文件（每行一个 JSON），None 表示只在 get_server_metrics 中查看最近的记录
+}
+
 # 可选：SMTP 配置（如果需要让服务器直接发送邮件）
 # 若不配置或留空，则仅在数据库中保存邮件记录，不会尝试通过 SMTP 发送。
 SMTP_CONFIG = {
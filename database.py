@@ -3,57 +3,330 @@
 负责数据库的初始化、连接和基本操作
 参考废案/app/database.py的实现模式
 """
+from collections import deque
 from contextlib import contextmanager
-from typing import Any, Generator, List, Dict, Tuple, Optional, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Deque, Generator, Iterator, List, Dict, Tuple, Optional, Sequence
 import hashlib
+import os
+import threading
+import time
 
 import pymysql
 from pymysql.connections import Connection
-from pymysql.cursors import DictCursor
-from pymysql.err import OperationalError, Error
+from pymysql.cursors import DictCursor, SSDictCursor
+from pymysql.err import OperationalError, InterfaceError, Error, IntegrityError, DataError
 
 from config import DB_CONFIG
+from tracing import span
+try:
+    from config import POOL_CONFIG
+except Exception:
+    POOL_CONFIG = {}
 
 
-# 全局连接对象
-_CONNECTION: Optional[Connection] = None
+class PoolTimeoutError(OperationalError):
+    """在等待时间内无法从连接池借出连接"""
 
 
-def _get_connection() -> Connection:
-    """获取全局 MySQL 连接，必要时自动创建数据库。"""
-    global _CONNECTION
-    if _CONNECTION is None or not _CONNECTION.open:
-        _CONNECTION = _create_connection()
-    return _CONNECTION
+# MySQL 语句执行时间超过 MAX_EXECUTION_TIME 被中断（ER_QUERY_TIMEOUT，MySQL 5.7.8+）
+ER_QUERY_TIMEOUT = 3024
 
 
-def _create_connection() -> Connection:
-    """创建MySQL连接，如果数据库不存在则自动创建"""
+class DeadlineExceeded(OperationalError):
+    """当前请求的截止时间已过，语句没有执行（错误码同 ER_QUERY_TIMEOUT）"""
+
+
+# 违反 CHECK 约束（MySQL 8.0.16+），与重复键、数据过长一样只与出错的那一行有关
+ER_CHECK_CONSTRAINT_VIOLATED = 3819
+# bulk_insert 默认每条 INSERT 语句包含的行数
+BULK_INSERT_CHUNK = 1000
+
+
+@dataclass
+class BulkInsertResult:
+    """bulk_insert 的结果"""
+
+    # 与输入行一一对应的自增ID，插入失败的行为 None
+    ids: List[Optional[int]] = field(default_factory=list)
+    # 插入失败的行：(行下标, 错误信息)
+    failures: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def inserted(self) -> int:
+        return sum(1 for row_id in self.ids if row_id is not None)
+
+    @property
+    def id_ranges(self) -> List[Tuple[int, int]]:
+        """插入成功的行的ID区间 [(首ID, 末ID)]，连续的ID合并为一个区间"""
+        ranges: List[Tuple[int, int]] = []
+        for row_id in self.ids:
+            if row_id is None:
+                continue
+            if ranges and row_id == ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], row_id)
+            else:
+                ranges.append((row_id, row_id))
+        return ranges
+
+
+class _Waiter:
+    """连接池中排队等待的线程"""
+
+    __slots__ = ('event', 'item', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.item = None
+        self.granted = False
+
+    def grant(self, item) -> None:
+        self.item = item
+        self.granted = True
+        self.event.set()
+
+
+class ConnectionPool:
+    """线程安全的有界 MySQL 连接池
+
+    每次借出的连接只属于一个调用方，归还后才会交给下一个线程。
+    借出前会对空闲较久的连接做 ping 检查，超过最长存活时间的连接会被关闭重建。
+    """
+
+    def __init__(self, max_size: int = 20, min_size: int = 0, timeout: float = 5.0,
+                 ping_interval: float = 30.0, max_lifetime: float = 3600.0,
+                 factory=None):
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.max_lifetime = max_lifetime
+        self._factory = factory or _create_connection
+        self._lock = threading.Lock()
+        # 空闲连接栈：(连接, 创建时间, 最近归还时间)，后进先出以便冷连接自然过期
+        self._idle: List[Tuple[Connection, float, float]] = []
+        # 已借出的连接：id(conn) -> 创建时间
+        self._in_use: Dict[int, float] = {}
+        # 排队等待连接的线程（先来先得）
+        self._waiters: Deque[_Waiter] = deque()
+        self._size = 0
+        self._closed = False
+        # 统计信息
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._broken = 0
+        self._peak_in_use = 0
+
+    def warm_up(self) -> None:
+        """预先创建 min_size 个连接"""
+        conns = []
+        try:
+            while len(conns) < self.min_size:
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+
+    def acquire(self, timeout: Optional[float] = None) -> Connection:
+        """借出一个连接，池满时按先来先得排队，最多等待 timeout 秒"""
+        wait = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waiter = None
+        item: Optional[Tuple[Connection, float, float]] = None
+        with self._lock:
+            if self._closed:
+                raise OperationalError(2013, "连接池已关闭")
+            if not self._waiters and self._idle:
+                item = self._idle.pop()
+            elif not self._waiters and self._size < self.max_size:
+                # 先占位，在锁外创建连接
+                self._size += 1
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            waiter.event.wait(wait)
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        2013, f"等待数据库连接超时（{wait:.1f} 秒，连接池上限 {self.max_size}）"
+                    )
+                self._waits += 1
+                self._wait_time += time.monotonic() - start
+            item = waiter.item
+
+        try:
+            if item is None:
+                conn, created_at = self._new_connection()
+            else:
+                conn, created_at = self._validate(*item)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._grant_slot_locked()
+            raise
+
+        with self._lock:
+            self._in_use[id(conn)] = created_at
+            self._checkouts += 1
+            self._peak_in_use = max(self._peak_in_use, len(self._in_use))
+        return conn
+
+    def release(self, conn: Connection, discard: bool = False) -> None:
+        """归还连接；discard=True 或连接已断开时直接关闭"""
+        keep = False
+        with self._lock:
+            created_at = self._in_use.pop(id(conn), None)
+            if created_at is None:
+                return
+            if discard or self._closed or not conn.open:
+                self._size -= 1
+                self._grant_slot_locked()
+            elif self._waiters:
+                # 直接交给排在最前面的等待者，避免新来的线程插队
+                waiter = self._waiters.popleft()
+                waiter.grant((conn, created_at, time.monotonic()))
+                keep = True
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+                keep = True
+        if not keep:
+            _close_quietly(conn)
+
+    def _grant_slot_locked(self) -> None:
+        """有空余名额时让最前面的等待者自行新建连接（需持有锁）"""
+        if self._waiters and self._size < self.max_size and not self._closed:
+            self._size += 1
+            self._waiters.popleft().grant(None)
+
+    @contextmanager
+    def connection(self) -> Generator[Connection, None, None]:
+        """上下文管理借出/归还连接，连接层异常时丢弃该连接"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self) -> None:
+        """关闭连接池中的全部空闲连接，已借出的连接在归还时关闭"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'avg_wait_ms': round(self._wait_time * 1000 / self._waits, 2) if self._waits else 0.0,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'broken': self._broken,
+            }
+
+    def _new_connection(self) -> Tuple[Connection, float]:
+        conn = self._factory()
+        with self._lock:
+            self._created += 1
+        return conn, time.monotonic()
+
+    def _validate(self, conn: Connection, created_at: float,
+                  last_used: float) -> Tuple[Connection, float]:
+        """检查空闲连接是否可用，必要时重建"""
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            _close_quietly(conn)
+            with self._lock:
+                self._recycled += 1
+            return self._new_connection()
+        if self.ping_interval is not None and now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                _close_quietly(conn)
+                with self._lock:
+                    self._broken += 1
+                return self._new_connection()
+        return conn, created_at
+
+
+def _close_quietly(conn: Connection) -> None:
     try:
-        return pymysql.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database'],
-            charset=DB_CONFIG['charset'],
-            autocommit=False,
-            cursorclass=DictCursor,
-        )
+        conn.close()
+    except Exception:
+        pass
+
+
+# 全局连接池
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """获取全局连接池，首次调用时按 POOL_CONFIG 创建"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(**POOL_CONFIG)
+    return _POOL
+
+
+def _reset_after_fork() -> None:
+    """fork 出的子进程丢弃从父进程继承的连接池
+    继承的 socket 与父进程共用同一条 MySQL 会话，只能丢弃引用而不能关闭（关闭会断开父进程的会话）；
+    子进程首次访问数据库时按 POOL_CONFIG 重新建池
+    """
+    global _POOL, _POOL_LOCK, _LOCAL
+    _POOL = None
+    _POOL_LOCK = threading.Lock()
+    _LOCAL = threading.local()
+
+
+def _create_connection(autocommit: bool = True) -> Connection:
+    """创建MySQL连接，如果数据库不存在则自动创建
+    连接默认处于自动提交模式：单条语句各自成为一个事务并立即提交，
+    读语句总能看到其他连接已提交的更改，不必在每次读取前提交；多条语句需要原子执行时使用 Database.transaction()
+    """
+    options = dict(
+        host=DB_CONFIG['host'],
+        port=DB_CONFIG['port'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        database=DB_CONFIG['database'],
+        charset=DB_CONFIG['charset'],
+        autocommit=autocommit,
+        cursorclass=DictCursor,
+    )
+    try:
+        return pymysql.connect(**options)
     except OperationalError as exc:
         # 1049: Unknown database
         if exc.args and exc.args[0] == 1049:
             _ensure_database_exists()
-            return pymysql.connect(
-                host=DB_CONFIG['host'],
-                port=DB_CONFIG['port'],
-                user=DB_CONFIG['user'],
-                password=DB_CONFIG['password'],
-                database=DB_CONFIG['database'],
-                charset=DB_CONFIG['charset'],
-                autocommit=False,
-                cursorclass=DictCursor,
-            )
+            return pymysql.connect(**options)
         raise
 
 
@@ -78,20 +351,107 @@ def _ensure_database_exists() -> None:
         connection.close()
 
 
+# 线程本地状态：transaction() 期间固定使用的连接、Database.deadline() 设置的截止时间
+_LOCAL = threading.local()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _pinned_connection() -> Optional[Connection]:
+    """当前线程处于 transaction() 中时返回固定的连接"""
+    return getattr(_LOCAL, 'conn', None)
+
+
+def _mark_transaction_failed(exc: Exception) -> None:
+    """记录事务中被吞掉的数据库错误，事务结束时据此整体回滚"""
+    if _pinned_connection() is not None and getattr(_LOCAL, 'error', None) is None:
+        _LOCAL.error = exc
+
+
+def _remaining_seconds() -> Optional[float]:
+    """距当前线程截止时间的剩余秒数，没有截止时间时返回 None"""
+    deadline = getattr(_LOCAL, 'deadline', None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _check_deadline(what: str) -> None:
+    """截止时间已过时抛出 DeadlineExceeded"""
+    remaining = _remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        _LOCAL.deadline_hit = True
+        raise DeadlineExceeded(ER_QUERY_TIMEOUT, f"请求已超过截止时间，{what}未执行")
+
+
+def _note_deadline(exc: Exception) -> None:
+    """记录因截止时间被拒绝或被 MySQL 中断的语句，见 Database.deadline_exceeded()"""
+    if exc.args and exc.args[0] == ER_QUERY_TIMEOUT:
+        _LOCAL.deadline_hit = True
+
+
+def _acquire(pool: ConnectionPool) -> Connection:
+    """借出连接；剩余时间比连接池的等待上限短时最多只等到截止时间"""
+    remaining = _remaining_seconds()
+    if remaining is None or remaining >= pool.timeout:
+        return pool.acquire()
+    _check_deadline('语句')
+    try:
+        return pool.acquire(timeout=remaining)
+    except PoolTimeoutError:
+        _LOCAL.deadline_hit = True
+        raise DeadlineExceeded(ER_QUERY_TIMEOUT, "等待数据库连接时超过请求截止时间")
+
+
+def _limit_execution_time(query: str) -> str:
+    """当前线程有截止时间时，给 SELECT 语句加上 MAX_EXECUTION_TIME 优化器提示（剩余毫秒数），
+    超时的查询由 MySQL 中断并释放连接（截止时间已过的语句在 _get_cursor 中拒绝）
+    """
+    remaining = _remaining_seconds()
+    if remaining is None or remaining <= 0:
+        return query
+    stripped = query.lstrip()
+    if stripped[:6].upper() != 'SELECT':
+        return query
+    return f"SELECT /*+ MAX_EXECUTION_TIME({max(1, int(remaining * 1000))}) */{stripped[6:]}"
+
+
+def _is_row_error(exc: Error) -> bool:
+    """只与出错的那一行有关的错误（重复键、外键不存在、数据过长、违反 CHECK 约束等），其余行可以照常插入"""
+    if isinstance(exc, (IntegrityError, DataError)):
+        return True
+    return bool(exc.args) and exc.args[0] == ER_CHECK_CONSTRAINT_VIOLATED
+
+
 @contextmanager
-def _get_cursor(commit: bool = True) -> Generator[DictCursor, None, None]:
-    """上下文管理 MySQL cursor，对异常自动回滚。"""
-    conn = _get_connection()
+def _get_cursor() -> Generator[DictCursor, None, None]:
+    """从连接池借出连接并上下文管理 cursor。
+    连接处于自动提交模式，每条语句执行完即提交，读写都只需一次往返，也不会有残留的未提交事务。
+    当前线程处于 transaction() 中时直接使用事务连接，提交/回滚由事务统一处理。
+    """
+    pinned = _pinned_connection()
+    if pinned is not None:
+        _check_deadline('语句')
+        cursor = pinned.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        return
+
+    pool = _get_pool()
+    with span('db.acquire'):
+        conn = _acquire(pool)
+    discard = False
     cursor = conn.cursor()
     try:
         yield cursor
-        if commit:
-            conn.commit()
-    except Exception:
-        conn.rollback()
+    except (OperationalError, InterfaceError) as e:
+        # 连接层错误，连接可能已不可用，不再放回连接池；语句超时被中断的连接仍然可用
+        discard = not (e.args and e.args[0] == ER_QUERY_TIMEOUT)
         raise
     finally:
         cursor.close()
+        pool.release(conn, discard=discard)
 
 
 class Database:
@@ -99,16 +459,108 @@ class Database:
     
     def __init__(self):
         """初始化数据库连接和表结构"""
-        # 确保数据库存在
+        # 确保数据库存在，并预热连接池
         try:
-            _get_connection()
+            _get_pool().warm_up()
         except Exception:
             pass
         self.init_database()
     
     def get_connection(self) -> Connection:
-        """获取数据库连接（兼容旧接口）"""
-        return _get_connection()
+        """从连接池借出一个连接（兼容旧接口），用完后需调用 release_connection 归还
+        连接处于自动提交模式，多条语句需要原子执行时先调用 conn.begin()，或改用 transaction()
+        """
+        return _get_pool().acquire()
+    
+    def release_connection(self, conn: Connection) -> None:
+        """归还 get_connection 借出的连接"""
+        _get_pool().release(conn)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return _get_pool().stats()
+    
+    @contextmanager
+    def transaction(self) -> Generator[Connection, None, None]:
+        """在同一个连接上执行多条语句，正常结束时一次提交，出错时整体回滚
+        
+        事务期间当前线程调用的 execute_query/execute_update/execute_insert 都使用这个连接；
+        这些方法内部吞掉的数据库错误也会在事务结束时重新抛出。嵌套调用时并入外层事务。
+        通过 on_commit 登记的回调在提交成功后执行，回滚时丢弃。
+        """
+        if _pinned_connection() is not None:
+            yield _pinned_connection()
+            return
+        
+        pool = _get_pool()
+        conn = _acquire(pool)
+        discard = False
+        _LOCAL.conn = conn
+        _LOCAL.error = None
+        _LOCAL.after_commit = []
+        callbacks = []
+        try:
+            # 连接平时自动提交，显式开启事务后直到 commit/rollback 的语句才作为一个整体
+            conn.begin()
+            yield conn
+            error = _LOCAL.error
+            if error is not None:
+                raise error
+            conn.commit()
+            callbacks = _LOCAL.after_commit
+        except (OperationalError, InterfaceError) as e:
+            discard = not (e.args and e.args[0] == ER_QUERY_TIMEOUT)
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _LOCAL.conn = None
+            _LOCAL.error = None
+            _LOCAL.after_commit = []
+            pool.release(conn, discard=discard)
+        for callback in callbacks:
+            callback()
+    
+    @contextmanager
+    def deadline(self, deadline: Optional[float]) -> Generator[None, None, None]:
+        """为当前线程设置截止时间（time.monotonic() 的值），期间：
+        execute_query 的 SELECT 带上剩余时间作为 MAX_EXECUTION_TIME，由 MySQL 中断超时的查询；
+        等待连接池最多等到截止时间；截止时间过后不再执行新的语句。
+        被拒绝或中断的语句按其他数据库错误处理（execute_query 返回空列表等），可用 deadline_exceeded() 区分。
+        嵌套调用时取较早的截止时间，deadline 为 None 时沿用外层的截止时间。
+        """
+        previous = getattr(_LOCAL, 'deadline', None)
+        previous_hit = getattr(_LOCAL, 'deadline_hit', False)
+        if previous is not None:
+            deadline = previous if deadline is None else min(deadline, previous)
+        _LOCAL.deadline = deadline
+        _LOCAL.deadline_hit = False
+        try:
+            yield
+        finally:
+            hit = _LOCAL.deadline_hit
+            _LOCAL.deadline = previous
+            _LOCAL.deadline_hit = previous is not None and (previous_hit or hit)
+    
+    def deadline_exceeded(self) -> bool:
+        """当前线程在 deadline() 期间是否有语句因截止时间被拒绝或被 MySQL 中断"""
+        return getattr(_LOCAL, 'deadline_hit', False)
+    
+    def in_transaction(self) -> bool:
+        """当前线程是否处于 transaction() 中"""
+        return _pinned_connection() is not None
+    
+    def on_commit(self, callback) -> None:
+        """在当前事务提交后执行回调（如推送变更事件）；不在事务中时立即执行"""
+        if _pinned_connection() is None:
+            callback()
+        else:
+            _LOCAL.after_commit.append(callback)
     
     def init_database(self):
         """初始化数据库表结构"""
@@ -196,6 +648,38 @@ class Database:
                     CHECK (status IN ('draft', 'sent'))
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
+            
+            # 创建后台任务表（如 Open Library 导入），保存进度与断点以便服务端重启后继续
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    job_type VARCHAR(50) NOT NULL,
+                    params TEXT,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    total INT NOT NULL DEFAULT 0,
+                    done INT NOT NULL DEFAULT 0,
+                    skipped INT NOT NULL DEFAULT 0,
+                    checkpoint TEXT,
+                    cancel_requested TINYINT(1) NOT NULL DEFAULT 0,
+                    message VARCHAR(500),
+                    created_by INT,
+                    owner VARCHAR(100) NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP NULL DEFAULT NULL,
+                    updated_at TIMESTAMP NULL DEFAULT NULL,
+                    finished_at TIMESTAMP NULL DEFAULT NULL,
+                    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL,
+                    INDEX idx_status (status),
+                    CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled', 'interrupted'))
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            
+            # 旧版本的 jobs 表没有 owner 字段（执行任务的进程，见 jobs.py）
+            try:
+                cursor.execute("ALTER TABLE jobs ADD COLUMN owner VARCHAR(100) NULL AFTER created_by")
+            except Exception:
+                # 字段已存在时忽略错误
+                pass
         
         # 初始化默认管理员账户
         self.init_default_admin()
@@ -222,16 +706,16 @@ class Database:
         """执行查询并返回结果列表"""
         query = self._convert_placeholders(query)
         
-        conn = _get_connection()
-        # 提交当前事务，确保能看到其他进程已提交的更改
-        conn.commit()
-        
         try:
-            with _get_cursor(commit=False) as cursor:
+            query = _limit_execution_time(query)
+            with span('sql', sql=query) as current, _get_cursor() as cursor:
                 cursor.execute(query, params or ())
                 rows = cursor.fetchall()
+                current.set(rows=len(rows) if rows else 0)
                 return list(rows) if rows else []
         except Error as e:
+            _note_deadline(e)
+            _mark_transaction_failed(e)
             print(f"查询执行失败: {e}")
             print(f"SQL: {query}")
             print(f"参数: {params}")
@@ -242,10 +726,13 @@ class Database:
         query = self._convert_placeholders(query)
         
         try:
-            with _get_cursor() as cursor:
+            with span('sql', sql=query) as current, _get_cursor() as cursor:
                 cursor.execute(query, params or ())
+                current.set(rows=cursor.rowcount)
                 return cursor.rowcount
         except Error as e:
+            _note_deadline(e)
+            _mark_transaction_failed(e)
             print(f"更新执行失败: {e}")
             print(f"SQL: {query}")
             print(f"参数: {params}")
@@ -256,12 +743,152 @@ class Database:
         query = self._convert_placeholders(query)
         
         try:
-            with _get_cursor() as cursor:
+            with span('sql', sql=query), _get_cursor() as cursor:
                 cursor.execute(query, params or ())
                 return cursor.lastrowid
         except Error as e:
+            _note_deadline(e)
+            _mark_transaction_failed(e)
             print(f"插入执行失败: {e}")
             print(f"SQL: {query}")
             print(f"参数: {params}")
             return 0
+    
+    def execute_many(self, query: str, params_seq: Sequence[Tuple]) -> int:
+        """用同一条语句执行多组参数，返回影响的总行数
+        INSERT ... VALUES 语句由 pymysql 合并为多行插入（每条语句约 1MB 以内），其他语句在同一个连接上依次执行；
+        不在 transaction() 中时各条语句分别提交。出错时与 execute_update 相同：打印信息并返回 0
+        """
+        query = self._convert_placeholders(query)
+        params_seq = list(params_seq)
+        if not params_seq:
+            return 0
+        
+        try:
+            with span('sql', sql=query, batch=len(params_seq)) as current, _get_cursor() as cursor:
+                cursor.executemany(query, params_seq)
+                current.set(rows=cursor.rowcount)
+                return cursor.rowcount
+        except Error as e:
+            _note_deadline(e)
+            _mark_transaction_failed(e)
+            print(f"批量执行失败: {e}")
+            print(f"SQL: {query}")
+            print(f"参数: {len(params_seq)} 组")
+            return 0
+    
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                    chunk_size: int = BULK_INSERT_CHUNK) -> BulkInsertResult:
+        """分块多行插入：每 chunk_size 行一条 INSERT 语句（一次往返），返回每行的自增ID与插入失败的行
+        table、columns 直接拼入 SQL，只能传入代码中的固定名称。
+        同一条多行 INSERT 分配的自增ID是连续的（要求 auto_increment_increment = 1），每行的ID由第一行的ID推出。
+        某一块因个别行出错（重复键、数据过长等）失败时，逐行重新插入这一块，出错的行记入 failures，其余行照常插入；
+        连接断开、超过截止时间等其他错误时停止，剩余的行全部记为失败，事务中调用时整个事务回滚。
+        不在 transaction() 中时每块分别提交。
+        """
+        rows = list(rows)
+        result = BulkInsertResult(ids=[None] * len(rows))
+        head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        chunk_size = max(1, chunk_size)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                first_id = self._insert_rows(head, placeholders, chunk)
+            except Error as e:
+                error = None if _is_row_error(e) else e
+                # 逐行重新插入，找出出错的行
+                offset = 0
+                while error is None and offset < len(chunk):
+                    try:
+                        result.ids[start + offset] = self._insert_rows(head, placeholders, chunk[offset:offset + 1])
+                    except Error as row_error:
+                        if not _is_row_error(row_error):
+                            error = row_error
+                            break
+                        result.failures.append((start + offset, str(row_error)))
+                    offset += 1
+                if error is not None:
+                    _note_deadline(error)
+                    _mark_transaction_failed(error)
+                    print(f"批量插入失败: {error}")
+                    print(f"SQL: {head}{placeholders}")
+                    result.failures.extend((index, str(error)) for index in range(start + offset, len(rows)))
+                    break
+            else:
+                for offset in range(len(chunk)):
+                    result.ids[start + offset] = first_id + offset
+        return result
+    
+    def _insert_rows(self, head: str, placeholders: str, chunk: Sequence[Sequence[Any]]) -> int:
+        """执行一条多行 INSERT，返回第一行的自增ID；出错时抛出异常"""
+        query = head + ', '.join([placeholders] * len(chunk))
+        params = [value for row in chunk for value in row]
+        with span('sql', sql=head + placeholders, rows=len(chunk)), _get_cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.lastrowid
+    
+    def estimate_row_count(self, table: str) -> int:
+        """读取表的估计行数（InnoDB 的统计值，不扫描表，可能与实际行数有较大偏差）"""
+        rows = self.execute_query(
+            """SELECT TABLE_ROWS AS estimate FROM information_schema.TABLES
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ?""",
+            (table,)
+        )
+        return int(rows[0]['estimate'] or 0) if rows else 0
+    
+    def stream_query(self, query: str, params: Tuple = (), batch_size: int = 500,
+                     apply_deadline: bool = False) -> Iterator[List[Dict]]:
+        """用服务端游标逐批读取查询结果，每次产出最多 batch_size 行（每次从 MySQL 读取的行数）
+        结果集不会整体载入内存，适合整表导出、统计等大查询；逐行处理时用 stream_rows。
+        游标在迭代期间独占一个连接，因此不加入当前线程的 transaction()；
+        中途不再需要时应关闭生成器，连接会被直接丢弃而不是读完剩余的行。
+        与 execute_query 不同，出错时打印信息后抛出异常，避免调用方把残缺的结果当作完整结果。
+        apply_deadline=True 时与 execute_query 一样给 SELECT 加上剩余时间的 MAX_EXECUTION_TIME，
+        用于在处理请求期间就地读完的查询（如统计）；结果逐批发给客户端时读取速度取决于客户端，不应加上。
+        """
+        query = self._convert_placeholders(query)
+        if apply_deadline:
+            query = _limit_execution_time(query)
+        pool = _get_pool()
+        # 借出连接前检查截止时间；MAX_EXECUTION_TIME 只在 apply_deadline=True 时加上
+        conn = _acquire(pool)
+        discard = False
+        cursor = conn.cursor(SSDictCursor)
+        try:
+            # 只记录执行语句的时间，逐批读取的时间取决于调用方
+            with span('sql', sql=query, streaming=True):
+                cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows if isinstance(rows, list) else list(rows)
+        except GeneratorExit:
+            # 调用方提前停止：未读完的结果仍在连接上，直接丢弃连接
+            discard = True
+            raise
+        except Error as e:
+            discard = True
+            _note_deadline(e)
+            print(f"流式查询执行失败: {e}")
+            print(f"SQL: {query}")
+            print(f"参数: {params}")
+            raise
+        finally:
+            if not discard:
+                cursor.close()
+            pool.release(conn, discard=discard)
+    
+    def stream_rows(self, query: str, params: Tuple = (), fetch_size: int = 500,
+                    apply_deadline: bool = False) -> Iterator[Dict]:
+        """逐行产出查询结果：stream_query 的逐行版本，每次从 MySQL 读取 fetch_size 行
+        内存占用与结果集大小无关；提前停止、出错与 apply_deadline 的处理同 stream_query
+        """
+        batches = self.stream_query(query, params, fetch_size, apply_deadline)
+        try:
+            for batch in batches:
+                yield from batch
+        finally:
+            batches.close()
 
@@ -0,0 +1,127 @@
+"""
+变更事件推送模块
+客户端通过 subscribe 操作订阅事件主题，写操作提交后服务端把小的变更事件推送给订阅的连接，
+客户端据此只更新受影响的行，而不必定时重新拉取整张列表。
+
+推送帧使用请求ID 0 并带 FLAG_PUSH 标志，数据为 {'topic': 主题, 'event': 事件名, 'data': {...}}。
+"""
+import queue
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from protocol import FLAG_PUSH
+
+# 事件主题
+TOPIC_BOOKS = 'books'        # 图书库存/状态变化，推送给所有订阅者
+TOPIC_EMAILS = 'emails'      # 新邮件，只推送给收件人（以及不限用户的订阅者，如管理员）
+TOPIC_BORROWS = 'borrows'    # 借阅逾期，只推送给借阅人（以及不限用户的订阅者）
+TOPICS = (TOPIC_BOOKS, TOPIC_EMAILS, TOPIC_BORROWS)
+
+# 事件名
+EVENT_BOOK_CHANGED = 'book_changed'
+EVENT_EMAIL_RECEIVED = 'email_received'
+EVENT_BORROW_OVERDUE = 'borrow_overdue'
+
+
+class _Subscription:
+    """一条连接的订阅信息"""
+
+    __slots__ = ('conn', 'topics', 'user_id')
+
+    def __init__(self, conn, topics: frozenset, user_id: Optional[int]):
+        self.conn = conn
+        self.topics = topics
+        self.user_id = user_id
+
+    def wants(self, topic: str, user_id: Optional[int]) -> bool:
+        if topic not in self.topics:
+            return False
+        return user_id is None or self.user_id is None or self.user_id == user_id
+
+
+class EventHub:
+    """订阅表 + 后台推送线程
+
+    publish 只把事件放入有界队列，不会阻塞写操作；推送线程按各连接协商的编码发送，
+    队列满时丢弃事件并计数（客户端仍可通过手动刷新得到最新数据）。
+    """
+
+    def __init__(self, queue_size: int = 1024):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[Any, _Subscription] = {}
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._published = 0
+        self._delivered = 0
+        self._dropped = 0
+
+    def start(self) -> None:
+        """启动推送线程"""
+        self._thread = threading.Thread(target=self._push_loop, name='event-push', daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        """通知推送线程退出"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def subscribe(self, conn, topics: Iterable[str], user_id: Optional[int] = None) -> List[str]:
+        """登记（或替换）连接的订阅，返回实际订阅的主题"""
+        accepted = frozenset(topic for topic in topics if topic in TOPICS)
+        with self._lock:
+            if accepted:
+                self._subscriptions[conn] = _Subscription(conn, accepted, user_id)
+            else:
+                self._subscriptions.pop(conn, None)
+        return sorted(accepted)
+
+    def unsubscribe(self, conn) -> None:
+        """连接断开时移除其订阅"""
+        with self._lock:
+            self._subscriptions.pop(conn, None)
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any], user_id: Optional[int] = None) -> None:
+        """发布事件；user_id 不为空时只推送给该用户（及不限用户的订阅者）"""
+        try:
+            self._queue.put_nowait((topic, event, data, user_id))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return
+        with self._lock:
+            self._published += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'subscriptions': len(self._subscriptions),
+                'published': self._published,
+                'delivered': self._delivered,
+                'dropped': self._dropped,
+                'queue_depth': self._queue.qsize(),
+            }
+
+    def _push_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            topic, event, data, user_id = item
+            with self._lock:
+                targets = [sub.conn for sub in self._subscriptions.values() if sub.wants(topic, user_id)]
+            message = {'topic': topic, 'event': event, 'data': data}
+            # 同一事件按编码只编码一次
+            encoded: Dict[str, bytes] = {}
+            delivered = 0
+            for conn in targets:
+                body = encoded.get(conn.codec.name)
+                if body is None:
+                    body = encoded[conn.codec.name] = conn.codec.encode(message)
+                if conn.send_frame(body, 0, FLAG_PUSH):
+                    delivered += 1
+                else:
+                    self.unsubscribe(conn)
+            with self._lock:
+                self._delivered += delivered
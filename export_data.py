@@ -0,0 +1,78 @@
+"""
+导出数据脚本
+把图书、借阅记录或用户逐批从数据库读出并写入 CSV 文件，
+使用服务端游标（Database.stream_query），内存占用与表的大小无关。
+
+使用方法:
+    python export_data.py books --output books.csv
+    python export_data.py borrows --status borrowed --output borrows.csv
+    python export_data.py users --output users.csv --fetch-size 2000
+"""
+import argparse
+import csv
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+from database import Database
+from models import BookModel, BorrowModel, UserModel
+
+
+def iter_batches(db: Database, args: argparse.Namespace) -> Iterator[List[Dict]]:
+    """按导出对象返回逐批产出记录的迭代器"""
+    if args.target == 'books':
+        return BookModel(db).iter_search_books(batch_size=args.fetch_size)
+    if args.target == 'borrows':
+        return BorrowModel(db).iter_all_borrows(args.status, batch_size=args.fetch_size)
+    return UserModel(db).iter_all_users(batch_size=args.fetch_size)
+
+
+def export(db: Database, args: argparse.Namespace) -> int:
+    """写入 CSV（首行为字段名），返回导出的行数"""
+    count = 0
+    start = time.perf_counter()
+    output = open(args.output, 'w', newline='', encoding='utf-8-sig') if args.output != '-' else sys.stdout
+    try:
+        writer = None
+        for batch in iter_batches(db, args):
+            if writer is None:
+                writer = csv.DictWriter(output, fieldnames=list(batch[0].keys()), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerows(batch)
+            count += len(batch)
+            if args.output != '-' and count % (args.fetch_size * 20) < len(batch):
+                print(f"  已导出 {count} 行...")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if args.output != '-':
+        print(f"导出完成：{count} 行，耗时 {time.perf_counter() - start:.1f} 秒，文件 {args.output}")
+    return count
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="把图书、借阅记录或用户导出为 CSV 文件。")
+    parser.add_argument("target", choices=["books", "borrows", "users"], help="导出对象。")
+    parser.add_argument("--output", "-o", default=None, help="输出文件，默认为 <导出对象>.csv，'-' 表示标准输出。")
+    parser.add_argument("--status", default=None, help="只导出该状态的借阅记录（borrowed/returned/overdue）。")
+    parser.add_argument("--fetch-size", type=int, default=1000, help="每次从数据库读取的行数，默认 1000。")
+    args = parser.parse_args(argv)
+    args.output = args.output or f"{args.target}.csv"
+    args.fetch_size = max(1, args.fetch_size)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """脚本入口"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    db = Database()
+    try:
+        export(db, args)
+    except Exception as e:
+        print(f"导出失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
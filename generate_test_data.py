@@ -5,7 +5,7 @@
 import random
 from datetime import datetime, timedelta
 from database import Database
-from models import UserModel, BookModel, BorrowModel
+from models import BookModel, borrow_limit
 import hashlib
 
 # 预设数据池
@@ -82,178 +82,159 @@ def generate_chinese_name() -> str:
     return surname + given_name
 
 def generate_users(db: Database, count: int = 20):
-    """生成用户数据"""
+    """生成用户数据（一次查询排除已存在的用户名，多行插入）"""
     print(f"正在生成 {count} 个用户...")
-    user_model = UserModel(db)
     
     roles = ['user', 'member', 'user', 'member', 'user']  # 增加普通用户和会员的比例
-    generated_users = []
+    password_hash = hash_password("123456")  # 统一密码方便测试
+    candidates = []
     
     for i in range(count):
         name = generate_chinese_name().strip()  # 确保名字没有首尾空格
-        username = generate_username(name, i + 1).strip()  # 确保用户名没有首尾空格
-        password = "123456"  # 统一密码方便测试
-        role = random.choice(roles)
-        email = generate_email(name, i + 1).strip()  # 去除首尾空格
-        phone = generate_phone().strip()  # 去除首尾空格
-        age = random.randint(16, 65)
-        
-        # 确保 role 值正确
-        if role not in ['admin', 'member', 'user']:
-            role = 'user'  # 默认值
-        
-        try:
-            # 先检查用户名是否已存在
-            existing = db.execute_query(
-                "SELECT id FROM users WHERE username = %s",
-                (username,)
-            )
-            if existing:
-                print(f"  ✗ 创建用户失败 {username}: 用户名已存在")
-                continue
-            
-            # 使用 admin_add_user 方法，它有更好的错误处理
-            success, error_msg = user_model.admin_add_user(username, password, role, name, email, phone, age)
-            if success:
-                # 获取刚创建的用户ID
-                user = user_model.login(username, password)
-                if user:
-                    user['age'] = age
-                    generated_users.append(user)
-                    print(f"  ✓ 创建用户: {username} ({name}) - {role}")
-            else:
-                print(f"  ✗ 创建用户失败 {username}: {error_msg}")
-        except Exception as e:
-            print(f"  ✗ 创建用户失败 {username}: {e}")
+        candidates.append({
+            'username': generate_username(name, i + 1).strip(),  # 确保用户名没有首尾空格
+            'role': random.choice(roles),
+            'name': name,
+            'email': generate_email(name, i + 1).strip(),  # 去除首尾空格
+            'phone': generate_phone().strip(),  # 去除首尾空格
+            'age': random.randint(16, 65),
+        })
+    
+    # 排除已存在（或本次重复生成）的用户名
+    existing = set()
+    for start in range(0, len(candidates), 1000):
+        names = [user['username'] for user in candidates[start:start + 1000]]
+        rows = db.execute_query(
+            f"SELECT username FROM users WHERE username IN ({', '.join('?' * len(names))})",
+            tuple(names)
+        )
+        existing.update(row['username'] for row in rows)
+    users = []
+    for user in candidates:
+        if user['username'] in existing:
+            print(f"  ✗ 创建用户失败 {user['username']}: 用户名已存在")
+            continue
+        existing.add(user['username'])
+        users.append(user)
+    
+    result = db.bulk_insert(
+        'users',
+        ('username', 'password', 'role', 'name', 'email', 'phone', 'age'),
+        [(u['username'], password_hash, u['role'], u['name'], u['email'], u['phone'], u['age']) for u in users]
+    )
+    failed = dict(result.failures)
+    generated_users = []
+    for index, (user, user_id) in enumerate(zip(users, result.ids)):
+        if user_id is None:
+            print(f"  ✗ 创建用户失败 {user['username']}: {failed.get(index)}")
+            continue
+        user['id'] = user_id
+        generated_users.append(user)
+        print(f"  ✓ 创建用户: {user['username']} ({user['name']}) - {user['role']}")
     
     print(f"成功生成 {len(generated_users)} 个用户\n")
     return generated_users
 
 def generate_books(db: Database, count: int = 30):
-    """生成书籍数据"""
+    """生成书籍数据（多行插入）"""
     print(f"正在生成 {count} 本图书...")
     book_model = BookModel(db)
-    generated_books = []
     
+    books = []
     for i in range(count):
-        title = random.choice(BOOK_TITLES)
-        author = random.choice(BOOK_AUTHORS)
-        isbn = generate_isbn()
-        category = random.choice(CATEGORIES)
-        publisher = random.choice(PUBLISHERS)
-        publish_date = generate_publish_date()
         total_copies = random.randint(1, 5)  # 每本书1-5本
-        
-        try:
-            success = book_model.add_book(
-                title=title,
-                author=author,
-                isbn=isbn,
-                category=category,
-                publisher=publisher,
-                publish_date=publish_date,
-                total_copies=total_copies
-            )
-            if success:
-                # 获取刚创建的图书ID（使用 keyword 参数搜索 ISBN）
-                books = book_model.search_books(keyword=isbn)
-                if books:
-                    # 找到匹配的 ISBN
-                    matched_book = None
-                    for book in books:
-                        if book.get('isbn') == isbn:
-                            matched_book = book
-                            break
-                    if matched_book:
-                        generated_books.append(matched_book)
-                        print(f"  ✓ 创建图书: {title} - {author} ({total_copies}本)")
-                    else:
-                        # 如果没找到精确匹配，使用第一个结果
-                        generated_books.append(books[0])
-                        print(f"  ✓ 创建图书: {title} - {author} ({total_copies}本)")
-                else:
-                    # 如果搜索不到，直接查询数据库获取最新创建的图书
-                    all_books = db.execute_query(
-                        "SELECT * FROM books WHERE isbn = %s ORDER BY id DESC LIMIT 1",
-                        (isbn,)
-                    )
-                    if all_books:
-                        generated_books.append(all_books[0])
-                        print(f"  ✓ 创建图书: {title} - {author} ({total_copies}本)")
-        except Exception as e:
-            print(f"  ✗ 创建图书失败 {title}: {e}")
+        books.append({
+            'title': random.choice(BOOK_TITLES),
+            'author': random.choice(BOOK_AUTHORS),
+            'isbn': generate_isbn(),
+            'category': random.choice(CATEGORIES),
+            'publisher': random.choice(PUBLISHERS),
+            'publish_date': generate_publish_date(),
+            'total_copies': total_copies,
+            'available_copies': total_copies,
+            'status': 'available',
+        })
+    
+    result = book_model.add_books(books)
+    failed = dict(result.failures)
+    generated_books = []
+    for index, (book, book_id) in enumerate(zip(books, result.ids)):
+        if book_id is None:
+            print(f"  ✗ 创建图书失败 {book['title']}: {failed.get(index)}")
+            continue
+        book['id'] = book_id
+        generated_books.append(book)
+        print(f"  ✓ 创建图书: {book['title']} - {book['author']} ({book['total_copies']}本)")
     
     print(f"成功生成 {len(generated_books)} 本图书\n")
     return generated_books
 
 def generate_borrows(db: Database, users: list, books: list, count: int = 40):
-    """生成借阅关系"""
+    """生成借阅关系
+    在内存中按可借数量与借阅上限挑选借阅（规则同 BorrowModel.borrow_book），
+    借阅记录多行插入，再按图书汇总更新可借数量与状态
+    """
     print(f"正在生成 {count} 条借阅记录...")
-    borrow_model = BorrowModel(db)
-    book_model = BookModel(db)
-    generated_borrows = 0
     
     # 确保有足够的用户和图书
     if not users or not books:
         print("  ✗ 用户或图书数据不足，无法生成借阅记录")
         return
     
+    today = datetime.now().date()
+    open_borrows = {user['id']: 0 for user in users}
+    records = []
     for i in range(count):
         user = random.choice(users)
         book = random.choice(books)
         
-        # 检查图书是否可借
+        # 检查图书是否可借、用户是否已达借阅上限
         if book['available_copies'] <= 0:
             continue
+        if open_borrows[user['id']] >= borrow_limit(user.get('role', 'user'))[0]:
+            continue
         
-        # 随机决定借阅天数（15-60天）
+        # 随机决定借阅天数（15-60天），借阅日期在此之前的一段时间内
         days = random.randint(15, 60)
+        borrow_date = today - timedelta(days=random.randint(0, days))
+        due_date = borrow_date + timedelta(days=days)
         
-        try:
-            success, message = borrow_model.borrow_book(user['id'], book['id'], days)
-            if success:
-                generated_borrows += 1
-                
-                # 随机决定是否归还（70%已归还，30%未归还）
-                if random.random() < 0.7:
-                    # 获取刚创建的借阅记录（最新的未归还记录）
-                    borrows = db.execute_query(
-                        """SELECT * FROM borrow_records 
-                           WHERE user_id = ? AND book_id = ? AND status = 'borrowed'
-                           ORDER BY id DESC LIMIT 1""",
-                        (user['id'], book['id'])
-                    )
-                    if borrows:
-                        borrow = borrows[0]
-                        # 随机生成归还日期（借阅日期到今天的某个时间）
-                        borrow_date = borrow['borrow_date']
-                        if isinstance(borrow_date, str):
-                            borrow_date = datetime.strptime(borrow_date, '%Y-%m-%d').date()
-                        today = datetime.now().date()
-                        if borrow_date < today:
-                            return_date = borrow_date + timedelta(days=random.randint(1, min(days, (today - borrow_date).days)))
-                            # 直接更新数据库
-                            db.execute_update(
-                                """UPDATE borrow_records SET return_date = ?, status = 'returned' WHERE id = ?""",
-                                (return_date, borrow['id'])
-                            )
-                            # 更新图书可借数量
-                            db.execute_update(
-                                "UPDATE books SET available_copies = available_copies + 1 WHERE id = ?",
-                                (book['id'],)
-                            )
-                            print(f"  ✓ 创建借阅记录: {user['name']} 借阅《{book['title']}》 (已归还)")
-                else:
-                    print(f"  ✓ 创建借阅记录: {user['name']} 借阅《{book['title']}》 (未归还)")
-                
-                # 更新book的available_copies（因为borrow_book已经减1了）
-                updated_book = book_model.get_book(book['id'])
-                if updated_book:
-                    book['available_copies'] = updated_book['available_copies']
-        except Exception as e:
-            print(f"  ✗ 创建借阅记录失败: {e}")
+        # 随机决定是否归还（70%已归还，30%未归还）
+        return_date = None
+        if random.random() < 0.7 and borrow_date < today:
+            return_date = borrow_date + timedelta(days=random.randint(1, min(days, (today - borrow_date).days)))
+        else:
+            book['available_copies'] -= 1
+            open_borrows[user['id']] += 1
+        records.append((user, book, borrow_date, due_date, return_date))
+    
+    result = db.bulk_insert(
+        'borrow_records',
+        ('user_id', 'book_id', 'borrow_date', 'due_date', 'return_date', 'status'),
+        [(user['id'], book['id'], borrow_date, due_date, return_date, 'returned' if return_date else 'borrowed')
+         for user, book, borrow_date, due_date, return_date in records]
+    )
+    
+    # 未归还的借阅按图书汇总扣减可借数量（插入失败的记录不计入）
+    borrowed = {}
+    for (user, book, _, _, return_date), record_id in zip(records, result.ids):
+        if record_id is None:
+            if return_date is None:
+                book['available_copies'] += 1
+            print(f"  ✗ 创建借阅记录失败: {user['name']} 借阅《{book['title']}》")
+            continue
+        if return_date is None:
+            borrowed[book['id']] = borrowed.get(book['id'], 0) + 1
+        print(f"  ✓ 创建借阅记录: {user['name']} 借阅《{book['title']}》 ({'已归还' if return_date else '未归还'})")
+    db.execute_many(
+        """UPDATE books
+           SET status = CASE WHEN available_copies <= ? THEN 'unavailable' ELSE status END,
+               available_copies = available_copies - ?
+           WHERE id = ?""",
+        [(n, n, book_id) for book_id, n in borrowed.items()]
+    )
     
-    print(f"成功生成 {generated_borrows} 条借阅记录\n")
+    print(f"成功生成 {result.inserted} 条借阅记录\n")
 
 def main():
     """主函数"""
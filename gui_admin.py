@@ -4,7 +4,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-import threading
 from ui_theme import (
     PRIMARY_COLOR,
     PRIMARY_DARK,
@@ -18,6 +17,12 @@ from ui_theme import (
     QUERY_COLOR,
     create_rounded_button,
 )
+from gui_paging import PagedTreeLoader
+from gui_events import EventPump, delete_tree_row, update_tree_row
+from events import EVENT_BOOK_CHANGED, EVENT_BORROW_OVERDUE, TOPIC_BOOKS, TOPIC_BORROWS
+
+# 导入任务进度的查询间隔（毫秒）
+JOB_POLL_INTERVAL_MS = 1000
 
 try:
     import matplotlib
@@ -49,6 +54,28 @@ class AdminWindow:
         self.refresh_books()
         self.refresh_borrows()
         self.refresh_users()
+        self._subscribe_events()
+
+    def _subscribe_events(self):
+        """订阅服务端推送：所有图书的库存变化与所有用户的逾期，只更新受影响的行"""
+        self.event_pump = EventPump(self.root, self.client, {
+            EVENT_BOOK_CHANGED: self._on_book_changed,
+            EVENT_BORROW_OVERDUE: self._on_borrow_overdue,
+        })
+        self.client.subscribe([TOPIC_BOOKS, TOPIC_BORROWS])
+
+    def _on_book_changed(self, data):
+        if data.get('deleted'):
+            delete_tree_row(self.books_tree, data.get('book_id'))
+            return
+        update_tree_row(self.books_tree, data.get('book_id'), {
+            "总数量": data.get('total_copies', 0),
+            "可借数量": data.get('available_copies', 0),
+            "状态": data.get('status', 'available'),
+        })
+
+    def _on_borrow_overdue(self, data):
+        update_tree_row(self.borrows_tree, data.get('record_id'), {"状态": '逾期'})
 
     def _switch_tab(self, index: int):
         """侧边栏切换到指定标签页"""
@@ -377,8 +404,13 @@ class AdminWindow:
     def refresh_home_data(self):
         """刷新首页数据"""
         try:
-            # 获取统计数据
-            stats = self.client.get_statistics()
+            # 统计数据、用户列表与图表数据在同一连接上一次性发出，不再逐个等待
+            stats_resp, users_resp, dashboard_resp = self.client.send_requests([
+                ('get_statistics', {}),
+                ('get_all_users', {}),
+                ('get_admin_dashboard_data', {'days': 30}),
+            ])
+            stats = stats_resp.get('data') if stats_resp.get('success') else None
             if stats:
                 # 更新图书总数
                 for card in self.home_cards:
@@ -388,35 +420,20 @@ class AdminWindow:
                         card["value_label"].config(text=str(stats.get('total_borrows', 0)))
             
             # 获取用户总数
-            try:
-                users = self.client.get_all_users()
-                user_count = len(users) if users else 0
-            except:
-                user_count = 0
+            users = users_resp.get('data') if users_resp.get('success') else None
+            user_count = len(users) if isinstance(users, list) else 0
             
             for card in self.home_cards:
                 if card["key"] == "total_users":
                     card["value_label"].config(text=str(user_count))
             
             # 获取图书类型数（使用分类摘要获取标准分类数）
-            try:
-                dashboard_data = self.client.get_admin_dashboard_data(days=30)
-                if dashboard_data and 'category_summary' in dashboard_data:
-                    category_summary = dashboard_data['category_summary']
-                    type_count = len(category_summary) if category_summary else 0
-                else:
-                    # 如果没有分类摘要，使用原始分类列表去重
-                    categories = self.client.get_categories()
-                    if categories:
-                        unique_categories = set()
-                        for cat in categories:
-                            if cat and cat.strip():
-                                unique_categories.add(cat.strip())
-                        type_count = len(unique_categories)
-                    else:
-                        type_count = 0
-            except:
-                # 如果获取失败，尝试使用分类列表
+            dashboard_data = dashboard_resp.get('data') if dashboard_resp.get('success') else None
+            if dashboard_data and 'category_summary' in dashboard_data:
+                category_summary = dashboard_data['category_summary']
+                type_count = len(category_summary) if category_summary else 0
+            else:
+                # 如果没有分类摘要，使用原始分类列表去重
                 try:
                     categories = self.client.get_categories()
                     if categories:
@@ -577,7 +594,8 @@ class AdminWindow:
             self.books_tree.column(col, width=100)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.books_tree.yview)
-        self.books_tree.configure(yscrollcommand=scrollbar.set)
+        # 分页加载：滚动到底部附近时再请求下一页
+        self.books_loader = PagedTreeLoader(self.books_tree, scrollbar, self._insert_book_row)
         
         self.books_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -684,7 +702,8 @@ class AdminWindow:
             self.borrows_tree.column(col, width=100)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.borrows_tree.yview)
-        self.borrows_tree.configure(yscrollcommand=scrollbar.set)
+        self.borrows_loader = PagedTreeLoader(self.borrows_tree, scrollbar,
+                                              lambda borrow: self._display_borrows([borrow]))
         
         self.borrows_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -749,7 +768,7 @@ class AdminWindow:
             self.users_tree.column(col, width=width)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.users_tree.yview)
-        self.users_tree.configure(yscrollcommand=scrollbar.set)
+        self.users_loader = PagedTreeLoader(self.users_tree, scrollbar, self._insert_user_row)
         
         self.users_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -822,7 +841,13 @@ class AdminWindow:
         if Figure is None or FigureCanvasTkAgg is None:
             return
         try:
-            data = self.client.get_admin_dashboard_data(days=30)
+            response = self.client.send_request('get_admin_dashboard_data', {'days': 30})
+            if response.get('error') == 'deadline_exceeded':
+                # 服务器繁忙或统计查询太慢，保留当前图表，由用户决定是否重试
+                if messagebox.askretrycancel("提示", "统计数据加载超时，是否重试？"):
+                    self.refresh_admin_charts()
+                return
+            data = response.get('data') if response.get('success') else None
             if not data:
                 messagebox.showwarning("提示", "暂无法获取统计数据")
                 return
@@ -960,18 +985,17 @@ class AdminWindow:
             ax_status.axis('off')
         
         if durations:
-            # 确保数据为整数并且 x 轴从 0 开始（借阅时长不应为负）
-            try:
-                durations_int = [int(d) for d in durations]
-            except Exception:
-                durations_int = durations
+            # 服务端按天数汇总为 {days, count}，以记录数作为权重画直方图（借阅时长不应为负，x 轴从 0 开始）
+            durations_int = [int(row.get('days', 0)) for row in durations]
+            duration_counts = [int(row.get('count', 0)) for row in durations]
+            min_d = min(durations_int)
             # 使用整数刻度的直方图
             try:
                 from matplotlib.ticker import MaxNLocator
-                min_d = min(durations_int) if durations_int else 0
-                max_d = max(durations_int) if durations_int else 0
-                bins = range(min_d, max_d + 2) if max_d - min_d <= 50 else min(10, len(set(durations_int)))
-                n, edges, patches = ax_duration.hist(durations_int, bins=bins, color="#03A9F4", edgecolor='white')
+                max_d = max(durations_int)
+                bins = range(min_d, max_d + 2) if max_d - min_d <= 50 else min(10, len(durations_int))
+                n, edges, patches = ax_duration.hist(durations_int, bins=bins, weights=duration_counts,
+                                                     color="#03A9F4", edgecolor='white')
                 # 给每个柱子着不同的颜色（渐变）
                 try:
                     cmap = matplotlib.cm.get_cmap('Blues')
@@ -982,7 +1006,8 @@ class AdminWindow:
                 except Exception:
                     pass
             except Exception:
-                n, edges, patches = ax_duration.hist(durations_int, color="#03A9F4", edgecolor='white')
+                n, edges, patches = ax_duration.hist(durations_int, weights=duration_counts,
+                                                     color="#03A9F4", edgecolor='white')
                 try:
                     cmap = matplotlib.cm.get_cmap('Blues')
                     colors = [cmap(0.5) for _ in patches]
@@ -1008,15 +1033,14 @@ class AdminWindow:
             ax_duration.axis('off')
         
         if overdue_days:
+            overdue_int = [int(row.get('days', 0)) for row in overdue_days]
+            overdue_counts = [int(row.get('count', 0)) for row in overdue_days]
+            min_o = min(overdue_int)
             try:
-                overdue_int = [int(d) for d in overdue_days]
-            except Exception:
-                overdue_int = overdue_days
-            try:
-                min_o = min(overdue_int) if overdue_int else 0
-                max_o = max(overdue_int) if overdue_int else 0
-                bins = range(min_o, max_o + 2) if max_o - min_o <= 50 else min(10, len(set(overdue_int)))
-                n_o, edges_o, patches_o = ax_overdue.hist(overdue_int, bins=bins, color="#E91E63", edgecolor='white')
+                max_o = max(overdue_int)
+                bins = range(min_o, max_o + 2) if max_o - min_o <= 50 else min(10, len(overdue_int))
+                n_o, edges_o, patches_o = ax_overdue.hist(overdue_int, bins=bins, weights=overdue_counts,
+                                                          color="#E91E63", edgecolor='white')
                 try:
                     cmap_o = matplotlib.cm.get_cmap('Reds')
                     colors_o = [cmap_o(0.4 + 0.5 * i / max(1, len(patches_o) - 1)) for i in range(len(patches_o))]
@@ -1026,7 +1050,8 @@ class AdminWindow:
                 except Exception:
                     pass
             except Exception:
-                n_o, edges_o, patches_o = ax_overdue.hist(overdue_int, color="#E91E63", edgecolor='white')
+                n_o, edges_o, patches_o = ax_overdue.hist(overdue_int, weights=overdue_counts,
+                                                          color="#E91E63", edgecolor='white')
                 try:
                     cmap_o = matplotlib.cm.get_cmap('Reds')
                     colors_o = [cmap_o(0.6) for _ in patches_o]
@@ -1054,54 +1079,38 @@ class AdminWindow:
         self.borrow_canvas.draw()
     
     def refresh_books(self):
-        """刷新图书列表"""
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
+        """刷新图书列表（先加载第一页，滚动时加载后续页）"""
         # 获取所有图书（传递空字符串作为keyword，确保返回所有图书）
-        books = self.client.search_books(keyword="", category="")
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page("", "", after_id, limit)
+        )
         
         # 调试信息
-        if not books:
+        if not self.books_loader.loaded:
             print("警告: 未获取到任何图书数据")
-        
-        # 显示图书列表
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book.get('id', ''),
-                book.get('title', ''),
-                book.get('author', ''),
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('total_copies', 0),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
     
     def search_books(self):
         """搜索图书"""
         keyword = self.search_entry.get().strip()
-        books = self.client.search_books(keyword=keyword)
         
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
-        # 显示搜索结果
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book['id'],
-                book['title'],
-                book['author'],
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('total_copies', 0),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
+        # 显示搜索结果（同样分页加载）
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page(keyword, "", after_id, limit)
+        )
+    
+    def _insert_book_row(self, book):
+        """在图书列表末尾插入一行"""
+        self.books_tree.insert("", tk.END, values=(
+            book.get('id', ''),
+            book.get('title', ''),
+            book.get('author', ''),
+            book.get('isbn', ''),
+            book.get('category', ''),
+            book.get('publisher', ''),
+            book.get('total_copies', 0),
+            book.get('available_copies', 0),
+            book.get('status', 'available')
+        ))
     
     def show_add_book(self):
         """显示添加图书对话框"""
@@ -1149,23 +1158,15 @@ class AdminWindow:
             messagebox.showerror("错误", "删除失败")
     
     def refresh_borrows(self):
-        """刷新借阅记录"""
-        # 清空现有数据
-        for item in self.borrows_tree.get_children():
-            self.borrows_tree.delete(item)
-        
+        """刷新借阅记录（分页加载，新记录在前）"""
         try:
             # 获取借阅记录
             status = self.status_var.get()
             status = None if status == "all" else status
-            borrows = self.client.get_all_borrows(status)
-            
-            # 确保 borrows 是列表
-            if not isinstance(borrows, list):
-                borrows = []
             
-            # 显示借阅记录
-            self._display_borrows(borrows)
+            self.borrows_loader.reset(
+                lambda after_id, limit: self.client.get_all_borrows_page(status, after_id, limit)
+            )
         except Exception as e:
             messagebox.showerror("错误", f"刷新借阅记录失败: {str(e)}")
             print(f"刷新借阅记录错误: {e}")
@@ -1178,14 +1179,8 @@ class AdminWindow:
             return
         item = self.borrows_tree.item(selection[0])
         record_id = item['values'][0]
-        # 获取完整记录（通过 client 请求）
-        # 在 get_all_borrows 返回的数据中查找
-        borrows = self.client.get_all_borrows(status=None)
-        record = None
-        for r in borrows:
-            if r.get('id') == record_id:
-                record = r
-                break
+        # 按记录ID获取完整记录（含书名、借阅人）
+        record = self.client.get_borrow(record_id)
         if not record:
             messagebox.showerror("错误", "未找到借阅记录的详细信息")
             return
@@ -1198,39 +1193,37 @@ class AdminWindow:
         """搜索借阅记录"""
         keyword = self.borrow_search_entry.get().strip().lower()
         
-        # 清空现有数据
+        # 清空现有数据；搜索结果由本方法直接填充，不再分页加载
+        self.borrows_loader.stop()
         for item in self.borrows_tree.get_children():
             self.borrows_tree.delete(item)
         
         try:
-            # 获取借阅记录（先按状态筛选）
+            # 获取借阅记录（先按状态筛选），流式接收，逐块过滤并显示
             status = self.status_var.get()
             status = None if status == "all" else status
-            borrows = self.client.get_all_borrows(status)
-            
-            # 确保 borrows 是列表
-            if not isinstance(borrows, list):
-                borrows = []
             
-            # 如果有搜索关键词，进行客户端过滤
-            if keyword:
-                filtered_borrows = []
-                for borrow in borrows:
-                    # 搜索用户名、姓名、书名、作者等字段
-                    username = str(borrow.get('username', '')).lower()
-                    user_name = str(borrow.get('user_name', '')).lower()
-                    title = str(borrow.get('title', '')).lower()
-                    author = str(borrow.get('author', '')).lower()
-                    
-                    if (keyword in username or 
-                        keyword in user_name or 
-                        keyword in title or 
-                        keyword in author):
-                        filtered_borrows.append(borrow)
-                borrows = filtered_borrows
-            
-            # 显示搜索结果
-            self._display_borrows(borrows)
+            for borrows in self.client.iter_all_borrows(status):
+                # 如果有搜索关键词，进行客户端过滤
+                if keyword:
+                    filtered_borrows = []
+                    for borrow in borrows:
+                        # 搜索用户名、姓名、书名、作者等字段
+                        username = str(borrow.get('username', '')).lower()
+                        user_name = str(borrow.get('user_name', '')).lower()
+                        title = str(borrow.get('title', '')).lower()
+                        author = str(borrow.get('author', '')).lower()
+                        
+                        if (keyword in username or 
+                            keyword in user_name or 
+                            keyword in title or 
+                            keyword in author):
+                            filtered_borrows.append(borrow)
+                    borrows = filtered_borrows
+                
+                # 显示搜索结果
+                self._display_borrows(borrows)
+                self.borrows_tree.update_idletasks()
         except Exception as e:
             messagebox.showerror("错误", f"搜索借阅记录失败: {str(e)}")
             print(f"搜索借阅记录错误: {e}")
@@ -1287,54 +1280,47 @@ class AdminWindow:
                 ))
     
     def refresh_users(self):
-        """刷新用户列表"""
-        # 清空现有数据
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
+        """刷新用户列表（分页加载）"""
         try:
-            # 获取所有用户
-            users = self.client.get_all_users()
-            
-            # 确保 users 是列表
-            if not isinstance(users, list):
-                users = []
-            
-            # 显示用户列表
-            if users:
-                role_text = {'admin': '管理员', 'member': '会员', 'user': '普通用户'}
-                for user in users:
-                    # 格式化创建时间
-                    created_at = user.get('created_at', '')
-                    if created_at and isinstance(created_at, str):
-                        try:
-                            # 如果是 ISO 格式，转换为更易读的格式
-                            if 'T' in created_at:
-                                created_at = created_at.replace('T', ' ').split('.')[0]
-                        except:
-                            pass
-                    
-                    self.users_tree.insert("", tk.END, values=(
-                        user.get('id', ''),
-                        user.get('username', ''),
-                        user.get('name', ''),
-                        user.get('age') if user.get('age') is not None else '',
-                        role_text.get(user.get('role', ''), user.get('role', '')),
-                        user.get('email', ''),
-                        user.get('phone', ''),
-                        created_at
-                    ))
-            # 如果没有数据，不显示任何内容（空列表表示没有记录）
+            # 获取用户；如果没有数据，不显示任何内容（空列表表示没有记录）
+            self.users_loader.reset(
+                lambda after_id, limit: self.client.get_all_users_page(after_id, limit)
+            )
         except Exception as e:
             messagebox.showerror("错误", f"刷新用户列表失败: {str(e)}")
             print(f"刷新用户列表错误: {e}")
     
+    def _insert_user_row(self, user):
+        """在用户列表末尾插入一行"""
+        role_text = {'admin': '管理员', 'member': '会员', 'user': '普通用户'}
+        # 格式化创建时间
+        created_at = user.get('created_at', '')
+        if created_at and isinstance(created_at, str):
+            try:
+                # 如果是 ISO 格式，转换为更易读的格式
+                if 'T' in created_at:
+                    created_at = created_at.replace('T', ' ').split('.')[0]
+            except:
+                pass
+        
+        self.users_tree.insert("", tk.END, values=(
+            user.get('id', ''),
+            user.get('username', ''),
+            user.get('name', ''),
+            user.get('age') if user.get('age') is not None else '',
+            role_text.get(user.get('role', ''), user.get('role', '')),
+            user.get('email', ''),
+            user.get('phone', ''),
+            created_at
+        ))
+    
     def search_users(self):
         """搜索用户"""
         keyword = self.user_search_entry.get().strip().lower()
         users = self.client.get_all_users()
         
-        # 清空现有数据
+        # 清空现有数据；搜索结果由本方法直接填充，不再分页加载
+        self.users_loader.stop()
         for item in self.users_tree.get_children():
             self.users_tree.delete(item)
         
@@ -1464,8 +1450,10 @@ class AdminWindow:
     def logout(self):
         """退出登录"""
         if messagebox.askyesno("确认", "确定要退出登录吗？"):
-            # 保存客户端连接状态
+            # 保存客户端连接状态，注销会话令牌
             client = self.client
+            if client.connected:
+                client.logout()
             self.root.destroy()
             # 重新打开登录窗口
             from gui_login import LoginWindow
@@ -2009,16 +1997,27 @@ class ComposeEmailDialog:
         self.body_text = tk.Text(frame, font=("微软雅黑", 11), height=20, wrap="word")
         self.body_text.pack(fill=tk.BOTH, expand=True, pady=(4,8))
 
-    def _send_to_recipient(self, recipient_user_id, recipient_email, subject, body, try_send=False):
-        # 调用客户端方法发送邮件（服务器保存记录并可尝试发送）
-        return self.client.send_email(
-            sender_id=self.admin_user.get('id'),
-            recipient_user_id=recipient_user_id,
-            recipient_email=recipient_email,
-            subject=subject,
-            body=body,
-            try_send=try_send
-        )
+    def _collect_recipients(self):
+        """整理收件目标 [(用户id, 邮箱)]；未选择任何目标时为所有有邮箱的用户"""
+        if not self.selected_user_ids and not self.selected_emails:
+            users = self.client.get_all_users()
+            return [(u.get('id'), u.get('email')) for u in users if u.get('email')], True
+        
+        # 选中用户的邮箱通过一次批量请求获取
+        user_ids = list(self.selected_user_ids)
+        results = self.client.send_batch([('get_user_info', {'user_id': uid}) for uid in user_ids])
+        targets = []
+        for uid, result in zip(user_ids, results):
+            user = result.get('data') if result.get('success') else None
+            targets.append((uid, user.get('email') if user else None))
+        # 直接选中的邮箱
+        targets.extend((None, em) for em in self.selected_emails)
+        return targets, False
+
+    def _send_to_recipients(self, targets, subject, body, try_send=False):
+        """群发邮件（服务器批量保存记录并可尝试发送），返回成功数量"""
+        saved = self.client.send_emails(self.admin_user.get('id'), targets, subject, body, try_send=try_send)
+        return sum(saved)
 
     def send_and_try(self):
         subject = self.subject_entry.get().strip()
@@ -2026,36 +2025,13 @@ class ComposeEmailDialog:
         if not subject and not body:
             messagebox.showwarning("警告", "主题或正文不能为空")
             return
-        # 如果没有选中用户，则发送给所有用户（通过查询所有用户并逐个调用发送）
-        if not self.selected_user_ids and not self.selected_emails:
-            users = self.client.get_all_users()
-            count = 0
-            for u in users:
-                email = u.get('email')
-                uid = u.get('id')
-                if email:
-                    self._send_to_recipient(uid, email, subject, body, try_send=True)
-                    count += 1
-            messagebox.showinfo("完成", f"已向 {count} 位用户发送/保存邮件记录（详见服务器记录）。")
-            self.window.destroy()
-            return
-
-        # 向选中用户发送
-        success_count = 0
-        for uid in self.selected_user_ids:
-            # 获取用户详细信息以取得邮箱
-            user = self.client.get_user_info(uid)
-            recipient_email = user.get('email') if user else None
-            ok = self._send_to_recipient(uid, recipient_email, subject, body, try_send=True)
-            if ok:
-                success_count += 1
-        # 向直接选中邮箱发送（如果有）
-        for em in self.selected_emails:
-            ok = self._send_to_recipient(None, em, subject, body, try_send=True)
-            if ok:
-                success_count += 1
-
-        messagebox.showinfo("完成", f"已向 {success_count} 个目标发送/保存邮件记录。")
+        targets, to_all = self._collect_recipients()
+        success_count = self._send_to_recipients(targets, subject, body, try_send=True)
+        if to_all:
+            # 没有选中用户时发送给所有用户
+            messagebox.showinfo("完成", f"已向 {len(targets)} 位用户发送/保存邮件记录（详见服务器记录）。")
+        else:
+            messagebox.showinfo("完成", f"已向 {success_count} 个目标发送/保存邮件记录。")
         self.window.destroy()
 
     def save_draft(self):
@@ -2065,26 +2041,12 @@ class ComposeEmailDialog:
             messagebox.showwarning("警告", "主题或正文不能为空")
             return
         # 保存草稿（不尝试发送）
-        if not self.selected_user_ids and not self.selected_emails:
-            users = self.client.get_all_users()
-            count = 0
-            for u in users:
-                email = u.get('email')
-                uid = u.get('id')
-                if email:
-                    self._send_to_recipient(uid, email, subject, body, try_send=False)
-                    count += 1
-            messagebox.showinfo("完成", f"已为 {count} 位用户保存邮件草稿。")
-            self.window.destroy()
-            return
-
-        for uid in self.selected_user_ids:
-            user = self.client.get_user_info(uid)
-            recipient_email = user.get('email') if user else None
-            self._send_to_recipient(uid, recipient_email, subject, body, try_send=False)
-        for em in self.selected_emails:
-            self._send_to_recipient(None, em, subject, body, try_send=False)
-        messagebox.showinfo("完成", "草稿已保存。")
+        targets, to_all = self._collect_recipients()
+        self._send_to_recipients(targets, subject, body, try_send=False)
+        if to_all:
+            messagebox.showinfo("完成", f"已为 {len(targets)} 位用户保存邮件草稿。")
+        else:
+            messagebox.showinfo("完成", "草稿已保存。")
         self.window.destroy()
 
 class ImportBooksDialog:
@@ -2101,6 +2063,7 @@ class ImportBooksDialog:
         self.window.grab_set()
         
         self.importing = False
+        self.job_id = None
         self.create_widgets()
     
     def create_widgets(self):
@@ -2284,61 +2247,79 @@ class ImportBooksDialog:
         ):
             return
         
-        # 开始导入（在后台线程中执行）
+        # 提交后台导入任务，服务端立即返回任务ID，之后定时查询进度
+        success, message, data = self.client.import_books_from_openlibrary(
+            query=query,
+            count=count,
+            batch_size=batch_size,
+            delay=delay,
+            copies=copies
+        )
+        if not success or not data.get('job_id'):
+            messagebox.showerror("错误", message)
+            return
+        
+        self.job_id = data['job_id']
         self.importing = True
         self.start_btn.config(state=tk.DISABLED, text="爬取中...")
-        self.cancel_btn.config(state=tk.DISABLED)
-        self.progress_label.config(text="正在爬取图书，请稍候...")
-        self.progress_bar.start()
-        
-        # 在后台线程中执行导入
-        thread = threading.Thread(target=self._do_import, args=(
-            query, count, batch_size, delay, copies
-        ))
-        thread.daemon = True
-        thread.start()
+        self.progress_bar.config(mode='determinate', maximum=count, value=0)
+        self.progress_label.config(text="任务已提交，等待开始...", fg="#4CAF50")
+        self.window.after(JOB_POLL_INTERVAL_MS, self._poll_job)
     
-    def _do_import(self, query, count, batch_size, delay, copies):
-        """在后台线程中执行导入"""
+    def _poll_job(self):
+        """定时查询导入任务的进度"""
+        if not self.importing:
+            return
         try:
-            success, message, data = self.client.import_books_from_openlibrary(
-                query=query,
-                count=count,
-                batch_size=batch_size,
-                delay=delay,
-                copies=copies
-            )
-            
-            # 在主线程中更新UI
-            self.window.after(0, self._import_finished, success, message, data)
-        except Exception as e:
-            self.window.after(0, self._import_finished, False, f"导入失败: {str(e)}", {})
+            if not self.window.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        status = self.client.get_job_status(self.job_id)
+        state = status.get('status')
+        if state in ('completed', 'failed', 'cancelled', 'interrupted'):
+            self._import_finished(status)
+            return
+        if status:
+            done = status.get('done', 0)
+            text = f"已导入 {done}/{status.get('total', 0)} 本，跳过 {status.get('skipped', 0)} 本"
+            eta = status.get('eta_s')
+            if eta is not None:
+                text += f"，预计剩余 {int(eta) // 60} 分 {int(eta) % 60} 秒"
+            self.progress_bar.config(value=done)
+            self.progress_label.config(text=text)
+        self.window.after(JOB_POLL_INTERVAL_MS, self._poll_job)
     
-    def _import_finished(self, success, message, data):
-        """导入完成后的回调"""
+    def _import_finished(self, status):
+        """导入任务结束"""
         self.importing = False
-        self.progress_bar.stop()
         self.start_btn.config(state=tk.NORMAL, text="开始爬取")
-        self.cancel_btn.config(state=tk.NORMAL)
-        
-        if success:
-            stored = data.get('stored', 0)
-            skipped = data.get('skipped', 0)
+        self.progress_bar.config(value=status.get('done', 0))
+        stored = status.get('done', 0)
+        skipped = status.get('skipped', 0)
+        state = status.get('status')
+        if stored:
+            # 部分导入（取消或失败）时列表同样需要刷新
+            self.success = True
+        if state == 'completed':
             self.progress_label.config(
                 text=f"爬取完成！成功: {stored} 本，跳过: {skipped} 本",
                 fg="#4CAF50"
             )
-            messagebox.showinfo("成功", message)
-            self.success = True
+            messagebox.showinfo("成功", f"导入完成：成功 {stored} 本，跳过 {skipped} 本")
+        elif state == 'cancelled':
+            self.progress_label.config(text=f"已取消，已导入 {stored} 本", fg="#FF9800")
         else:
             self.progress_label.config(text="爬取失败", fg="#f44336")
-            messagebox.showerror("错误", message)
+            messagebox.showerror("错误", status.get('message') or '导入失败')
     
     def cancel(self):
-        """取消"""
+        """取消：导入进行中时取消服务端任务"""
         if self.importing:
             if not messagebox.askyesno("确认", "爬取正在进行中，确定要取消吗？"):
                 return
+            self.client.cancel_job(self.job_id)
+            self.importing = False
         self.window.destroy()
 
 
@@ -0,0 +1,84 @@
+"""
+界面推送事件
+NetworkClient 在后台读取线程中收到服务端推送的变更事件，这里把事件转交给 Tk 主线程，
+由各窗口只更新受影响的行（见 events.py）
+"""
+import queue
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict
+
+# 主线程检查事件队列的间隔（毫秒）
+POLL_INTERVAL_MS = 200
+
+
+class EventPump:
+    """把推送事件从读取线程转交给 Tk 主线程
+
+    handlers 为 事件名 -> handler(data)，handler 在主线程中执行；
+    窗口销毁后自动移除登记的回调。
+    """
+
+    def __init__(self, widget: tk.Misc, client, handlers: Dict[str, Callable[[Dict], None]],
+                 interval_ms: int = POLL_INTERVAL_MS):
+        self.widget = widget
+        self.client = client
+        self.handlers = handlers
+        self.interval_ms = interval_ms
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._listeners = {}
+        for event in handlers:
+            # 读取线程里只做入队，不碰任何 Tk 对象
+            listener = (lambda name: lambda data: self._queue.put((name, data)))(event)
+            self._listeners[event] = listener
+            client.add_event_listener(event, listener)
+        self._schedule()
+
+    def close(self) -> None:
+        """移除登记的回调"""
+        for event, listener in self._listeners.items():
+            self.client.remove_event_listener(event, listener)
+        self._listeners = {}
+
+    def _schedule(self) -> None:
+        try:
+            self.widget.after(self.interval_ms, self._poll)
+        except tk.TclError:
+            # 窗口已销毁
+            self.close()
+
+    def _poll(self) -> None:
+        while True:
+            try:
+                event, data = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.handlers[event](data)
+            except tk.TclError:
+                self.close()
+                return
+            except Exception as e:
+                print(f"处理推送事件 {event} 失败: {e}")
+        self._schedule()
+
+
+def update_tree_row(tree: ttk.Treeview, key, values: Dict[str, object]) -> bool:
+    """把第一列等于 key 的行的指定列改为新值，找到该行时返回 True"""
+    for item in tree.get_children():
+        row = tree.item(item, 'values')
+        if row and str(row[0]) == str(key):
+            for column, value in values.items():
+                tree.set(item, column, value)
+            return True
+    return False
+
+
+def delete_tree_row(tree: ttk.Treeview, key) -> bool:
+    """删除第一列等于 key 的行，找到该行时返回 True"""
+    for item in tree.get_children():
+        row = tree.item(item, 'values')
+        if row and str(row[0]) == str(key):
+            tree.delete(item)
+            return True
+    return False
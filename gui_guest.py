@@ -14,6 +14,9 @@ from ui_theme import (
     TEXT_SECONDARY,
     create_rounded_button,
 )
+from gui_paging import PagedTreeLoader
+from gui_events import EventPump, delete_tree_row, update_tree_row
+from events import EVENT_BOOK_CHANGED, TOPIC_BOOKS
 
 class GuestWindow:
     """游客窗口"""
@@ -24,6 +27,18 @@ class GuestWindow:
         self.root.configure(bg=NEUTRAL_BG)
         self.create_widgets()
         self.refresh_books()
+        # 订阅图书库存变化，只更新受影响的行
+        self.event_pump = EventPump(self.root, self.client, {EVENT_BOOK_CHANGED: self._on_book_changed})
+        self.client.subscribe([TOPIC_BOOKS])
+    
+    def _on_book_changed(self, data):
+        if data.get('deleted'):
+            delete_tree_row(self.books_tree, data.get('book_id'))
+            return
+        update_tree_row(self.books_tree, data.get('book_id'), {
+            "可借数量": data.get('available_copies', 0),
+            "状态": data.get('status', 'available'),
+        })
     
     def create_widgets(self):
         """创建界面组件"""
@@ -112,7 +127,8 @@ class GuestWindow:
             self.books_tree.column(col, width=100)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.books_tree.yview)
-        self.books_tree.configure(yscrollcommand=scrollbar.set)
+        # 分页加载：滚动到底部附近时再请求下一页
+        self.books_loader = PagedTreeLoader(self.books_tree, scrollbar, self._insert_book_row)
         
         self.books_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -151,46 +167,32 @@ class GuestWindow:
         borrow_btn.pack(side=tk.LEFT, padx=5)
     
     def refresh_books(self):
-        """刷新图书列表"""
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
-        # 获取所有图书
-        books = self.client.search_books()
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book['id'],
-                book['title'],
-                book['author'],
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
+        """刷新图书列表（先加载第一页，滚动时加载后续页）"""
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page("", "", after_id, limit)
+        )
     
     def search_books(self):
         """搜索图书"""
         keyword = self.search_entry.get().strip()
-        books = self.client.search_books(keyword=keyword)
         
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
-        # 显示搜索结果
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book['id'],
-                book['title'],
-                book['author'],
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
+        # 显示搜索结果（同样分页加载）
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page(keyword, "", after_id, limit)
+        )
+    
+    def _insert_book_row(self, book):
+        """在图书列表末尾插入一行"""
+        self.books_tree.insert("", tk.END, values=(
+            book['id'],
+            book['title'],
+            book['author'],
+            book.get('isbn', ''),
+            book.get('category', ''),
+            book.get('publisher', ''),
+            book.get('available_copies', 0),
+            book.get('status', 'available')
+        ))
     
     def on_book_double_click(self, event):
         """双击图书事件"""
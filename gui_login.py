@@ -4,6 +4,7 @@
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox
+from config import SERVER_CONFIG
 from network_client import NetworkClient
 from ui_theme import (
     PRIMARY_COLOR,
@@ -29,7 +30,8 @@ class LoginWindow:
         self.center_window()
         
         # 网络客户端
-        self.client = NetworkClient()
+        # 与服务端在同一台机器上（如自助借阅终端）时通过 Unix 域套接字连接
+        self.client = NetworkClient(unix_socket=SERVER_CONFIG['unix_socket'])
         self.current_user = None
 
         # 加载背景图：自动从 assets 目录下选择一张 image*.png
@@ -0,0 +1,78 @@
+"""
+列表分页加载
+Treeview 先显示第一页，滚动条接近底部时再向服务器请求下一页（游标分页，见 NetworkClient.*_page）
+"""
+from tkinter import ttk
+from typing import Callable, Dict, Optional
+
+# 每页行数
+PAGE_SIZE = 100
+# 滚动到列表的这个位置（0-1）以下时加载下一页
+LOAD_THRESHOLD = 0.9
+
+
+class PagedTreeLoader:
+    """为 Treeview 按需加载分页数据
+
+    fetch_page(after_id, limit) 返回 {'items': [...], 'next_after_id': ..., 'total': ...}；
+    insert_row(row) 把一行插入 Treeview。
+    创建后接管 Treeview 的 yscrollcommand，滚动条位置仍照常更新。
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 insert_row: Callable[[Dict], None], page_size: int = PAGE_SIZE):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.insert_row = insert_row
+        self.page_size = page_size
+        # 第一页返回的总数（可能是估计值）
+        self.total: Optional[int] = None
+        self.loaded = 0
+        self._fetch_page: Optional[Callable[[Optional[int], int], Dict]] = None
+        self._after_id: Optional[int] = None
+        self._has_more = False
+        self._loading = False
+        self._load_scheduled = False
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reset(self, fetch_page: Callable[[Optional[int], int], Dict]) -> None:
+        """清空列表，按新的查询从第一页开始加载"""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self._fetch_page = fetch_page
+        self._after_id = None
+        self._has_more = True
+        self.total = None
+        self.loaded = 0
+        self.load_next()
+
+    def stop(self) -> None:
+        """停止按需加载（列表改由调用方直接填充时使用，避免滚动时混入分页数据）"""
+        self._fetch_page = None
+        self._has_more = False
+
+    def load_next(self) -> None:
+        """加载下一页（已在加载或没有更多数据时忽略）"""
+        self._load_scheduled = False
+        if self._loading or not self._has_more or self._fetch_page is None:
+            return
+        self._loading = True
+        try:
+            page = self._fetch_page(self._after_id, self.page_size)
+            items = page.get('items') or []
+            for row in items:
+                self.insert_row(row)
+            self.loaded += len(items)
+            if self._after_id is None:
+                self.total = page.get('total')
+            self._after_id = page.get('next_after_id')
+            self._has_more = self._after_id is not None
+        finally:
+            self._loading = False
+
+    def _on_scroll(self, first, last) -> None:
+        self.scrollbar.set(first, last)
+        # 第一页不足一屏时 last 为 1.0，也会继续加载直到填满可见区域
+        if self._has_more and not self._load_scheduled and float(last) >= LOAD_THRESHOLD:
+            self._load_scheduled = True
+            self.tree.after_idle(self.load_next)
@@ -18,6 +18,10 @@ from ui_theme import (
     QUERY_COLOR,
     create_rounded_button,
 )
+from gui_paging import PagedTreeLoader
+from gui_events import EventPump, delete_tree_row, update_tree_row
+from events import (EVENT_BOOK_CHANGED, EVENT_BORROW_OVERDUE, EVENT_EMAIL_RECEIVED, TOPIC_BOOKS,
+                    TOPIC_BORROWS, TOPIC_EMAILS)
 
 try:
     import matplotlib
@@ -47,6 +51,37 @@ class UserWindow:
         self.refresh_books()
         self.refresh_my_borrows()
         self.load_user_info()
+        self._subscribe_events()
+
+    def _subscribe_events(self):
+        """订阅服务端推送：图书库存变化、发给自己的邮件与逾期提醒，只更新受影响的行"""
+        self.event_pump = EventPump(self.root, self.client, {
+            EVENT_BOOK_CHANGED: self._on_book_changed,
+            EVENT_EMAIL_RECEIVED: self._on_email_received,
+            EVENT_BORROW_OVERDUE: self._on_borrow_overdue,
+        })
+        self.client.subscribe([TOPIC_BOOKS, TOPIC_EMAILS, TOPIC_BORROWS], self.user['id'])
+
+    def _on_book_changed(self, data):
+        if data.get('deleted'):
+            delete_tree_row(self.books_tree, data.get('book_id'))
+            return
+        update_tree_row(self.books_tree, data.get('book_id'), {
+            "可借数量": data.get('available_copies', 0),
+            "状态": data.get('status', 'available'),
+        })
+
+    def _on_email_received(self, data):
+        time_str = data.get('created_at') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.notif_tree.insert("", 0, values=('邮件', data.get('subject', ''), data.get('body', ''), time_str),
+                               tags=('system_unread',))
+
+    def _on_borrow_overdue(self, data):
+        due = data.get('due_date') or ''
+        title = f"图书逾期：{data.get('title', '')}"
+        self.notif_tree.insert("", 0, values=('逾期提醒', title, f"应还日期 {due}", due),
+                               tags=('overdue_unread',))
+        update_tree_row(self.borrows_tree, data.get('record_id'), {"状态": 'overdue'})
 
     def _init_styles(self):
         """统一设置列表风格"""
@@ -382,8 +417,13 @@ class UserWindow:
     def refresh_home_data(self):
         """刷新首页数据"""
         try:
-            # 获取统计数据
-            stats = self.client.get_statistics()
+            # 三个请求在同一连接上一次性发出，不再逐个等待
+            stats_resp, borrows_resp, categories_resp = self.client.send_requests([
+                ('get_statistics', {}),
+                ('get_my_borrows', {'user_id': self.user['id'], 'status': 'borrowed'}),
+                ('get_categories', {}),
+            ])
+            stats = stats_resp.get('data') if stats_resp.get('success') else None
             if stats:
                 # 更新图书总数
                 for card in self.home_cards:
@@ -391,29 +431,23 @@ class UserWindow:
                         card["value_label"].config(text=str(stats.get('total_books', 0)))
             
             # 获取用户当前借阅数量
-            try:
-                borrows = self.client.get_my_borrows(self.user['id'], status='borrowed')
-                current_borrow_count = len(borrows) if borrows else 0
-            except:
-                current_borrow_count = 0
+            borrows = borrows_resp.get('data') if borrows_resp.get('success') else None
+            current_borrow_count = len(borrows) if borrows else 0
             
             for card in self.home_cards:
                 if card["key"] == "current_borrows":
                     card["value_label"].config(text=str(current_borrow_count))
             
             # 获取图书类型数
-            try:
-                categories = self.client.get_categories()
-                if categories:
-                    # 使用原始分类列表去重
-                    unique_categories = set()
-                    for cat in categories:
-                        if cat and cat.strip():
-                            unique_categories.add(cat.strip())
-                    type_count = len(unique_categories)
-                else:
-                    type_count = 0
-            except:
+            categories = categories_resp.get('data') if categories_resp.get('success') else None
+            if categories:
+                # 使用原始分类列表去重
+                unique_categories = set()
+                for cat in categories:
+                    if cat and cat.strip():
+                        unique_categories.add(cat.strip())
+                type_count = len(unique_categories)
+            else:
                 type_count = 0
             
             for card in self.home_cards:
@@ -469,7 +503,8 @@ class UserWindow:
             self.books_tree.column(col, width=100)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.books_tree.yview)
-        self.books_tree.configure(yscrollcommand=scrollbar.set)
+        # 分页加载：滚动到底部附近时再请求下一页
+        self.books_loader = PagedTreeLoader(self.books_tree, scrollbar, self._insert_book_row)
         
         self.books_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -566,46 +601,32 @@ class UserWindow:
     
     
     def refresh_books(self):
-        """刷新图书列表"""
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
-        # 获取所有图书
-        books = self.client.search_books()
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book['id'],
-                book['title'],
-                book['author'],
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
+        """刷新图书列表（先加载第一页，滚动时加载后续页）"""
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page("", "", after_id, limit)
+        )
     
     def search_books(self):
         """搜索图书"""
         keyword = self.search_entry.get().strip()
-        books = self.client.search_books(keyword=keyword)
         
-        # 清空现有数据
-        for item in self.books_tree.get_children():
-            self.books_tree.delete(item)
-        
-        # 显示搜索结果
-        for book in books:
-            self.books_tree.insert("", tk.END, values=(
-                book['id'],
-                book['title'],
-                book['author'],
-                book.get('isbn', ''),
-                book.get('category', ''),
-                book.get('publisher', ''),
-                book.get('available_copies', 0),
-                book.get('status', 'available')
-            ))
+        # 显示搜索结果（同样分页加载）
+        self.books_loader.reset(
+            lambda after_id, limit: self.client.search_books_page(keyword, "", after_id, limit)
+        )
+    
+    def _insert_book_row(self, book):
+        """在图书列表末尾插入一行"""
+        self.books_tree.insert("", tk.END, values=(
+            book['id'],
+            book['title'],
+            book['author'],
+            book.get('isbn', ''),
+            book.get('category', ''),
+            book.get('publisher', ''),
+            book.get('available_copies', 0),
+            book.get('status', 'available')
+        ))
     
     def on_book_double_click(self, event):
         """双击图书事件"""
@@ -1212,18 +1233,24 @@ class UserWindow:
         # 获取所有借阅记录
         borrows = self.client.get_my_borrows(self.user['id'], status=None)
         
+        # 一次批量请求取回所有涉及的图书信息（同一本书只查一次）
+        book_ids = list(dict.fromkeys(b.get('book_id') for b in borrows if b.get('book_id')))
+        results = self.client.send_batch([('get_book', {'book_id': book_id}) for book_id in book_ids])
+        books = {
+            book_id: result.get('data')
+            for book_id, result in zip(book_ids, results)
+            if result.get('success')
+        }
+        
         # 统计各类图书数量
         category_count = {}
         for borrow in borrows:
-            # 获取图书信息
-            book_id = borrow.get('book_id')
-            if book_id:
-                book = self.client.get_book(book_id)
-                if book:
-                    category = book.get('category', '')
-                    # 映射到标准分类
-                    std_category = self._map_to_standard_category(category)
-                    category_count[std_category] = category_count.get(std_category, 0) + 1
+            book = books.get(borrow.get('book_id'))
+            if book:
+                category = book.get('category', '')
+                # 映射到标准分类
+                std_category = self._map_to_standard_category(category)
+                category_count[std_category] = category_count.get(std_category, 0) + 1
         
         return category_count
     
@@ -1454,8 +1481,10 @@ class UserWindow:
     def logout(self):
         """退出登录"""
         if messagebox.askyesno("确认", "确定要退出登录吗？"):
-            # 保存客户端连接状态
+            # 保存客户端连接状态，注销会话令牌
             client = self.client
+            if client.connected:
+                client.logout()
             self.root.destroy()
             # 重新打开登录窗口
             from gui_login import LoginWindow
@@ -0,0 +1,279 @@
+"""
+后台任务模块
+耗时的管理操作（如从 Open Library 导入上万本图书）提交后立即返回任务ID，在独立的线程池中执行，
+不占用处理请求的工作线程；客户端通过 get_job_status 轮询进度，通过 cancel_job 取消。
+
+任务的进度与断点保存在 jobs 表中：其他进程（多进程模式）也能查询进度和取消任务，
+服务端重启后未完成的任务从断点继续执行，或按配置标记为中断。
+
+每个任务记录执行它的进程（owner，主机名:pid），执行进程定期刷新 updated_at 作为心跳。
+负责恢复的进程（多进程模式下为 0 号工作进程）只接手执行进程已退出或心跳超时的任务，
+并以 owner 为条件的 UPDATE 抢占，仍在其他存活进程中运行的任务不会被重复执行。
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from database import Database
+from models import JobModel
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_INTERRUPTED = 'interrupted'
+
+# 进度写入数据库（同时检查取消请求）的最短间隔（秒）
+PERSIST_INTERVAL = 1.0
+
+# 心跳间隔（秒）；未结束任务超过 STALE_AFTER 秒没有心跳即视为执行进程已失效
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 60.0
+
+
+def owner_id() -> str:
+    """当前进程的任务执行者标识（fork 之后 pid 会变化，需在工作进程内调用）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """同一主机上的执行进程是否仍然存在；其他主机上的进程无法判断，按存活处理（交给心跳超时）"""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 无权发送信号（进程属于其他用户）说明进程存在
+        pass
+    return True
+
+
+class JobContext:
+    """传给任务函数的执行上下文：参数、断点、进度上报与取消检查"""
+
+    def __init__(self, model: JobModel, job: Dict[str, Any], owner: str):
+        self.model = model
+        self.owner = owner
+        self.job_id = job['id']
+        self.job_type = job['job_type']
+        self.params = job['params']
+        self.total = job['total']
+        # 断点与已有进度（继续执行的任务从上次保存的位置开始）
+        self.checkpoint = job['checkpoint']
+        self.done = job['done']
+        self.skipped = job['skipped']
+        self.created_at = job.get('created_at')
+        self._cancel = threading.Event()
+        self._started = time.monotonic()
+        self._done_at_start = self.done
+        self._persisted_at = 0.0
+
+    def report(self, done: int, skipped: int, checkpoint: Optional[Dict] = None, force: bool = False) -> None:
+        """更新进度（done、skipped 为累计值），按间隔写入数据库并检查是否被请求取消"""
+        self.done = done
+        self.skipped = skipped
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        now = time.monotonic()
+        if force or now - self._persisted_at >= PERSIST_INTERVAL:
+            self._persisted_at = now
+            if self.model.save_progress(self.job_id, done, skipped, self.checkpoint, self.owner):
+                self._cancel.set()
+
+    def cancelled(self) -> bool:
+        """任务应当尽快停止（被取消或服务端正在关闭）"""
+        return self._cancel.is_set()
+
+    def eta(self) -> Optional[float]:
+        """按本次运行的速度估算剩余秒数"""
+        finished = self.done - self._done_at_start
+        elapsed = time.monotonic() - self._started
+        if finished <= 0 or elapsed <= 0:
+            return None
+        return max(0.0, (self.total - self.done) * elapsed / finished)
+
+    def status(self) -> Dict[str, Any]:
+        eta = self.eta()
+        return {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'status': JOB_RUNNING,
+            'total': self.total,
+            'done': self.done,
+            'skipped': self.skipped,
+            'progress': round(self.done / self.total, 4) if self.total else 0.0,
+            'eta_s': round(eta, 1) if eta is not None else None,
+            'message': '',
+            'created_at': self.created_at,
+        }
+
+
+class JobManager:
+    """后台任务管理
+
+    register(job_type, runner) 登记任务函数 runner(ctx) -> 结束消息；
+    runner 应定期调用 ctx.report() 并在 ctx.cancelled() 为 True 时尽快返回。
+    """
+
+    def __init__(self, db: Database, workers: int = 2):
+        self.model = JobModel(db)
+        self.workers = workers
+        self._runners: Dict[str, Callable[[JobContext], str]] = {}
+        self._active: Dict[int, JobContext] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = False
+        self._recover = False
+        self._resume = True
+        self.owner = owner_id()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def register(self, job_type: str, runner: Callable[[JobContext], str]) -> None:
+        self._runners[job_type] = runner
+
+    def start(self, recover: bool = True, resume: bool = True) -> None:
+        """启动任务线程池与心跳线程；recover 时接手执行进程已失效的未完成任务
+        （启动时一次，之后每 STALE_AFTER 秒检查一次；resume 为 False 时标记为中断）
+        """
+        self._stopping = False
+        self._recover = recover
+        self._resume = resume
+        self.owner = owner_id()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        if recover:
+            self._recover_orphans()
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+
+    def shutdown(self) -> None:
+        """停止任务线程池；正在运行的任务保存断点后退出，状态保持 running，
+        由下次启动的进程（本进程已退出）接手继续
+        """
+        self._stopping = True
+        self._heartbeat_stop.set()
+        with self._lock:
+            for ctx in self._active.values():
+                ctx._cancel.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _orphaned(self, job: Dict[str, Any]) -> bool:
+        """任务的执行进程已退出或心跳超时"""
+        if job.get('owner') == self.owner:
+            return False
+        if not _owner_alive(job.get('owner')):
+            return True
+        return job.get('idle_s') is not None and job['idle_s'] >= STALE_AFTER
+
+    def _recover_orphans(self) -> None:
+        try:
+            jobs = self.model.get_unfinished_jobs()
+        except Exception as e:
+            print(f"检查未完成任务失败: {e}")
+            return
+        for job in jobs:
+            if self._stopping or not self._orphaned(job):
+                continue
+            if self._resume and job['job_type'] in self._runners:
+                # 以原执行者为条件抢占，其他进程同时接手时只有一方成功
+                if not self.model.claim_job(job['id'], self.owner, job.get('owner')):
+                    continue
+                print(f"继续执行未完成的任务 {job['id']}（{job['job_type']}，已完成 {job['done']}/{job['total']}）")
+                self._executor.submit(self._run, job['id'])
+            else:
+                self.model.finish_job(job['id'], JOB_INTERRUPTED, '服务端重启，任务已中断', owner=job.get('owner'))
+
+    def _heartbeat_loop(self) -> None:
+        last_recover = time.monotonic()
+        while not self._heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.model.heartbeat(self.owner)
+            except Exception as e:
+                print(f"任务心跳失败: {e}")
+            if self._recover and time.monotonic() - last_recover >= STALE_AFTER:
+                last_recover = time.monotonic()
+                self._recover_orphans()
+
+    def submit(self, job_type: str, params: Dict[str, Any], total: int,
+               created_by: Optional[int] = None) -> Optional[int]:
+        """登记任务并放入线程池，返回任务ID（登记失败时返回 None）"""
+        if job_type not in self._runners or self._executor is None:
+            return None
+        job_id = self.model.create_job(job_type, params, total, created_by, owner=self.owner)
+        if job_id is not None:
+            self._executor.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """取消任务；任务在其他进程中运行时，由该进程在下次保存进度时发现取消请求"""
+        requested = self.model.request_cancel(job_id)
+        with self._lock:
+            ctx = self._active.get(job_id)
+        if ctx is not None:
+            ctx._cancel.set()
+        return requested
+
+    def status(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """任务状态与进度；本进程正在运行的任务直接取内存中的最新进度"""
+        with self._lock:
+            ctx = self._active.get(job_id)
+        if ctx is not None:
+            return ctx.status()
+        job = self.model.get_job(job_id)
+        if job is None:
+            return None
+        eta = None
+        if job['status'] == JOB_RUNNING and job['done'] and job.get('started_at') and job.get('updated_at'):
+            elapsed = (job['updated_at'] - job['started_at']).total_seconds()
+            eta = round(max(0.0, (job['total'] - job['done']) * elapsed / job['done']), 1)
+        return {
+            'job_id': job['id'],
+            'job_type': job['job_type'],
+            'status': job['status'],
+            'total': job['total'],
+            'done': job['done'],
+            'skipped': job['skipped'],
+            'progress': round(job['done'] / job['total'], 4) if job['total'] else 0.0,
+            'eta_s': eta,
+            'message': job.get('message') or '',
+            'created_at': job.get('created_at'),
+            'finished_at': job.get('finished_at'),
+        }
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._active)
+
+    def _run(self, job_id: int) -> None:
+        job = self.model.get_job(job_id)
+        if job is None or self._stopping or not self.model.mark_running(job_id, self.owner):
+            # 排队期间已被取消，或已被其他进程接手
+            return
+        ctx = JobContext(self.model, job, self.owner)
+        with self._lock:
+            self._active[job_id] = ctx
+        try:
+            message = self._runners[job['job_type']](ctx) or ''
+            ctx.report(ctx.done, ctx.skipped, force=True)
+            if self._stopping:
+                return
+            self.model.finish_job(job_id, JOB_CANCELLED if ctx.cancelled() else JOB_COMPLETED, message,
+                                  owner=self.owner)
+        except Exception as e:
+            print(f"任务 {job_id} 执行失败: {e}")
+            self.model.finish_job(job_id, JOB_FAILED, f'任务执行失败: {str(e)}', owner=self.owner)
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
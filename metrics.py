@@ -0,0 +1,211 @@
+"""
+服务端运行指标模块
+按操作统计请求次数、延迟直方图、请求/响应字节数、错误数与超过截止时间的请求数，按算法统计帧压缩效果
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 延迟直方图的桶上限（毫秒），最后还有一个 +inf 桶
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _ActionStats:
+    """单个操作的累计统计"""
+
+    __slots__ = ('count', 'failures', 'errors', 'slow', 'expired', 'total_ms', 'max_ms',
+                 'buckets', 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.errors = 0
+        self.slow = 0
+        self.expired = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """根据直方图估算百分位延迟（取所在桶的上限）"""
+        if not self.count:
+            return None
+        target = self.count * pct / 100.0
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            cumulative += n
+            if cumulative >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        histogram = {f'<={b}ms': n for b, n in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram['+inf'] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'errors': self.errors,
+            'slow': self.slow,
+            'deadline_exceeded': self.expired,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'histogram': histogram,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'avg_response_bytes': round(self.response_bytes / self.count) if self.count else 0,
+        }
+
+
+class _CompressionStats:
+    """单个压缩算法的累计统计"""
+
+    __slots__ = ('frames', 'skipped', 'raw_bytes', 'wire_bytes', 'compress_ms',
+                 'inbound_frames', 'inbound_raw_bytes', 'inbound_wire_bytes', 'decompress_ms')
+
+    def __init__(self):
+        self.frames = 0
+        self.skipped = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.compress_ms = 0.0
+        self.inbound_frames = 0
+        self.inbound_raw_bytes = 0
+        self.inbound_wire_bytes = 0
+        self.decompress_ms = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'raw_bytes': self.raw_bytes,
+            'wire_bytes': self.wire_bytes,
+            'ratio': round(self.raw_bytes / self.wire_bytes, 3) if self.wire_bytes else None,
+            'compress_ms': round(self.compress_ms, 3),
+            'avg_compress_ms': round(self.compress_ms / self.frames, 3) if self.frames else 0.0,
+            'inbound_frames': self.inbound_frames,
+            'inbound_ratio': (round(self.inbound_raw_bytes / self.inbound_wire_bytes, 3)
+                              if self.inbound_wire_bytes else None),
+            'decompress_ms': round(self.decompress_ms, 3),
+        }
+
+
+class ServerMetrics:
+    """线程安全的服务端指标收集器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._actions: Dict[str, _ActionStats] = {}
+        self._compression: Dict[str, _CompressionStats] = {}
+        self._started_at = time.time()
+
+    def record_request(self, action: str, elapsed: float, request_bytes: int,
+                       response_bytes: int, success: bool = True, error: bool = False,
+                       slow: bool = False, expired: bool = False) -> None:
+        """记录一次请求
+
+        elapsed: 处理耗时（秒）
+        success: 响应中的 success 字段
+        error: 是否为服务端异常（响应带 error 字段）
+        slow: 是否超过该操作的期望处理时间
+        expired: 是否因超过客户端给出的截止时间而未处理或被中断
+        """
+        elapsed_ms = elapsed * 1000
+        index = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            stats = self._actions.get(action)
+            if stats is None:
+                stats = self._actions[action] = _ActionStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.buckets[index] += 1
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            if not success:
+                stats.failures += 1
+            if error:
+                stats.errors += 1
+            if slow:
+                stats.slow += 1
+            if expired:
+                stats.expired += 1
+
+    def record_compression(self, algorithm: str, raw_bytes: int, wire_bytes: int,
+                           elapsed: float) -> None:
+        """记录一次响应压缩
+
+        wire_bytes: 实际发送的字节数；压缩后没有变小而按原样发送时与 raw_bytes 相同
+        elapsed: 压缩耗时（秒）
+        """
+        with self._lock:
+            stats = self._compression_stats(algorithm)
+            stats.frames += 1
+            stats.raw_bytes += raw_bytes
+            stats.wire_bytes += wire_bytes
+            stats.compress_ms += elapsed * 1000
+            if wire_bytes >= raw_bytes:
+                stats.skipped += 1
+
+    def record_decompression(self, algorithm: str, wire_bytes: int, raw_bytes: int,
+                             elapsed: float) -> None:
+        """记录一次请求解压"""
+        with self._lock:
+            stats = self._compression_stats(algorithm)
+            stats.inbound_frames += 1
+            stats.inbound_wire_bytes += wire_bytes
+            stats.inbound_raw_bytes += raw_bytes
+            stats.decompress_ms += elapsed * 1000
+
+    def _compression_stats(self, algorithm: str) -> _CompressionStats:
+        stats = self._compression.get(algorithm)
+        if stats is None:
+            stats = self._compression[algorithm] = _CompressionStats()
+        return stats
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前指标快照"""
+        with self._lock:
+            actions = {name: stats.to_dict() for name, stats in sorted(self._actions.items())}
+            compression = {name: stats.to_dict() for name, stats in sorted(self._compression.items())}
+        return {
+            'uptime_s': round(time.time() - self._started_at, 1),
+            'total_requests': sum(a['count'] for a in actions.values()),
+            'actions': actions,
+            'compression': compression,
+        }
+
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个进程的 snapshot()：各操作的计数、字节数与直方图相加，百分位按合并后的直方图重新估算"""
+    merged: Dict[str, _ActionStats] = {}
+    for snapshot in snapshots:
+        for name, item in (snapshot.get('actions') or {}).items():
+            stats = merged.get(name)
+            if stats is None:
+                stats = merged[name] = _ActionStats()
+            stats.count += item['count']
+            stats.failures += item['failures']
+            stats.errors += item['errors']
+            stats.slow += item['slow']
+            stats.expired += item.get('deadline_exceeded', 0)
+            stats.total_ms += item['avg_ms'] * item['count']
+            stats.max_ms = max(stats.max_ms, item['max_ms'])
+            for i, n in enumerate(item['histogram'].values()):
+                stats.buckets[i] += n
+            stats.request_bytes += item['request_bytes']
+            stats.response_bytes += item['response_bytes']
+    actions = {name: stats.to_dict() for name, stats in sorted(merged.items())}
+    return {
+        'total_requests': sum(a['count'] for a in actions.values()),
+        'actions': actions,
+    }
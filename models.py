@@ -2,10 +2,12 @@
 数据模型模块
 定义业务逻辑相关的数据操作
 """
-from database import Database
-from typing import Optional, List, Dict, Tuple, Any
+from database import BULK_INSERT_CHUNK, BulkInsertResult, Database
+from tracing import traced
+from typing import Iterator, Optional, List, Dict, Sequence, Tuple, Any
 from datetime import datetime, timedelta
 import hashlib
+import json
 import re
 import smtplib
 from email.mime.text import MIMEText
@@ -17,6 +19,9 @@ except Exception:
 
 _UNSET = object()
 
+# 群发邮件时每条多行 INSERT 的大致字节上限（主题和正文在每行中重复）
+EMAIL_INSERT_BYTES = 512 * 1024
+
 
 def _normalize_age(age: Any) -> Optional[int]:
     """将年龄标准化为整数或None"""
@@ -34,6 +39,54 @@ def _normalize_age(age: Any) -> Optional[int]:
         raise ValueError("年龄必须在0到150之间")
     return age_int
 
+
+# 游标分页的默认每页行数与上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# 估计行数低于该值时直接精确计数（小表 COUNT(*) 很快，统计值误差反而明显）
+EXACT_COUNT_BELOW = 10000
+
+
+def _fetch_page(db: Database, select: str, table: str, key: str, conditions: List[str],
+                params: List, after_id: Optional[int], limit: Optional[int],
+                count_from: Optional[str] = None) -> Dict:
+    """按主键倒序的游标（keyset）分页：返回 key < after_id 的下一页
+    不使用 OFFSET，翻到多深都只读取一页的行。
+    第一页（after_id 为 None）同时给出总数：没有筛选条件的大表取 information_schema 中的估计值，
+    其余情况精确计数；后续页不再计数。
+    返回 {'items': 行列表, 'next_after_id': 下一页游标（没有更多时为 None）, 'total': 总数, 'estimated': 是否为估计值}
+    """
+    try:
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if after_id is not None:
+        page_conditions.append(f"{key} < ?")
+        page_params.append(after_id)
+    where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+    rows = db.execute_query(f"{select}{where} ORDER BY {key} DESC LIMIT ?", tuple(page_params) + (limit + 1,))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    page = {
+        'items': rows,
+        'next_after_id': rows[-1][key.split('.')[-1]] if has_more else None,
+        'total': None,
+        'estimated': False,
+    }
+    if after_id is None:
+        total = db.estimate_row_count(table) if not conditions else None
+        if total is not None and total >= EXACT_COUNT_BELOW:
+            page['total'], page['estimated'] = total, True
+        else:
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            result = db.execute_query(f"SELECT COUNT(*) AS total FROM {count_from or table}{where}", tuple(params))
+            page['total'] = result[0]['total'] if result else len(rows)
+    return page
+
+
+@traced
 class UserModel:
     """用户模型"""
     
@@ -139,6 +192,21 @@ class UserModel:
             user.pop('password', None)
         return users
     
+    def iter_all_users(self, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """逐批产出所有用户（不含密码字段），排序同 get_all_users"""
+        return self.db.stream_query(
+            "SELECT id, username, role, name, email, phone, age, created_at FROM users ORDER BY id DESC",
+            (),
+            batch_size
+        )
+    
+    def get_all_users_page(self, after_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """分页获取用户（管理员），按 id 倒序，格式见 _fetch_page"""
+        page = _fetch_page(self.db, "SELECT * FROM users", 'users', 'id', [], [], after_id, limit)
+        for user in page['items']:
+            user.pop('password', None)
+        return page
+    
     def get_role_counts(self) -> List[Dict]:
         """获取用户角色数量"""
         rows = self.db.execute_query(
@@ -151,8 +219,24 @@ class UserModel:
         return rows or []
     
     def get_age_distribution(self) -> Dict[str, int]:
-        """获取年龄段统计"""
-        rows = self.db.execute_query("SELECT age FROM users WHERE age IS NOT NULL")
+        """获取年龄段统计（在数据库中分段计数）"""
+        rows = self.db.execute_query(
+            """
+            SELECT
+                CASE
+                    WHEN age <= 17 THEN '0-17'
+                    WHEN age <= 25 THEN '18-25'
+                    WHEN age <= 35 THEN '26-35'
+                    WHEN age <= 45 THEN '36-45'
+                    WHEN age <= 60 THEN '46-60'
+                    ELSE '60+'
+                END AS bucket,
+                COUNT(*) AS count
+            FROM users
+            WHERE age IS NOT NULL
+            GROUP BY bucket
+            """
+        )
         buckets = {
             '0-17': 0,
             '18-25': 0,
@@ -161,22 +245,9 @@ class UserModel:
             '46-60': 0,
             '60+': 0
         }
-        for row in rows:
-            age = row.get('age')
-            if age is None:
-                continue
-            if age <= 17:
-                buckets['0-17'] += 1
-            elif age <= 25:
-                buckets['18-25'] += 1
-            elif age <= 35:
-                buckets['26-35'] += 1
-            elif age <= 45:
-                buckets['36-45'] += 1
-            elif age <= 60:
-                buckets['46-60'] += 1
-            else:
-                buckets['60+'] += 1
+        for row in rows or []:
+            if row.get('bucket') in buckets:
+                buckets[row['bucket']] = int(row.get('count') or 0)
         return buckets
     
     def get_registration_trend(self, months: int = 12) -> List[Dict]:
@@ -313,6 +384,7 @@ class UserModel:
             print(f"删除用户失败: {e}")
             return False
 
+@traced
 class BookModel:
     """图书模型"""
     
@@ -404,9 +476,19 @@ class BookModel:
         return '其他类'
     
     def get_category_summary(self) -> List[Dict]:
-        """获取各分类图书数量与库存（使用标准分类）"""
+        """获取各分类图书数量与库存（使用标准分类）
+        先在数据库中按原始分类汇总，再把每个不同的分类映射到标准分类，
+        映射次数与分类种数有关，与图书数量无关
+        """
         rows = self.db.execute_query(
-            "SELECT category, total_copies, available_copies FROM books"
+            """
+            SELECT category,
+                   COUNT(*) AS book_count,
+                   COALESCE(SUM(total_copies), 0) AS total_copies,
+                   COALESCE(SUM(available_copies), 0) AS available_copies
+            FROM books
+            GROUP BY category
+            """
         )
         if not rows:
             return []
@@ -414,8 +496,9 @@ class BookModel:
         summary: Dict[str, Dict[str, int]] = {}
         for row in rows:
             category_str = (row.get('category') or '').strip()
-            total = row.get('total_copies') or 0
-            available = row.get('available_copies') or 0
+            count = int(row.get('book_count') or 0)
+            total = int(row.get('total_copies') or 0)
+            available = int(row.get('available_copies') or 0)
             
             # 将整个分类字符串映射到标准分类（处理多个分类的情况）
             # 如果分类字符串包含多个分类，取第一个匹配的标准分类
@@ -436,7 +519,7 @@ class BookModel:
                 std_category,
                 {'category': std_category, 'book_count': 0, 'total_copies': 0, 'available_copies': 0}
             )
-            stats['book_count'] += 1
+            stats['book_count'] += count
             stats['total_copies'] += total
             stats['available_copies'] += available
         
@@ -484,6 +567,26 @@ class BookModel:
             print(f"添加图书失败: {e}")
             return False
     
+    def add_books(self, books: Sequence[Dict], chunk_size: int = BULK_INSERT_CHUNK) -> BulkInsertResult:
+        """批量添加图书（字典字段同 add_book 的参数），多行插入
+        返回每本书的ID与插入失败的行（如 ISBN 重复）
+        """
+        rows = []
+        for book in books:
+            total_copies = book.get('total_copies', 1)
+            rows.append((
+                book['title'], book['author'], book.get('isbn', ''), book.get('category', ''),
+                book.get('publisher', ''), book.get('publish_date', ''), total_copies, total_copies,
+                'unavailable' if total_copies <= 0 else 'available'
+            ))
+        return self.db.bulk_insert(
+            'books',
+            ('title', 'author', 'isbn', 'category', 'publisher', 'publish_date',
+             'total_copies', 'available_copies', 'status'),
+            rows,
+            chunk_size
+        )
+    
     def get_book(self, book_id: int) -> Optional[Dict]:
         """获取图书信息"""
         books = self.db.execute_query("SELECT * FROM books WHERE id = ?", (book_id,))
@@ -491,7 +594,34 @@ class BookModel:
     
     def search_books(self, keyword: str = "", category: str = "") -> List[Dict]:
         """搜索图书"""
-        query = "SELECT * FROM books WHERE 1=1"
+        query, params = self._search_books_query(keyword, category)
+        result = self.db.execute_query(query, params)
+        return result
+    
+    def iter_search_books(self, keyword: str = "", category: str = "",
+                          batch_size: int = 500) -> Iterator[List[Dict]]:
+        """逐批产出搜索结果，条件与排序同 search_books"""
+        query, params = self._search_books_query(keyword, category)
+        return self.db.stream_query(query, params, batch_size)
+    
+    def search_books_page(self, keyword: str = "", category: str = "", after_id: Optional[int] = None,
+                          limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """分页搜索图书，条件与排序同 search_books，格式见 _fetch_page"""
+        conditions, params = self._search_books_conditions(keyword, category)
+        return _fetch_page(self.db, "SELECT * FROM books", 'books', 'id', conditions, params, after_id, limit)
+    
+    def _search_books_query(self, keyword: str, category: str) -> Tuple[str, Tuple]:
+        """构造搜索图书的 SQL 与参数"""
+        conditions, params = self._search_books_conditions(keyword, category)
+        query = "SELECT * FROM books"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC"
+        return query, tuple(params)
+    
+    def _search_books_conditions(self, keyword: str, category: str) -> Tuple[List[str], List]:
+        """搜索图书的筛选条件与参数"""
+        conditions = []
         params = []
         
         # 确保 keyword 和 category 是字符串，并去除首尾空格
@@ -499,17 +629,15 @@ class BookModel:
         category = str(category).strip() if category else ""
         
         if keyword:
-            query += " AND (title LIKE ? OR author LIKE ? OR isbn LIKE ?)"
+            conditions.append("(title LIKE ? OR author LIKE ? OR isbn LIKE ?)")
             keyword_pattern = f"%{keyword}%"
             params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
         
         if category:
-            query += " AND category = ?"
+            conditions.append("category = ?")
             params.append(category)
         
-        query += " ORDER BY id DESC"
-        result = self.db.execute_query(query, tuple(params))
-        return result
+        return conditions, params
     
     def update_book(self, book_id: int, **kwargs) -> bool:
         """更新图书信息"""
@@ -592,6 +720,17 @@ class BookModel:
         )
         return [cat['category'] for cat in categories]
 
+def borrow_limit(role: str) -> Tuple[int, str]:
+    """根据用户角色返回 (借阅上限, 角色名称)"""
+    if role == 'user':
+        return 2, "普通用户"  # 普通用户最多借阅2本
+    if role == 'member':
+        return 5, "会员用户"  # 会员用户最多借阅5本
+    # 管理员或其他角色，设置一个较大的限制（或不限制）
+    return 999, "管理员"
+
+
+@traced
 class BorrowModel:
     """借阅模型"""
     
@@ -646,27 +785,31 @@ class BorrowModel:
         )
         return rows or []
     
-    def get_borrow_durations(self) -> List[int]:
-        """返回所有已归还记录的借阅时长"""
+    def get_borrow_durations(self) -> List[Dict]:
+        """已归还记录的借阅时长分布：[{'days': 天数, 'count': 记录数}]，按天数升序"""
         rows = self.db.execute_query(
             """
-            SELECT GREATEST(DATEDIFF(return_date, borrow_date), 0) AS duration
+            SELECT GREATEST(DATEDIFF(return_date, borrow_date), 0) AS days, COUNT(*) AS count
             FROM borrow_records
             WHERE return_date IS NOT NULL AND status = 'returned'
+            GROUP BY days
+            ORDER BY days
             """
         )
-        return [row['duration'] for row in rows if row.get('duration') is not None]
+        return rows or []
     
-    def get_overdue_days(self) -> List[int]:
-        """返回逾期天数集合"""
+    def get_overdue_days(self) -> List[Dict]:
+        """逾期归还记录的逾期天数分布：[{'days': 天数, 'count': 记录数}]，按天数升序"""
         rows = self.db.execute_query(
             """
-            SELECT GREATEST(DATEDIFF(return_date, due_date), 0) AS overdue_days
+            SELECT DATEDIFF(return_date, due_date) AS days, COUNT(*) AS count
             FROM borrow_records
             WHERE return_date IS NOT NULL AND DATEDIFF(return_date, due_date) > 0
+            GROUP BY days
+            ORDER BY days
             """
         )
-        return [row['overdue_days'] for row in rows if row.get('overdue_days') is not None]
+        return rows or []
     
     def get_top_borrowers(self, limit: int = 10) -> List[Dict]:
         """借阅次数 TOP N"""
@@ -688,70 +831,59 @@ class BorrowModel:
         )
         return rows or []
     
-    def borrow_book(self, user_id: int, book_id: int, days: int = 30) -> Tuple[bool, str]:
+    def borrow_book(self, user_id: int, book_id: int, days: int = 30,
+                    limit: Optional[Tuple[int, str]] = None) -> Tuple[bool, str]:
         """借阅图书
+        limit: (借阅上限, 角色名称)，调用方已从会话中得到时传入，此时不再查询用户角色
+        在同一个事务中完成：锁定用户行并统计当前借阅数，再用一条带条件的 UPDATE 扣减可借数量，
+        影响行数为 0 即没有可借副本，最后插入借阅记录；并发借阅同一本书的最后一本时只有一个请求成功，
+        可借数量不会变成负数。
+        用户行的锁与借阅数统计是有意保留的：同一用户的并发借阅依次检查上限，不会同时通过检查而超出上限；
+        两者在同一条语句中完成，借书时只多一次往返
         返回: (成功标志, 错误信息)
         """
         try:
-            # 检查图书是否可借
-            book = BookModel(self.db).get_book(book_id)
-            if not book or book['available_copies'] <= 0:
-                return False, "该图书暂无可借副本"
-            
-            # 获取用户信息，检查借阅数量限制
-            user = UserModel(self.db).get_user(user_id)
-            if not user:
-                return False, "用户不存在"
-            
-            # 查询用户当前未归还的借阅数量
-            current_borrows = self.db.execute_query(
-                """SELECT COUNT(*) as count FROM borrow_records 
-                   WHERE user_id = ? AND status = 'borrowed'""",
-                (user_id,)
-            )
-            current_count = current_borrows[0]['count'] if current_borrows else 0
-            
-            # 根据用户角色设置借阅限制
-            user_role = user.get('role', 'user')
-            if user_role == 'user':
-                max_borrows = 2  # 普通用户最多借阅2本
-                role_name = "普通用户"
-            elif user_role == 'member':
-                max_borrows = 5  # 会员用户最多借阅5本
-                role_name = "会员用户"
-            else:
-                # 管理员或其他角色，设置一个较大的限制（或不限制）
-                max_borrows = 999  # 管理员基本不限制
-                role_name = "管理员"
-            
-            # 检查是否超过借阅限制
-            if current_count >= max_borrows:
-                return False, f"{role_name}最多可借阅{max_borrows}本，您当前已借阅{current_count}本，无法继续借阅"
-            
-            # 计算归还日期
-            borrow_date = datetime.now().date()
-            due_date = borrow_date + timedelta(days=days)
-            
-            # 创建借阅记录
-            self.db.execute_insert(
-                """INSERT INTO borrow_records (user_id, book_id, borrow_date, due_date, status)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (user_id, book_id, borrow_date, due_date, 'borrowed')
-            )
-            
-            # 更新图书可借数量
-            self.db.execute_update(
-                "UPDATE books SET available_copies = available_copies - 1 WHERE id = ?",
-                (book_id,)
-            )
-            
-            # 检查可借数量，如果为0则设置状态为unavailable
-            updated_book = BookModel(self.db).get_book(book_id)
-            if updated_book and updated_book['available_copies'] <= 0:
-                self.db.execute_update(
-                    "UPDATE books SET status = 'unavailable' WHERE id = ?",
-                    (book_id,)
+            with self.db.transaction():
+                # 锁定用户行直到事务结束，并统计当前未归还的借阅数量（没有 limit 时一并取角色）
+                users = self.db.execute_query(
+                    f"""SELECT {'role, ' if limit is None else ''}
+                              (SELECT COUNT(*) FROM borrow_records
+                               WHERE user_id = users.id AND status = 'borrowed') AS borrowed
+                       FROM users WHERE id = ? FOR UPDATE""",
+                    (user_id,)
                 )
+                if not users:
+                    return False, "用户不存在"
+                if limit is None:
+                    limit = borrow_limit(users[0].get('role', 'user'))
+                max_borrows, role_name = limit
+                current_count = users[0]['borrowed']
+                
+                # 检查是否超过借阅限制
+                if current_count >= max_borrows:
+                    return False, f"{role_name}最多可借阅{max_borrows}本，您当前已借阅{current_count}本，无法继续借阅"
+                
+                # 有可借副本时扣减，最后一本借出时同时设为不可借（status 在前，取的是扣减前的数量）
+                if not self.db.execute_update(
+                    """UPDATE books
+                       SET status = CASE WHEN available_copies <= 1 THEN 'unavailable' ELSE status END,
+                           available_copies = available_copies - 1
+                       WHERE id = ? AND available_copies > 0""",
+                    (book_id,)
+                ):
+                    return False, "该图书暂无可借副本"
+                
+                # 计算归还日期
+                borrow_date = datetime.now().date()
+                due_date = borrow_date + timedelta(days=days)
+                
+                # 创建借阅记录
+                if not self.db.execute_insert(
+                    """INSERT INTO borrow_records (user_id, book_id, borrow_date, due_date, status)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (user_id, book_id, borrow_date, due_date, 'borrowed')
+                ):
+                    return False, "借阅失败"
             
             return True, "借阅成功"
         except Exception as e:
@@ -759,40 +891,37 @@ class BorrowModel:
             return False, f"借阅失败: {str(e)}"
     
     def return_book(self, record_id: int) -> bool:
-        """归还图书"""
+        """归还图书
+        借阅记录在读取时加锁，同一条记录并发归还时只有一次生效，可借数量只增加一次
+        """
         try:
-            # 获取借阅记录
-            records = self.db.execute_query(
-                "SELECT * FROM borrow_records WHERE id = ?", (record_id,)
-            )
-            if not records:
-                return False
-            
-            record = records[0]
-            if record['status'] == 'returned':
-                return False
-            
-            # 更新借阅记录
-            return_date = datetime.now().date()
-            self.db.execute_update(
-                """UPDATE borrow_records SET return_date = ?, status = 'returned'
-                   WHERE id = ?""",
-                (return_date, record_id)
-            )
-            
-            # 更新图书可借数量
-            book_id = record['book_id']
-            self.db.execute_update(
-                "UPDATE books SET available_copies = available_copies + 1 WHERE id = ?",
-                (book_id,)
-            )
-            
-            # 检查可借数量，如果>0且当前状态是unavailable，则设置为available
-            updated_book = BookModel(self.db).get_book(book_id)
-            if updated_book and updated_book['available_copies'] > 0 and updated_book['status'] == 'unavailable':
+            with self.db.transaction():
+                # 获取借阅记录（锁定到事务结束）
+                records = self.db.execute_query(
+                    "SELECT book_id, status FROM borrow_records WHERE id = ? FOR UPDATE", (record_id,)
+                )
+                if not records:
+                    return False
+                
+                record = records[0]
+                if record['status'] == 'returned':
+                    return False
+                
+                # 更新借阅记录
+                return_date = datetime.now().date()
                 self.db.execute_update(
-                    "UPDATE books SET status = 'available' WHERE id = ?",
-                    (book_id,)
+                    """UPDATE borrow_records SET return_date = ?, status = 'returned'
+                       WHERE id = ?""",
+                    (return_date, record_id)
+                )
+                
+                # 增加可借数量；原来不可借且归还后有可借副本时恢复为可借
+                self.db.execute_update(
+                    """UPDATE books
+                       SET status = IF(status = 'unavailable' AND available_copies + 1 > 0, 'available', status),
+                           available_copies = available_copies + 1
+                       WHERE id = ?""",
+                    (record['book_id'],)
                 )
             
             return True
@@ -803,70 +932,90 @@ class BorrowModel:
     def update_borrow(self, record_id: int, status: str = None, due_date: Any = None,
                       return_date: Any = None, fine_amount: Any = None) -> bool:
         """更新借阅记录（管理员可用）
-        支持更新 status/due_date/return_date/fine_amount，并同步更新图书可借数量与状态
+        支持更新 status/due_date/return_date/fine_amount，并在同一个事务中同步更新图书可借数量与状态
         """
         try:
-            # 查询原始记录
-            rows = self.db.execute_query("SELECT * FROM borrow_records WHERE id = ?", (record_id,))
-            if not rows:
-                return False
-            record = rows[0]
-            old_status = record.get('status')
-            book_id = record.get('book_id')
-
-            updates = []
-            params = []
-            if status is not None:
-                updates.append("status = ?")
-                params.append(status)
-            if due_date is not None:
-                updates.append("due_date = ?")
-                params.append(due_date)
-            if return_date is not None:
-                updates.append("return_date = ?")
-                params.append(return_date)
-            if fine_amount is not None:
-                updates.append("fine_amount = ?")
-                params.append(fine_amount)
-
-            if not updates:
-                return False
+            with self.db.transaction():
+                # 查询原始记录（锁定到事务结束）
+                rows = self.db.execute_query(
+                    "SELECT book_id, status FROM borrow_records WHERE id = ? FOR UPDATE", (record_id,)
+                )
+                if not rows:
+                    return False
+                record = rows[0]
+                old_status = record.get('status')
+                book_id = record.get('book_id')
 
-            params.append(record_id)
-            query = f"UPDATE borrow_records SET {', '.join(updates)} WHERE id = ?"
-            updated = self.db.execute_update(query, tuple(params)) > 0
-
-            # 同步图书表的 available_copies 与 status
-            if updated and book_id:
-                # 重新读取记录以获取新状态
-                new_rec = self.db.execute_query("SELECT * FROM borrow_records WHERE id = ?", (record_id,))
-                new_status = new_rec[0].get('status') if new_rec else None
-                # 如果由非返回状态变为已归还，需要增加可借数量
-                if old_status != 'returned' and new_status == 'returned':
-                    self.db.execute_update(
-                        "UPDATE books SET available_copies = available_copies + 1 WHERE id = ?",
-                        (book_id,)
-                    )
-                # 如果由已归还变为非已归还（管理员恢复借阅），则减少可借数量（但不小于0）
-                if old_status == 'returned' and new_status != 'returned':
+                updates = []
+                params = []
+                if status is not None:
+                    updates.append("status = ?")
+                    params.append(status)
+                if due_date is not None:
+                    updates.append("due_date = ?")
+                    params.append(due_date)
+                if return_date is not None:
+                    updates.append("return_date = ?")
+                    params.append(return_date)
+                if fine_amount is not None:
+                    updates.append("fine_amount = ?")
+                    params.append(fine_amount)
+
+                if not updates:
+                    return False
+
+                params.append(record_id)
+                query = f"UPDATE borrow_records SET {', '.join(updates)} WHERE id = ?"
+                updated = self.db.execute_update(query, tuple(params)) > 0
+
+                # 同步图书表的 available_copies 与 status（一条语句完成）
+                if updated and book_id:
+                    new_status = old_status if status is None else status
+                    if old_status != 'returned' and new_status == 'returned':
+                        # 由非返回状态变为已归还，增加可借数量
+                        copies = "available_copies + 1"
+                    elif old_status == 'returned' and new_status != 'returned':
+                        # 由已归还变为非已归还（管理员恢复借阅），减少可借数量（但不小于0）
+                        copies = "GREATEST(available_copies - 1, 0)"
+                    else:
+                        copies = "available_copies"
                     self.db.execute_update(
-                        "UPDATE books SET available_copies = GREATEST(available_copies - 1, 0) WHERE id = ?",
+                        f"""UPDATE books
+                            SET status = IF({copies} <= 0, 'unavailable', 'available'),
+                                available_copies = {copies}
+                            WHERE id = ?""",
                         (book_id,)
                     )
-                # 调整图书状态字段
-                updated_book = self.db.execute_query("SELECT * FROM books WHERE id = ?", (book_id,))
-                if updated_book:
-                    ab = updated_book[0].get('available_copies', 0)
-                    if ab <= 0:
-                        self.db.execute_update("UPDATE books SET status = 'unavailable' WHERE id = ?", (book_id,))
-                    else:
-                        self.db.execute_update("UPDATE books SET status = 'available' WHERE id = ?", (book_id,))
 
             return updated
         except Exception as e:
             print(f"更新借阅记录失败: {e}")
             return False
     
+    def get_borrow(self, record_id: int, details: bool = False) -> Optional[Dict]:
+        """获取单条借阅记录；details 为 True 时带上书名、作者与借阅人（字段同 get_all_borrows）"""
+        if details:
+            rows = self.db.execute_query(
+                """SELECT br.*, b.title, b.author, u.name as user_name, u.username
+                   FROM borrow_records br
+                   JOIN books b ON br.book_id = b.id
+                   JOIN users u ON br.user_id = u.id
+                   WHERE br.id = ?""",
+                (record_id,)
+            )
+        else:
+            rows = self.db.execute_query("SELECT * FROM borrow_records WHERE id = ?", (record_id,))
+        return rows[0] if rows else None
+    
+    def get_overdue_records(self) -> List[Dict]:
+        """获取当前所有逾期未还的借阅记录（含书名）"""
+        return self.db.execute_query(
+            """SELECT br.id, br.user_id, br.book_id, br.due_date, b.title
+               FROM borrow_records br
+               JOIN books b ON br.book_id = b.id
+               WHERE br.status = 'borrowed' AND br.due_date < CURDATE()"""
+        )
+    
     def get_user_borrows(self, user_id: int, status: str = None) -> List[Dict]:
         """获取用户的借阅记录"""
         query = """SELECT br.*, b.title, b.author, b.isbn
@@ -884,6 +1033,33 @@ class BorrowModel:
     
     def get_all_borrows(self, status: str = None) -> List[Dict]:
         """获取所有借阅记录（管理员）"""
+        query, params = self._all_borrows_query(status)
+        return self.db.execute_query(query, params)
+    
+    def iter_all_borrows(self, status: str = None, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """逐批产出所有借阅记录，条件与排序同 get_all_borrows"""
+        query, params = self._all_borrows_query(status)
+        return self.db.stream_query(query, params, batch_size)
+    
+    def get_all_borrows_page(self, status: str = None, after_id: Optional[int] = None,
+                             limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """分页获取所有借阅记录（管理员），格式见 _fetch_page
+        游标分页按记录 id 倒序（新借出的记录在前），而不是 get_all_borrows 的 borrow_date 倒序
+        """
+        conditions = ["br.status = ?"] if status else []
+        params = [status] if status else []
+        return _fetch_page(
+            self.db,
+            """SELECT br.*, b.title, b.author, u.name as user_name, u.username
+               FROM borrow_records br
+               JOIN books b ON br.book_id = b.id
+               JOIN users u ON br.user_id = u.id""",
+            'borrow_records', 'br.id', conditions, params, after_id, limit,
+            count_from='borrow_records br'
+        )
+    
+    def _all_borrows_query(self, status: str = None) -> Tuple[str, Tuple]:
+        """构造查询所有借阅记录的 SQL 与参数"""
         query = """SELECT br.*, b.title, b.author, u.name as user_name, u.username
                    FROM borrow_records br
                    JOIN books b ON br.book_id = b.id
@@ -896,7 +1072,7 @@ class BorrowModel:
             params.append(status)
         
         query += " ORDER BY br.borrow_date DESC"
-        return self.db.execute_query(query, tuple(params))
+        return query, tuple(params)
     
     def get_statistics(self) -> Dict:
         """获取借阅统计信息"""
@@ -931,6 +1107,7 @@ class BorrowModel:
         
         return stats
 
+@traced
 class EmailModel:
     """邮件模型：保存管理员发送的邮件并尝试通过 SMTP 发送（可选）"""
 
@@ -949,22 +1126,11 @@ class EmailModel:
             # 如果需要并且配置可用，尝试发送
             if try_send and SMTP_CONFIG and SMTP_CONFIG.get('host'):
                 try:
-                    host = SMTP_CONFIG.get('host')
-                    port = SMTP_CONFIG.get('port', 587)
-                    user = SMTP_CONFIG.get('user')
-                    password = SMTP_CONFIG.get('password')
-                    use_tls = SMTP_CONFIG.get('use_tls', True)
-                    msg = MIMEText(body, 'plain', 'utf-8')
-                    msg['Subject'] = subject
-                    msg['From'] = user or 'noreply'
-                    msg['To'] = recipient_email or ''
-                    server = smtplib.SMTP(host, port, timeout=10)
-                    if use_tls:
-                        server.starttls()
-                    if user and password:
-                        server.login(user, password)
-                    server.sendmail(msg['From'], [recipient_email], msg.as_string())
-                    server.quit()
+                    server = self._smtp_connect()
+                    try:
+                        self._smtp_deliver(server, recipient_email, subject, body)
+                    finally:
+                        server.quit()
                     status = 'sent'
                     sent_at = datetime.now()
                 except Exception as e:
@@ -982,6 +1148,70 @@ class EmailModel:
             print(f"保存邮件失败: {e}")
             return False
 
+    def send_emails(self, sender_id: int, recipients: Sequence[Tuple[Optional[int], Optional[str]]],
+                    subject: str, body: str, try_send: bool = False) -> List[bool]:
+        """群发邮件：recipients 为 [(收件用户ID, 收件邮箱)]，返回与之对应的是否保存成功
+        尝试发送时全部收件人共用一个 SMTP 连接；邮件记录用多行插入保存，不再每封一次往返
+        """
+        statuses: List[Tuple[str, Optional[datetime]]] = [('draft', None)] * len(recipients)
+        if try_send and SMTP_CONFIG and SMTP_CONFIG.get('host'):
+            try:
+                server = self._smtp_connect()
+            except Exception as e:
+                print(f"邮件发送失败: {e}")
+            else:
+                try:
+                    for index, (_, recipient_email) in enumerate(recipients):
+                        if not recipient_email:
+                            continue
+                        try:
+                            self._smtp_deliver(server, recipient_email, subject, body)
+                            statuses[index] = ('sent', datetime.now())
+                        except smtplib.SMTPException as e:
+                            print(f"邮件发送失败 {recipient_email}: {e}")
+                finally:
+                    try:
+                        server.quit()
+                    except Exception:
+                        pass
+
+        rows = [
+            (sender_id, recipient_user_id, recipient_email, subject, body, status, sent_at)
+            for (recipient_user_id, recipient_email), (status, sent_at) in zip(recipients, statuses)
+        ]
+        row_bytes = len(subject.encode('utf-8')) + len(body.encode('utf-8')) + 200
+        result = self.db.bulk_insert(
+            'emails',
+            ('sender_id', 'recipient_user_id', 'recipient_email', 'subject', 'body', 'status', 'sent_at'),
+            rows,
+            max(1, min(BULK_INSERT_CHUNK, EMAIL_INSERT_BYTES // row_bytes))
+        )
+        for index, error in result.failures:
+            print(f"保存邮件失败 {recipients[index][1] or recipients[index][0]}: {error}")
+        return [row_id is not None for row_id in result.ids]
+
+    def _smtp_connect(self) -> smtplib.SMTP:
+        """按 SMTP_CONFIG 建立连接并登录"""
+        host = SMTP_CONFIG.get('host')
+        port = SMTP_CONFIG.get('port', 587)
+        user = SMTP_CONFIG.get('user')
+        password = SMTP_CONFIG.get('password')
+        use_tls = SMTP_CONFIG.get('use_tls', True)
+        server = smtplib.SMTP(host, port, timeout=10)
+        if use_tls:
+            server.starttls()
+        if user and password:
+            server.login(user, password)
+        return server
+
+    def _smtp_deliver(self, server: smtplib.SMTP, recipient_email: Optional[str], subject: str, body: str) -> None:
+        """通过已建立的连接发送一封邮件"""
+        msg = MIMEText(body, 'plain', 'utf-8')
+        msg['Subject'] = subject
+        msg['From'] = SMTP_CONFIG.get('user') or 'noreply'
+        msg['To'] = recipient_email or ''
+        server.sendmail(msg['From'], [recipient_email], msg.as_string())
+
     def get_emails_for_user(self, user_id: int) -> List[Dict]:
         """获取发给指定用户（或由管理员发出的）邮件记录"""
         rows = self.db.execute_query(
@@ -995,3 +1225,102 @@ class EmailModel:
         rows = self.db.execute_query("SELECT * FROM emails ORDER BY created_at DESC")
         return rows or []
 
+
+@traced
+class JobModel:
+    """后台任务模型：任务的参数、状态、进度与断点"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def create_job(self, job_type: str, params: Dict, total: int, created_by: Optional[int],
+                   owner: Optional[str] = None) -> Optional[int]:
+        """登记新任务，返回任务ID；owner 为将要执行任务的进程（见 jobs.owner_id）"""
+        job_id = self.db.execute_insert(
+            """INSERT INTO jobs (job_type, params, status, total, created_by, owner, updated_at)
+               VALUES (?, ?, 'queued', ?, ?, ?, NOW())""",
+            (job_type, json.dumps(params, ensure_ascii=False), total, created_by, owner)
+        )
+        return job_id or None
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        """获取任务记录，params 与 checkpoint 解析为字典"""
+        rows = self.db.execute_query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        return self._parse_job(rows[0])
+
+    def _parse_job(self, job: Dict) -> Dict:
+        for key in ('params', 'checkpoint'):
+            try:
+                job[key] = json.loads(job[key]) if job.get(key) else {}
+            except ValueError:
+                job[key] = {}
+        return job
+
+    def get_unfinished_jobs(self) -> List[Dict]:
+        """排队中或运行中的任务（服务端重启时据此继续或标记为中断）
+        idle_s 为距上次心跳（updated_at，按数据库时间计算）的秒数
+        """
+        rows = self.db.execute_query(
+            """SELECT *, TIMESTAMPDIFF(SECOND, COALESCE(updated_at, created_at), NOW()) AS idle_s
+               FROM jobs WHERE status IN ('queued', 'running') ORDER BY id"""
+        )
+        return [self._parse_job(row) for row in rows]
+
+    def claim_job(self, job_id: int, owner: str, expected_owner: Optional[str]) -> bool:
+        """把未结束的任务转给 owner；任务的执行者已不是 expected_owner（被其他进程抢先接手）时返回 False"""
+        return self.db.execute_update(
+            """UPDATE jobs SET owner = ?, updated_at = NOW()
+               WHERE id = ? AND status IN ('queued', 'running') AND owner <=> ?""",
+            (owner, job_id, expected_owner)
+        ) > 0
+
+    def mark_running(self, job_id: int, owner: str) -> bool:
+        """任务开始执行；已被取消、已结束或已不归 owner 执行时返回 False"""
+        return self.db.execute_update(
+            """UPDATE jobs SET status = 'running', started_at = NOW(), updated_at = NOW()
+               WHERE id = ? AND status IN ('queued', 'running') AND cancel_requested = 0
+                 AND owner = ?""",
+            (job_id, owner)
+        ) > 0
+
+    def heartbeat(self, owner: str) -> None:
+        """刷新 owner 名下全部未结束任务的 updated_at，表明执行进程仍然存活"""
+        self.db.execute_update(
+            "UPDATE jobs SET updated_at = NOW() WHERE owner = ? AND status IN ('queued', 'running')",
+            (owner,)
+        )
+
+    def save_progress(self, job_id: int, done: int, skipped: int, checkpoint: Dict, owner: str) -> bool:
+        """保存进度与断点，返回任务是否应当停止（已被请求取消，或已被其他进程接手）"""
+        self.db.execute_update(
+            """UPDATE jobs SET done = ?, skipped = ?, checkpoint = ?, updated_at = NOW()
+               WHERE id = ? AND owner = ?""",
+            (done, skipped, json.dumps(checkpoint, ensure_ascii=False), job_id, owner)
+        )
+        rows = self.db.execute_query("SELECT cancel_requested, owner FROM jobs WHERE id = ?", (job_id,))
+        return bool(rows and (rows[0]['cancel_requested'] or rows[0]['owner'] != owner))
+
+    def finish_job(self, job_id: int, status: str, message: str = '', owner: Optional[str] = None) -> None:
+        """任务结束（completed / failed / cancelled / interrupted）；
+        传入 owner 时只在任务仍由该进程执行时更新
+        """
+        query = """UPDATE jobs SET status = ?, message = ?, updated_at = NOW(), finished_at = NOW()
+                   WHERE id = ?"""
+        params = [status, message[:500], job_id]
+        if owner is not None:
+            query += " AND owner <=> ?"
+            params.append(owner)
+        self.db.execute_update(query, tuple(params))
+
+    def request_cancel(self, job_id: int) -> bool:
+        """请求取消未结束的任务；排队中的任务直接标记为已取消"""
+        updated = self.db.execute_update(
+            """UPDATE jobs SET cancel_requested = 1,
+                   status = IF(status = 'queued', 'cancelled', status),
+                   finished_at = IF(status = 'cancelled', NOW(), finished_at)
+               WHERE id = ? AND status IN ('queued', 'running')""",
+            (job_id,)
+        )
+        return updated > 0
@@ -2,40 +2,229 @@
 网络客户端模块
 负责与服务端通信
 """
+import os
+import queue
 import socket
-import json
-import struct
-from typing import Optional, Dict, List, Tuple, Any
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Callable, Dict, Iterator, List, Tuple, Any, Union
+
+from codec import CODEC_JSON, JSON_CODEC, available_codecs, get_codec
+from compression import available_compressions, get_compressor
+from protocol import (FEATURE_PUSH, FEATURE_REQUEST_ID, FEATURE_STREAMING, FLAG_CHUNK, FLAG_COMPRESSED,
+                      FLAG_PUSH, HELLO_ACTION,
+                      MAX_REQUEST_ID, PROTOCOL_V1, PROTOCOL_V2, header_size, pack_frame, unpack_header)
 
 _UNSET = object()
 
+# 请求的默认截止时间（秒）：随请求发给服务端，服务端不再处理已过期的请求，并以剩余时间限制查询
+DEFAULT_REQUEST_TIMEOUT = 30.0
+# 批量操作（batch、send_emails）的默认截止时间（秒），与服务端 ACTIONS 中这两个操作的 timeout 一致
+BULK_REQUEST_TIMEOUT = 60.0
+# 超过截止时间后再等待服务端响应的余量（秒），之后客户端放弃等待
+DEADLINE_GRACE = 1.0
+# 客户端放弃等待时返回的响应，与服务端的超时响应相同
+DEADLINE_EXCEEDED_RESPONSE = {'success': False, 'error': 'deadline_exceeded', 'message': '请求超时，请稍后重试'}
+
+
+class ResponseStream:
+    """stream_request 的结果
+    
+    迭代得到一批批行列表，第一块到达即可开始处理；迭代结束后 response 为结束帧
+    （{'success': ..., 'count': ...} 或失败信息）。不再需要剩余数据时调用 close()，
+    之后到达的数据块会被直接丢弃。等待每一块的时间超过客户端的 request_timeout 时结束迭代，
+    response 为 deadline_exceeded 错误。
+    数据块缓存在不限长度的队列中：读取线程同时为同一连接上的其他请求和推送事件分发响应，
+    不能因为调用方处理得慢而阻塞（调用方在迭代中途发出的请求也要靠它读取响应）；
+    发送速度由服务端控制（见 LibraryServer._serve_stream 的截止时间与发送超时）。
+    服务器不支持流式响应时，整个结果作为一块产出。
+    """
+    
+    def __init__(self, client: 'NetworkClient', action: str, data: Optional[dict]):
+        self.response: Optional[Dict] = None
+        self._client = client
+        self._action = action
+        self._data = data
+        self._queue: "queue.Queue[Tuple[bool, Dict]]" = queue.Queue()
+        self._closed = False
+    
+    def put(self, response: Dict, final: bool) -> None:
+        """读取线程投递一块数据或结束帧（不阻塞）"""
+        if not self._closed:
+            self._queue.put_nowait((final, response))
+    
+    def close(self) -> None:
+        """停止接收，丢弃已缓存和之后到达的数据块"""
+        self._closed = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+    
+    def __iter__(self) -> Iterator[List[Dict]]:
+        try:
+            for attempt in range(self._client.busy_retries + 1):
+                received = False
+                self._client._start_stream(self, self._action, self._data)
+                while True:
+                    try:
+                        final, response = self._queue.get(timeout=self._client._wait_timeout())
+                    except queue.Empty:
+                        # 超过截止时间仍没有收到下一块数据，放弃剩余部分
+                        self._client._abandon(self)
+                        final, response = True, dict(DEADLINE_EXCEEDED_RESPONSE)
+                    if final:
+                        break
+                    received = True
+                    yield response.get('data') or []
+                # 开始产出数据前收到繁忙响应时，按建议的间隔重试
+                if response.get('error') != 'server_busy' or received or attempt == self._client.busy_retries:
+                    break
+                time.sleep(response.get('retry_after_ms', 200) / 1000.0)
+            data = response.get('data')
+            self.response = {key: value for key, value in response.items() if key != 'data'}
+            if isinstance(data, list):
+                # 普通单帧响应
+                self.response.setdefault('count', len(data))
+                yield data
+        finally:
+            self.close()
+
+
 class NetworkClient:
-    """网络客户端类"""
+    """网络客户端类
+    
+    连接后先与服务器握手：服务器支持请求ID时切换到 v2 帧格式，多个线程可以在同一连接上
+    同时发出请求（流水线），后台线程按请求ID把响应交给对应的调用方；
+    旧版服务器不支持握手时退回一问一答的 v1 模式。
+    握手时同时协商消息编码：双方都装有 msgpack 时使用二进制编码，否则使用 JSON；
+    v2 模式下还会协商帧压缩，超过服务器给出阈值的帧压缩后发送。
+    """
     
-    def __init__(self, host='127.0.0.1', port=8888):
+    def __init__(self, host='127.0.0.1', port=8888, busy_retries=3, pipelining=True,
+                 codecs: Optional[List[str]] = None, native_types=False,
+                 compression: Optional[List[str]] = None, compression_level: Optional[int] = None,
+                 unix_socket: Optional[str] = None, request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT):
         self.host = host
         self.port = port
+        # 服务端的 Unix 域套接字路径：与服务端在同一台机器上时优先使用，连接失败时改用 TCP
+        self.unix_socket = unix_socket
+        # 当前连接使用的传输方式：'unix' 或 'tcp'
+        self.transport = None
         self.socket = None
         self.connected = False
+        # 请求的默认截止时间（秒），None 表示一直等待；可在 send_request 等方法中按请求指定
+        self.request_timeout = request_timeout
+        # 服务器繁忙（请求队列已满）时的自动重试次数
+        self.busy_retries = busy_retries
+        # 是否尝试协商请求ID（流水线）模式
+        self.pipelining = pipelining
+        # 按优先顺序提供给服务器的编码，默认取本机可用的全部编码
+        supported = available_codecs()
+        self.codecs = [name for name in codecs if name in supported] if codecs is not None else supported
+        # 二进制编码下是否把日期、Decimal 解码为原生对象（默认与 JSON 一致，得到字符串和浮点数）
+        self.native_types = native_types
+        # 可接受的压缩算法，默认取本机可用的全部算法，空列表表示不压缩
+        supported = available_compressions()
+        self.compressions = ([name for name in compression if name in supported]
+                             if compression is not None else supported)
+        self.compression_level = compression_level
+        self.compressor = None
+        self.compress_threshold = 0
+        self.protocol_version = PROTOCOL_V1
+        self.features = frozenset()
+        self.codec = JSON_CODEC
+        self._send_lock = threading.Lock()
+        # v1 模式下请求与响应必须成对串行
+        self._request_lock = threading.Lock()
+        # 请求ID -> 等待响应的 Future，或正在接收的流式响应
+        self._pending: Dict[int, Union[Future, ResponseStream]] = {}
+        self._pending_lock = threading.Lock()
+        self._next_request_id = 0
+        self._reader_thread = None
+        # 推送事件名 -> 回调列表；当前订阅（重连后自动恢复）
+        self._event_listeners: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._listeners_lock = threading.Lock()
+        self._subscription: Optional[Dict] = None
+        # 登录后服务器返回的会话令牌，随每个请求发送（重连后继续有效）
+        self.token: Optional[str] = None
     
     def connect(self) -> bool:
         """连接到服务器"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
+            self.socket = self._open_socket()
             self.connected = True
-            return True
+            self.protocol_version = PROTOCOL_V1
+            self.features = frozenset()
+            self.codec = JSON_CODEC
+            self.compressor = None
         except Exception as e:
             print(f"连接失败: {e}")
             self.connected = False
             return False
+        if self.pipelining or any(name != CODEC_JSON for name in self.codecs):
+            self._negotiate()
+        if self._subscription is not None and FEATURE_PUSH in self.features:
+            self.send_request('subscribe', self._subscription)
+        return True
+    
+    def _open_socket(self) -> socket.socket:
+        """建立到服务端的连接：配置了 Unix 域套接字且本机存在该文件时优先使用，否则使用 TCP"""
+        if self.unix_socket and hasattr(socket, 'AF_UNIX') and os.path.exists(self.unix_socket):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.unix_socket)
+                self.transport = 'unix'
+                return sock
+            except OSError as e:
+                sock.close()
+                print(f"Unix 域套接字 {self.unix_socket} 连接失败（{e}），改用 TCP")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect((self.host, self.port))
+        except OSError:
+            sock.close()
+            raise
+        self.transport = 'tcp'
+        return sock
     
     def disconnect(self):
         """断开连接"""
         if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self.socket.close()
             self.connected = False
     
+    def _negotiate(self):
+        """与服务器握手协商协议版本与编码；旧版服务器返回未知操作时保持 v1 + JSON"""
+        response = self._send_request_v1(HELLO_ACTION, {
+            'protocol': PROTOCOL_V2 if self.pipelining else PROTOCOL_V1,
+            'features': [FEATURE_REQUEST_ID, FEATURE_STREAMING, FEATURE_PUSH] if self.pipelining else [],
+            'codecs': self.codecs,
+            'compression': self.compressions if self.pipelining else []
+        }, self.request_timeout)
+        data = response.get('data') or {}
+        if not response.get('success'):
+            return
+        if data.get('codec') in self.codecs:
+            self.codec = get_codec(data.get('codec'), native=self.native_types)
+        if data.get('protocol', PROTOCOL_V1) < PROTOCOL_V2:
+            return
+        self.protocol_version = PROTOCOL_V2
+        self.features = frozenset(data.get('features') or [])
+        compression = data.get('compression') or {}
+        if compression.get('algorithm') in self.compressions:
+            self.compressor = get_compressor(compression['algorithm'])
+            self.compress_threshold = compression.get('threshold', 0)
+        self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self._reader_thread.start()
+    
     def _receive_all_data(self, expected_size):
         """接收指定长度的所有数据"""
         buffer = b''
@@ -46,45 +235,304 @@ class NetworkClient:
             buffer += chunk
         return buffer
     
-    def _send_data(self, data):
-        """发送数据（带长度前缀）"""
-        data_bytes = data.encode('utf-8')
-        length = len(data_bytes)
-        # 先发送4字节的长度（大端序）
-        self.socket.send(struct.pack('>I', length))
-        # 然后发送数据
-        self.socket.send(data_bytes)
-    
-    def send_request(self, action: str, data: dict = None) -> Optional[Dict]:
-        """发送请求到服务器"""
+    def _send_data(self, data, request_id: int = 0):
+        """按当前协议版本发送一帧数据，协商了压缩且超过阈值时压缩后发送"""
+        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
+        flags = 0
+        if self.compressor is not None and len(data_bytes) >= self.compress_threshold:
+            compressed = self.compressor.compress(data_bytes, self.compression_level)
+            if len(compressed) < len(data_bytes):
+                data_bytes, flags = compressed, FLAG_COMPRESSED
+        with self._send_lock:
+            self.socket.sendall(pack_frame(data_bytes, self.protocol_version, request_id, flags))
+    
+    def _encode_request(self, action: str, data: dict = None, stream: bool = False,
+                        timeout: Optional[float] = None) -> bytes:
+        request = {
+            'action': action,
+            'data': data or {}
+        }
+        if self.token:
+            request['token'] = self.token
+        if stream:
+            request['stream'] = True
+        if timeout is not None:
+            # 发送剩余时间而不是绝对时间，客户端与服务端的时钟不必一致
+            request['timeout_ms'] = max(1, int(timeout * 1000))
+        return self.codec.encode(request)
+    
+    def _timeout(self, timeout: Any) -> Optional[float]:
+        return self.request_timeout if timeout is _UNSET else timeout
+    
+    def _bulk_timeout(self) -> Optional[float]:
+        """批量操作的截止时间：默认截止时间与 BULK_REQUEST_TIMEOUT 中较长的一个"""
+        if self.request_timeout is None:
+            return None
+        return max(self.request_timeout, BULK_REQUEST_TIMEOUT)
+    
+    def _wait_timeout(self, timeout: Any = _UNSET) -> Optional[float]:
+        """等待响应的最长时间：截止时间加上余量"""
+        timeout = self._timeout(timeout)
+        return None if timeout is None else timeout + DEADLINE_GRACE
+    
+    def _wait(self, future: Future, timeout: Any = _UNSET) -> Dict:
+        """等待响应，超过截止时间仍未收到时放弃该请求并返回 deadline_exceeded 错误"""
+        try:
+            return future.result(self._wait_timeout(timeout))
+        except FutureTimeoutError:
+            self._abandon(future)
+            return dict(DEADLINE_EXCEEDED_RESPONSE)
+    
+    def _abandon(self, waiter: Union[Future, ResponseStream]) -> None:
+        """不再等待该请求，之后到达的响应直接丢弃"""
+        with self._pending_lock:
+            for request_id, pending in list(self._pending.items()):
+                if pending is waiter:
+                    del self._pending[request_id]
+                    break
+        if isinstance(waiter, ResponseStream):
+            waiter.close()
+    
+    def _decode_response(self, body: bytes) -> Dict:
+        try:
+            response = self.codec.decode(body)
+        except ValueError as e:
+            return {'success': False, 'message': f'响应解析错误: {str(e)}'}
+        if not isinstance(response, dict):
+            return {'success': False, 'message': '响应格式无效'}
+        return response
+    
+    def _decode_frame(self, body: bytes, flags: int) -> Dict:
+        """按帧标志解压后解码响应"""
+        if flags & FLAG_COMPRESSED:
+            if self.compressor is None:
+                return {'success': False, 'message': '收到未协商的压缩数据'}
+            try:
+                body = self.compressor.decompress(body)
+            except ValueError as e:
+                return {'success': False, 'message': f'响应解压错误: {str(e)}'}
+        return self._decode_response(body)
+    
+    def send_request(self, action: str, data: dict = None, timeout: Any = _UNSET) -> Optional[Dict]:
+        """发送请求到服务器并等待响应
+        服务器返回繁忙响应时，按其建议的间隔自动重试 busy_retries 次；
+        timeout 为本次请求的截止时间（秒，默认 request_timeout），超过后返回 error 为 deadline_exceeded 的响应
+        """
+        response = self._wait(self.submit_request(action, data, timeout), timeout)
+        return self._retry_if_busy(action, data, response, timeout)
+    
+    def send_requests(self, requests: List[Tuple[str, dict]], timeout: Any = _UNSET) -> List[Dict]:
+        """一次发出多个请求，按顺序返回各自的响应
+        v2 模式下请求在同一连接上流水线发送，总耗时约等于最慢的一个请求
+        """
+        futures = [self.submit_request(action, data, timeout) for action, data in requests]
+        return [
+            self._retry_if_busy(action, data, self._wait(future, timeout), timeout)
+            for (action, data), future in zip(requests, futures)
+        ]
+    
+    def send_batch(self, requests: List[Tuple[str, dict]], transaction: bool = False,
+                   chunk_size: int = 200) -> List[Dict]:
+        """用 batch 操作在一次往返中执行多个请求，按顺序返回各自的结果
+        transaction=True 时全部请求在同一个数据库事务中执行（不分片，任一失败整体回滚）；
+        否则每 chunk_size 个请求一组发送
+        """
+        if transaction:
+            chunks = [requests]
+        else:
+            chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        results: List[Dict] = []
+        for chunk in chunks:
+            response = self.send_request('batch', {
+                'requests': [{'action': action, 'data': data or {}} for action, data in chunk],
+                'transaction': transaction
+            }, timeout=self._bulk_timeout())
+            data = response.get('data')
+            chunk_results = data if isinstance(data, list) else []
+            if not response.get('success'):
+                # 事务回滚或整批失败时，所有子请求都视为失败
+                failure = {'success': False, 'message': response.get('message', '批量请求失败')}
+                chunk_results = [failure] * len(chunk)
+            results.extend(chunk_results)
+            results.extend([{'success': False, 'message': '缺少响应'}] * (len(chunk) - len(chunk_results)))
+        return results
+    
+    def submit_request(self, action: str, data: dict = None, timeout: Any = _UNSET) -> Future:
+        """发出请求但不等待，返回以响应字典为结果的 Future
+        v1 模式下会同步完成请求后再返回；timeout 为请求的截止时间（秒，默认 request_timeout）
+        """
+        future: Future = Future()
+        timeout = self._timeout(timeout)
+        if not self.connected or not self.socket:
+            future.set_result({'success': False, 'message': '未连接到服务器'})
+            return future
+        if self.protocol_version < PROTOCOL_V2:
+            future.set_result(self._send_request_v1(action, data, timeout))
+            return future
+        
+        request_id = self._register_pending(future)
+        try:
+            self._send_data(self._encode_request(action, data, timeout=timeout), request_id)
+        except Exception as e:
+            self._resolve_pending(request_id, {'success': False, 'message': f'通信错误: {str(e)}'})
+        return future
+    
+    def stream_request(self, action: str, data: dict = None) -> ResponseStream:
+        """以流式响应方式发出请求，返回逐块产出行列表的 ResponseStream
+        请求在开始迭代时才发出；迭代中途放弃时应调用 close()
+        """
+        return ResponseStream(self, action, data)
+    
+    def _start_stream(self, stream: ResponseStream, action: str, data: dict = None) -> None:
+        if not self.connected or not self.socket:
+            stream.put({'success': False, 'message': '未连接到服务器'}, final=True)
+            return
+        if self.protocol_version < PROTOCOL_V2:
+            stream.put(self._send_request_v1(action, data, self.request_timeout), final=True)
+            return
+        request_id = self._register_pending(stream)
+        try:
+            self._send_data(self._encode_request(action, data, stream=FEATURE_STREAMING in self.features,
+                                                 timeout=self.request_timeout),
+                            request_id)
+        except Exception as e:
+            self._resolve_pending(request_id, {'success': False, 'message': f'通信错误: {str(e)}'})
+    
+    def _retry_if_busy(self, action: str, data: dict, response: Dict, timeout: Any = _UNSET) -> Dict:
+        for _ in range(self.busy_retries):
+            if response.get('error') != 'server_busy':
+                break
+            time.sleep(response.get('retry_after_ms', 200) / 1000.0)
+            response = self._wait(self.submit_request(action, data, timeout), timeout)
+        return response
+    
+    def _register_pending(self, waiter: Union[Future, ResponseStream]) -> int:
+        with self._pending_lock:
+            self._next_request_id = self._next_request_id % MAX_REQUEST_ID + 1
+            request_id = self._next_request_id
+            self._pending[request_id] = waiter
+        return request_id
+    
+    def _resolve_pending(self, request_id: int, response: Dict) -> None:
+        """请求的最后一帧到达"""
+        with self._pending_lock:
+            waiter = self._pending.pop(request_id, None)
+        self._deliver(waiter, response)
+    
+    def _deliver_chunk(self, request_id: int, response: Dict) -> None:
+        """流式响应的中间块到达"""
+        with self._pending_lock:
+            waiter = self._pending.get(request_id)
+        if isinstance(waiter, ResponseStream):
+            waiter.put(response, final=False)
+    
+    def add_event_listener(self, event: str, callback: Callable[[Dict], None]) -> None:
+        """登记推送事件的回调，callback(data)
+        回调在后台读取线程中执行，必须尽快返回；界面代码应把事件转交给主线程（见 gui_events.py）
+        """
+        with self._listeners_lock:
+            self._event_listeners.setdefault(event, []).append(callback)
+    
+    def remove_event_listener(self, event: str, callback: Callable[[Dict], None]) -> None:
+        """移除 add_event_listener 登记的回调"""
+        with self._listeners_lock:
+            callbacks = self._event_listeners.get(event, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+    
+    def subscribe(self, topics: Optional[List[str]] = None, user_id: Optional[int] = None) -> bool:
+        """订阅服务端推送的变更事件（主题见 events.py，默认全部）
+        user_id 为空时接收所有用户的事件；服务器不支持推送时返回 False
+        """
+        if FEATURE_PUSH not in self.features:
+            return False
+        data = {'user_id': user_id}
+        if topics is not None:
+            data['topics'] = list(topics)
+        response = self.send_request('subscribe', data)
+        if response.get('success'):
+            self._subscription = data
+            return True
+        return False
+    
+    def _dispatch_event(self, message: Dict) -> None:
+        """把推送事件交给登记的回调"""
+        event = message.get('event')
+        with self._listeners_lock:
+            callbacks = list(self._event_listeners.get(event, ()))
+        for callback in callbacks:
+            try:
+                callback(message.get('data') or {})
+            except Exception as e:
+                print(f"处理推送事件 {event} 失败: {e}")
+    
+    @staticmethod
+    def _deliver(waiter: Union[Future, ResponseStream, None], response: Dict) -> None:
+        if isinstance(waiter, ResponseStream):
+            waiter.put(response, final=True)
+        elif waiter is not None and not waiter.done():
+            waiter.set_result(response)
+    
+    def _reader_loop(self):
+        """v2 模式的后台读取线程：按请求ID把响应分发给等待的调用方"""
+        size = header_size(PROTOCOL_V2)
+        try:
+            while True:
+                header = self._receive_all_data(size)
+                if len(header) != size:
+                    break
+                data_length, request_id, flags = unpack_header(header, PROTOCOL_V2)
+                body = self._receive_all_data(data_length)
+                if len(body) != data_length:
+                    break
+                if flags & FLAG_PUSH:
+                    self._dispatch_event(self._decode_frame(body, flags))
+                elif flags & FLAG_CHUNK:
+                    self._deliver_chunk(request_id, self._decode_frame(body, flags))
+                else:
+                    self._resolve_pending(request_id, self._decode_frame(body, flags))
+        except OSError:
+            pass
+        finally:
+            self.connected = False
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for waiter in pending.values():
+                self._deliver(waiter, {'success': False, 'message': '服务器断开连接'})
+    
+    def _send_request_v1(self, action: str, data: dict = None, timeout: Optional[float] = None) -> Dict:
+        """v1 模式：发送一次请求并阻塞等待响应
+        超过截止时间仍未收到响应时断开连接（迟到的响应会与下一个请求错位），返回 deadline_exceeded 错误
+        """
         if not self.connected or not self.socket:
             return {'success': False, 'message': '未连接到服务器'}
         
         try:
-            request = {
-                'action': action,
-                'data': data or {}
-            }
-            request_json = json.dumps(request, ensure_ascii=False)
-            self._send_data(request_json)
-            
-            # 先接收4字节的长度
-            length_data = self._receive_all_data(4)
-            if len(length_data) != 4:
-                return {'success': False, 'message': '服务器断开连接'}
-            
-            # 解析长度
-            data_length = struct.unpack('>I', length_data)[0]
+            with self._request_lock:
+                self.socket.settimeout(None if timeout is None else timeout + DEADLINE_GRACE)
+                try:
+                    self._send_data(self._encode_request(action, data, timeout=timeout))
+                    
+                    # 先接收4字节的长度
+                    length_data = self._receive_all_data(header_size(PROTOCOL_V1))
+                    if len(length_data) != header_size(PROTOCOL_V1):
+                        return {'success': False, 'message': '服务器断开连接'}
+                    
+                    # 解析长度
+                    data_length = unpack_header(length_data, PROTOCOL_V1)[0]
+                    
+                    # 接收完整响应数据
+                    response_data = self._receive_all_data(data_length)
+                    if len(response_data) != data_length:
+                        return {'success': False, 'message': '数据接收不完整'}
+                except socket.timeout:
+                    self.disconnect()
+                    return dict(DEADLINE_EXCEEDED_RESPONSE)
+                finally:
+                    if self.connected:
+                        self.socket.settimeout(None)
             
-            # 接收完整响应数据
-            response_data = self._receive_all_data(data_length)
-            if len(response_data) != data_length:
-                return {'success': False, 'message': '数据接收不完整'}
-            
-            response = json.loads(response_data.decode('utf-8'))
-            return response
-        except json.JSONDecodeError as e:
-            return {'success': False, 'message': f'JSON解析错误: {str(e)}'}
+            return self._decode_response(response_data)
         except Exception as e:
             return {'success': False, 'message': f'通信错误: {str(e)}'}
     
@@ -95,7 +543,16 @@ class NetworkClient:
             'username': username,
             'password': password
         })
-        return response.get('data') if response.get('success') else None
+        if not response.get('success'):
+            return None
+        self.token = response.get('token')
+        return response.get('data')
+    
+    def logout(self) -> None:
+        """注销会话令牌"""
+        if self.token:
+            self.send_request('logout')
+            self.token = None
     
     def register(self, username: str, password: str, role: str, name: str,
                  email: str = "", phone: str = "", age: Optional[int] = None) -> bool:
@@ -158,6 +615,36 @@ class NetworkClient:
             print(f"搜索图书失败: {error_msg}")
             return []
     
+    def search_books_page(self, keyword: str = "", category: str = "", after_id: Optional[int] = None,
+                          limit: int = 50) -> Dict:
+        """分页搜索图书
+        返回: {'items': 图书列表, 'next_after_id': 下一页游标（没有更多时为 None）,
+               'total': 总数（仅第一页）, 'estimated': 总数是否为估计值}
+        """
+        response = self.send_request('search_books_page', {
+            'keyword': keyword or "",
+            'category': category or "",
+            'after_id': after_id,
+            'limit': limit
+        })
+        return self._page_from(response, '搜索图书失败')
+    
+    def _page_from(self, response: Dict, error_prefix: str) -> Dict:
+        data = response.get('data') if response else None
+        if response and response.get('success') and isinstance(data, dict):
+            return data
+        error_msg = response.get('message', '未知错误') if response else '未连接到服务器'
+        print(f"{error_prefix}: {error_msg}")
+        return {'items': [], 'next_after_id': None, 'total': 0, 'estimated': False}
+    
+    def iter_search_books(self, keyword: str = "", category: str = "",
+                          batch_size: Optional[int] = None) -> ResponseStream:
+        """流式搜索图书，逐块产出图书列表（适合全部图书等大结果集）"""
+        data = {'keyword': keyword or "", 'category': category or ""}
+        if batch_size:
+            data['batch_size'] = batch_size
+        return self.stream_request('search_books', data)
+    
     def get_book(self, book_id: int) -> Optional[Dict]:
         """获取图书详情"""
         response = self.send_request('get_book', {'book_id': book_id})
@@ -231,6 +718,28 @@ class NetworkClient:
             print(f"获取借阅记录异常: {e}")
             return []
 
+    def get_borrow(self, record_id: int) -> Optional[Dict]:
+        """获取单条借阅记录（含书名、借阅人，管理员），不存在时返回 None"""
+        response = self.send_request('get_borrow', {'record_id': record_id})
+        return response.get('data') if response.get('success') else None
+
+    def get_all_borrows_page(self, status: str = None, after_id: Optional[int] = None,
+                             limit: int = 50) -> Dict:
+        """分页获取所有借阅记录（按记录 id 倒序），返回格式同 search_books_page"""
+        response = self.send_request('get_all_borrows_page', {
+            'status': status,
+            'after_id': after_id,
+            'limit': limit
+        })
+        return self._page_from(response, '获取借阅记录失败')
+    
+    def iter_all_borrows(self, status: str = None, batch_size: Optional[int] = None) -> ResponseStream:
+        """流式获取所有借阅记录，逐块产出记录列表"""
+        data = {'status': status}
+        if batch_size:
+            data['batch_size'] = batch_size
+        return self.stream_request('get_all_borrows', data)
+    
     def update_borrow(self, record_id: int, status: str = None, due_date: str = None,
                       return_date: str = None, fine_amount: float = None) -> bool:
         """管理员更新借阅记录"""
@@ -271,6 +780,11 @@ class NetworkClient:
             print(f"获取用户列表异常: {e}")
             return []
 
+    def get_all_users_page(self, after_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """分页获取用户（管理员），返回格式同 search_books_page"""
+        response = self.send_request('get_all_users_page', {'after_id': after_id, 'limit': limit})
+        return self._page_from(response, '获取用户列表失败')
+
     def send_email(self, sender_id: int, recipient_user_id: Optional[int], recipient_email: Optional[str], subject: str, body: str, try_send: bool = False) -> bool:
         """管理员发送邮件（向服务器请求保存并可尝试发送）"""
         payload = {
@@ -284,6 +798,23 @@ class NetworkClient:
         response = self.send_request('send_email', payload)
         return response.get('success', False)
 
+    def send_emails(self, sender_id: int, recipients: List[Tuple[Optional[int], Optional[str]]], subject: str,
+                    body: str, try_send: bool = False) -> List[bool]:
+        """管理员群发邮件：recipients 为 [(收件用户ID, 收件邮箱)]，服务器一次批量保存，
+        返回与收件人对应的是否保存成功
+        """
+        response = self.send_request('send_emails', {
+            'sender_id': sender_id,
+            'recipients': [list(item) for item in recipients],
+            'subject': subject,
+            'body': body,
+            'try_send': try_send
+        }, timeout=self._bulk_timeout())
+        saved = response.get('data') if response else None
+        if not isinstance(saved, list):
+            return [False] * len(recipients)
+        return [bool(ok) for ok in saved]
+
     def get_all_emails(self) -> List[Dict]:
         """获取所有邮件记录（管理员）"""
         response = self.send_request('get_all_emails', {})
@@ -357,11 +888,16 @@ class NetworkClient:
         })
         return response.get('data', {}) if response.get('success') else {}
     
+    def get_server_metrics(self) -> Dict:
+        """获取服务端运行指标（各操作延迟直方图、错误数、队列与连接池状态）"""
+        response = self.send_request('get_server_metrics', {})
+        return response.get('data', {}) if response.get('success') else {}
+    
     def import_books_from_openlibrary(self, query: str = "subject:fiction", count: int = 100,
                                       batch_size: int = 100, delay: float = 0.5,
                                       copies: int = 3) -> Tuple[bool, str, Dict]:
-        """从Open Library导入图书
-        返回: (成功标志, 消息, 结果数据)
+        """提交从Open Library导入图书的后台任务
+        返回: (成功标志, 消息, {'job_id': 任务ID})，进度通过 get_job_status 查询
         """
         response = self.send_request('import_books_from_openlibrary', {
             'query': query,
@@ -374,4 +910,16 @@ class NetworkClient:
         message = response.get('message', '未知错误')
         data = response.get('data', {})
         return success, message, data
+    
+    def get_job_status(self, job_id: int) -> Dict:
+        """查询后台任务的状态与进度
+        返回: {'status', 'total', 'done', 'skipped', 'progress', 'eta_s', 'message', ...}，失败时返回空字典
+        """
+        response = self.send_request('get_job_status', {'job_id': job_id})
+        return response.get('data', {}) if response.get('success') else {}
+    
+    def cancel_job(self, job_id: int) -> bool:
+        """取消后台任务"""
+        response = self.send_request('cancel_job', {'job_id': job_id})
+        return response.get('success', False)
 
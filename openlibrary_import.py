@@ -11,8 +11,8 @@ import argparse
 import logging
 import sys
 import time
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import requests
 
@@ -51,11 +51,20 @@ class OpenLibraryImporter:
         target_count: int,
         batch_size: int,
         delay: float,
+        start_page: int = 1,
+        progress: Optional[Callable[[int, int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
     ) -> Tuple[int, int]:
-        """批量导入书籍，返回 (成功数量, 跳过数量)。"""
+        """批量导入书籍，返回 (成功数量, 跳过数量)。
+
+        每页的记录先在内存中去重，再用两条查询排除库中已有的书，剩余的用一条多行 INSERT 写入。
+        start_page: 从第几页开始请求（后台任务从断点继续时使用）。
+        progress(stored, skipped, page): 每页结束后调用，page 为继续执行时应当开始的页码。
+        should_cancel(): 返回 True 时在当前页处理完后停止。
+        """
         stored = 0
         skipped = 0
-        page = 1
+        page = max(1, start_page)
         seen_isbns: set[str] = set()
         seen_titles: set[Tuple[str, str]] = set()
 
@@ -66,15 +75,16 @@ class OpenLibraryImporter:
         )
 
         while stored < target_count:
+            if should_cancel is not None and should_cancel():
+                logging.info("导入已取消。")
+                break
             docs = self._fetch_batch(query=query, page=page, limit=batch_size)
             if not docs:
                 logging.warning("第 %s 页无数据，提前结束。", page)
                 break
 
+            candidates: List[BookPayload] = []
             for doc in docs:
-                if stored >= target_count:
-                    break
-
                 payload = self._build_payload(doc)
                 if payload is None:
                     skipped += 1
@@ -89,33 +99,31 @@ class OpenLibraryImporter:
                     skipped += 1
                     continue
 
-                if payload.isbn and self._book_exists_by_isbn(payload.isbn):
-                    skipped += 1
-                    continue
-
-                if self._book_exists_by_title_author(*title_author):
-                    skipped += 1
-                    continue
-
-                success = self.book_model.add_book(
-                    title=payload.title,
-                    author=payload.author,
-                    isbn=payload.isbn,
-                    category=payload.category,
-                    publisher=payload.publisher,
-                    publish_date=payload.publish_date,
-                    total_copies=payload.total_copies,
-                )
-                if success:
-                    stored += 1
-                    seen_isbns.add(payload.isbn)
-                    seen_titles.add(title_author)
-                    if stored % 50 == 0 or stored == target_count:
-                        logging.info("已导入 %s/%s 本书。", stored, target_count)
-                else:
-                    skipped += 1
+                seen_isbns.add(payload.isbn)
+                seen_titles.add(title_author)
+                candidates.append(payload)
+
+            existing_isbns = self._existing_isbns([payload.isbn for payload in candidates if payload.isbn])
+            existing_titles = self._existing_title_authors([(payload.title, payload.author) for payload in candidates])
+            new_books = [
+                payload for payload in candidates
+                if payload.isbn not in existing_isbns
+                and (payload.title.casefold(), payload.author.casefold()) not in existing_titles
+            ]
+            skipped += len(candidates) - len(new_books)
+            new_books = new_books[:target_count - stored]
+
+            if new_books:
+                result = self.book_model.add_books([asdict(payload) for payload in new_books])
+                for index, error in result.failures:
+                    logging.debug("写入失败《%s》: %s", new_books[index].title, error)
+                stored += result.inserted
+                skipped += len(result.failures)
+                logging.info("已导入 %s/%s 本书。", stored, target_count)
 
             page += 1
+            if progress is not None:
+                progress(stored, skipped, page)
             time.sleep(delay)
 
         logging.info("导入结束: 成功 %s 本，跳过 %s 本。", stored, skipped)
@@ -270,20 +278,24 @@ class OpenLibraryImporter:
                     return f"{detected_year}-01-01"
         return "1900-01-01"
 
-    def _book_exists_by_isbn(self, isbn: str) -> bool:
-        """检查数据库中 ISBN 是否已存在。"""
-        if not isbn:
-            return False
-        result = self.db.execute_query("SELECT id FROM books WHERE isbn = ?", (isbn,))
-        return bool(result)
-
-    def _book_exists_by_title_author(self, title: str, author: str) -> bool:
-        """基于标题 + 作者检测重复。"""
-        result = self.db.execute_query(
-            "SELECT id FROM books WHERE title = ? AND author = ? LIMIT 1",
-            (title, author),
+    def _existing_isbns(self, isbns: List[str]) -> Set[str]:
+        """返回数据库中已存在的 ISBN。"""
+        if not isbns:
+            return set()
+        placeholders = ", ".join("?" * len(isbns))
+        rows = self.db.execute_query(f"SELECT isbn FROM books WHERE isbn IN ({placeholders})", tuple(isbns))
+        return {row["isbn"] for row in rows}
+
+    def _existing_title_authors(self, pairs: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """基于标题 + 作者检测重复，返回数据库中已存在的 (标题, 作者)（按 casefold 比较，与表的排序规则一致）。"""
+        if not pairs:
+            return set()
+        placeholders = ", ".join("(?, ?)" for _ in pairs)
+        rows = self.db.execute_query(
+            f"SELECT title, author FROM books WHERE (title, author) IN ({placeholders})",
+            tuple(value for pair in pairs for value in pair),
         )
-        return bool(result)
+        return {(row["title"].casefold(), row["author"].casefold()) for row in rows}
 
 
 def parse_args(argv: List[str]) -> argparse.Namespace:
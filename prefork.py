@@ -0,0 +1,285 @@
+"""
+多进程（prefork）服务端模式
+监督进程启动 N 个工作进程，每个工作进程运行一个完整的 LibraryServer（各自的工作线程池与数据库连接池），
+通过 SO_REUSEPORT 监听同一端口，由内核在进程间分配新连接，JSON 编码、统计聚合等 CPU 工作不再受 GIL 限制。
+
+进程间通过监督进程转发的总线同步两类消息：
+    响应缓存失效：某个进程处理写操作后，其他进程清除相同标签的缓存，不会返回旧数据
+    推送事件：订阅者可能连接在任意进程上，事件需要送达所有进程
+工作进程定期把运行指标写入共享字典，get_server_metrics 返回的 cluster 为全部进程的合计。
+"""
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import threading
+import time
+from multiprocessing.managers import SyncManager
+from typing import Any, Dict, List, Optional
+
+from metrics import merge_snapshots
+
+# 工作进程上报指标的间隔（秒）
+METRICS_INTERVAL = 5.0
+# 监督进程检查工作进程是否存活的间隔（秒）
+SUPERVISE_INTERVAL = 1.0
+# 运行不到这么久就退出的工作进程视为启动即崩溃，重启等待时间按次数加倍
+CRASH_WINDOW = 10.0
+MAX_RESTART_DELAY = 30.0
+
+# 总线消息类型
+MSG_INVALIDATE = 'invalidate'
+MSG_EVENT = 'event'
+
+
+class ClusterLink:
+    """工作进程一侧的总线连接
+
+    本进程的缓存失效与推送事件经 bus 交给监督进程转发，其他进程发来的消息从 inbox 读取后在本进程应用；
+    应用时只调用本地的 apply_invalidation / events.publish，不会再次广播。
+    """
+
+    def __init__(self, index: int, processes: int, bus, inbox, state):
+        self.index = index
+        self.processes = processes
+        self.bus = bus
+        self.inbox = inbox
+        self.state = state
+        self.server = None
+
+    def attach(self, server) -> None:
+        """绑定服务端实例并启动接收与指标上报线程"""
+        self.server = server
+        server.cluster = self
+        threading.Thread(target=self._listen, name='cluster-listen', daemon=True).start()
+        threading.Thread(target=self._report_metrics, name='cluster-metrics', daemon=True).start()
+
+    def broadcast_invalidation(self, tags) -> None:
+        self._send((MSG_INVALIDATE, tuple(tags)))
+
+    def broadcast_event(self, topic: str, event: str, data: Dict[str, Any], user_id: Optional[int]) -> None:
+        self._send((MSG_EVENT, (topic, event, data, user_id)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """全部工作进程的指标合计（其他进程的数据最多滞后 METRICS_INTERVAL 秒）"""
+        try:
+            reports = {key: value for key, value in dict(self.state).items() if isinstance(key, int)}
+            restarts = self.state.get('restarts', {})
+        except (OSError, EOFError) as e:
+            return {'error': f'读取集群指标失败: {e}'}
+        reports[self.index] = self._report()
+        now = time.time()
+        workers = {
+            index: {
+                'pid': report['pid'],
+                'report_age_s': round(now - report['updated'], 1),
+                'total_requests': report['metrics']['total_requests'],
+                'cache': report['cache'],
+                'restarts': restarts.get(index, 0),
+            }
+            for index, report in sorted(reports.items())
+        }
+        return {
+            'processes': self.processes,
+            'worker_index': self.index,
+            'workers': workers,
+            **merge_snapshots([report['metrics'] for report in reports.values()]),
+        }
+
+    def _send(self, message) -> None:
+        try:
+            self.bus.put((self.index, message))
+        except (OSError, ValueError) as e:
+            print(f"集群总线发送失败: {e}")
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                kind, payload = self.inbox.get()
+            except (OSError, EOFError):
+                return
+            try:
+                if kind == MSG_INVALIDATE:
+                    self.server.apply_invalidation(*payload)
+                elif kind == MSG_EVENT:
+                    self.server.events.publish(*payload)
+            except Exception as e:
+                print(f"处理集群消息失败: {e}")
+
+    def _report(self) -> Dict[str, Any]:
+        return {
+            'pid': multiprocessing.current_process().pid,
+            'updated': time.time(),
+            'metrics': self.server.metrics.snapshot(),
+            'cache': self.server.cache.stats(),
+        }
+
+    def _report_metrics(self) -> None:
+        while True:
+            try:
+                self.state[self.index] = self._report()
+            except (OSError, EOFError):
+                # 监督进程已退出
+                return
+            time.sleep(METRICS_INTERVAL)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _forward_to_sigint(signum, frame):
+    # asyncio.run 自己处理 SIGINT（先取消主任务再抛出 KeyboardInterrupt），两种模式都按 Ctrl+C 关闭
+    signal.raise_signal(signal.SIGINT)
+
+
+def _worker_main(index: int, processes: int, mode: str, options: Dict[str, Any], bus, inbox, state,
+                 unix_listener) -> None:
+    """工作进程入口"""
+    # 监督进程用 SIGTERM 停止工作进程，按 Ctrl+C 处理以便正常关闭连接与线程池
+    signal.signal(signal.SIGTERM, _forward_to_sigint)
+    if mode == 'asyncio':
+        from server_async import AsyncLibraryServer as server_class
+    else:
+        from server import LibraryServer as server_class
+    server = server_class(**options, reuse_port=True)
+    # Unix 域套接字不能由多个进程分别绑定同一路径，使用监督进程创建后继承下来的监听套接字
+    server.unix_listener = unix_listener
+    if index != 0:
+        # 逾期检查只在 0 号进程进行，事件经总线送达其他进程
+        server.overdue_sweep_interval = 0
+        # 执行进程已退出或心跳超时的未完成任务也只由 0 号进程接手（见 jobs.py）
+        server.recover_jobs = False
+    ClusterLink(index, processes, bus, inbox, state).attach(server)
+    server.start()
+
+
+class PreforkSupervisor:
+    """监督进程：启动工作进程、重启崩溃的进程并转发总线消息"""
+
+    def __init__(self, processes: int, mode: str, options: Dict[str, Any]):
+        self.processes = processes
+        self.mode = mode
+        self.options = options
+        self._ctx = multiprocessing.get_context('fork')
+        self._workers: Dict[int, Any] = {}
+        self._started: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._crashes: Dict[int, int] = {}
+        self._restarts: Dict[int, int] = {}
+        self._inboxes: List[Any] = []
+        self._bus = None
+        self._manager = None
+        self._state = None
+        self._unix_listener = None
+
+    def run(self) -> None:
+        """启动全部工作进程并持续监督，直到按 Ctrl+C 或收到 SIGTERM"""
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            print("当前平台不支持 SO_REUSEPORT，无法使用多进程模式")
+            return
+        # 先在监督进程中初始化数据库表结构，避免多个工作进程同时建表；
+        # 继承下来的连接池会在 fork 后被子进程丢弃（见 database._reset_after_fork）
+        from database import Database
+        Database()
+        # 全部工作进程使用同一个会话签名密钥，令牌在任意进程都能校验
+        if not self.options.get('session_secret'):
+            self.options['session_secret'] = secrets.token_hex(32)
+        if self.options.get('unix_socket'):
+            from server import create_unix_listener
+            try:
+                self._unix_listener = create_unix_listener(self.options['unix_socket'])
+            except OSError as e:
+                print(f"监听 Unix 域套接字 {self.options['unix_socket']} 失败: {e}")
+                self.options['unix_socket'] = None
+
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+        self._manager = SyncManager(ctx=self._ctx)
+        # 共享字典所在的管理进程不响应 Ctrl+C，由监督进程在最后关闭
+        self._manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+        self._state = self._manager.dict()
+        self._bus = self._ctx.Queue()
+        self._inboxes = [self._ctx.Queue() for _ in range(self.processes)]
+        threading.Thread(target=self._relay, name='cluster-relay', daemon=True).start()
+
+        for index in range(self.processes):
+            self._spawn(index)
+        print(f"多进程模式：{self.processes} 个工作进程（{self.mode}），"
+              f"监听 {self.options.get('host')}:{self.options.get('port')}"
+              + (f" 与 {self.options['unix_socket']}" if self._unix_listener is not None else ''))
+        try:
+            while True:
+                time.sleep(SUPERVISE_INTERVAL)
+                self._check_workers()
+        except KeyboardInterrupt:
+            print("\n服务端正在关闭...")
+        finally:
+            self._stop()
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.processes, self.mode, self.options, self._bus, self._inboxes[index], self._state,
+                  self._unix_listener),
+            name=f'library-worker-{index}',
+        )
+        process.start()
+        self._workers[index] = process
+        self._started[index] = time.monotonic()
+
+    def _check_workers(self) -> None:
+        """重启已退出的工作进程；连续启动即崩溃时逐步延长等待，避免空转"""
+        now = time.monotonic()
+        for index, process in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            restart_at = self._restart_at.get(index)
+            if restart_at is not None:
+                if now >= restart_at:
+                    del self._restart_at[index]
+                    self._spawn(index)
+                continue
+            process.join()
+            if now - self._started[index] < CRASH_WINDOW:
+                self._crashes[index] = self._crashes.get(index, 0) + 1
+            else:
+                self._crashes[index] = 0
+            crashes = self._crashes[index]
+            delay = min(MAX_RESTART_DELAY, 2 ** (crashes - 1)) if crashes else 0
+            self._restarts[index] = self._restarts.get(index, 0) + 1
+            self._state['restarts'] = dict(self._restarts)
+            print(f"工作进程 {index}（pid {process.pid}）已退出，退出码 {process.exitcode}，{delay} 秒后重启")
+            self._restart_at[index] = now + delay
+
+    def _relay(self) -> None:
+        """把一个工作进程发出的消息转发给其他全部工作进程"""
+        while True:
+            try:
+                item = self._bus.get()
+            except (OSError, EOFError):
+                return
+            if item is None:
+                return
+            sender, message = item
+            for index, inbox in enumerate(self._inboxes):
+                if index != sender:
+                    inbox.put(message)
+
+    def _stop(self) -> None:
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._workers.values():
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._bus.put(None)
+        self._manager.shutdown()
+        if self._unix_listener is not None:
+            self._unix_listener.close()
+            try:
+                os.unlink(self.options['unix_socket'])
+            except OSError:
+                pass
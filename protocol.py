@@ -0,0 +1,95 @@
+"""
+通信协议模块
+服务端与客户端共用的帧格式定义
+
+帧格式：
+    v1（默认）：4字节数据长度（大端） + 数据
+    v2（连接建立后通过 hello 协商）：4字节数据长度 + 4字节请求ID + 1字节标志 + 数据
+
+v2 中请求ID由客户端分配，服务端原样带回，因此同一连接上可以同时发出多个请求，
+响应按完成顺序返回，客户端按请求ID匹配。请求ID 0 保留给不对应任何请求的帧。
+
+v2 的标志字节按位使用：
+    FLAG_COMPRESSED：数据已用握手时协商的算法压缩（见 compression.py）
+    FLAG_CHUNK：流式响应的中间块，同一请求ID后面还有帧；不带此标志的帧是该请求的最后一帧
+    FLAG_PUSH：服务端主动推送的事件（请求ID 为 0，见 events.py），需先协商 FEATURE_PUSH 并订阅
+
+流式响应（协商了 FEATURE_STREAMING 且请求带 'stream': True 时）：
+    若干中间块 {'data': [行, ...]}，最后一帧 {'success': ..., 'count': 总行数}。
+    不支持流式的操作仍返回普通的单帧响应，客户端按最后一帧处理即可。
+"""
+import struct
+from typing import List, Tuple
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+
+HEADER_V1 = struct.Struct('>I')
+HEADER_V2 = struct.Struct('>IIB')
+
+# 帧标志位
+FLAG_COMPRESSED = 0x01
+FLAG_CHUNK = 0x02
+FLAG_PUSH = 0x04
+
+# 协议能力，hello 握手时由双方取交集
+FEATURE_REQUEST_ID = 'request_id'
+FEATURE_STREAMING = 'streaming'
+FEATURE_PUSH = 'push'
+
+# 仅用于 v1 连接的第一帧，协商成功后双方切换到 v2
+HELLO_ACTION = 'hello'
+
+# 请求ID为32位无符号整数，循环使用
+MAX_REQUEST_ID = 0xFFFFFFFF
+
+
+def header_size(version: int) -> int:
+    """指定协议版本的帧头长度"""
+    return HEADER_V2.size if version >= PROTOCOL_V2 else HEADER_V1.size
+
+
+def pack_frame(body: bytes, version: int = PROTOCOL_V1, request_id: int = 0, flags: int = 0) -> bytes:
+    """按协议版本打包一帧"""
+    if version >= PROTOCOL_V2:
+        return HEADER_V2.pack(len(body), request_id, flags) + body
+    return HEADER_V1.pack(len(body)) + body
+
+
+def unpack_header(header: bytes, version: int) -> Tuple[int, int, int]:
+    """解析帧头，返回 (数据长度, 请求ID, 标志)"""
+    if version >= PROTOCOL_V2:
+        return HEADER_V2.unpack(header)
+    return HEADER_V1.unpack(header)[0], 0, 0
+
+
+class FrameReader:
+    """增量切分帧：不断追加收到的字节，取出其中完整的帧"""
+
+    def __init__(self, version: int = PROTOCOL_V1):
+        self.version = version
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._buffer.extend(data)
+
+    def next_frame(self):
+        """取出一帧 (请求ID, 标志, 数据)，数据不完整时返回 None"""
+        size = header_size(self.version)
+        if len(self._buffer) < size:
+            return None
+        length, request_id, flags = unpack_header(bytes(self._buffer[:size]), self.version)
+        if len(self._buffer) < size + length:
+            return None
+        body = bytes(self._buffer[size:size + length])
+        del self._buffer[:size + length]
+        return request_id, flags, body
+
+    def frames(self) -> List[Tuple[int, int, bytes]]:
+        """取出当前缓冲区中所有完整的帧"""
+        result = []
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return result
+            result.append(frame)
@@ -0,0 +1,134 @@
+"""
+响应缓存模块
+只读操作的成功响应按 操作名 + 规范化参数 缓存，容量有上限（LRU 淘汰），每条记录有过期时间；
+写操作提交后按标签使相关记录失效（如 'book:3' 只清除该图书的 get_book 缓存）。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class _Entry:
+    """一条缓存记录"""
+
+    __slots__ = ('value', 'expires', 'tags')
+
+    def __init__(self, value: Any, expires: float, tags: Tuple[str, ...]):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+
+
+def make_key(action: str, data: Any) -> str:
+    """缓存键：操作名 + 参数按键排序后的 JSON（值为 None 的参数视为未传）"""
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if v is not None}
+    return f"{action}:{json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)}"
+
+
+class ResponseCache:
+    """带 TTL 与标签失效的 LRU 缓存，线程安全
+
+    并发的读请求可能在写操作提交前读到旧数据、在失效之后才写入缓存；
+    因此 put 需要带上读取前从 generation 取得的值，期间发生过失效时放弃写入。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # 标签 -> 带该标签的缓存键
+        self._tags: Dict[str, set] = {}
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """每次失效操作后递增"""
+        return self._generation
+
+    def get(self, key: str) -> Optional[Any]:
+        """返回未过期的缓存值，不存在时返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any, ttl: float, tags: Iterable[str] = (), generation: Optional[int] = None) -> None:
+        """写入缓存；generation 与当前值不同（读取期间发生过失效）时放弃写入"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = tuple(tags)
+            self._entries[key] = _Entry(value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, *tags: str) -> None:
+        """清除带任一指定标签的缓存"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        """清空全部缓存"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,209 @@
+"""
+请求调度模块
+固定数量的工作线程从有界队列中取请求执行，队列满时立即拒绝（背压），
+避免高峰期线程无限增长、延迟无限拉长。
+
+请求按操作分到不同的通道（lane），每个通道有自己的工作线程与队列：
+可视化数据、全表查询等耗时操作即使大量堆积，也只占用所在通道的线程（以及它们借出的数据库连接），
+登录、借书、查看图书等交互操作始终有空闲线程处理。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import LATENCY_BUCKETS_MS
+
+# 通道：交互操作、统计分析类的耗时读操作、批量写操作
+LANE_INTERACTIVE = 'interactive'
+LANE_ANALYTICS = 'analytics'
+LANE_BULK = 'bulk'
+
+
+class _Lane:
+    """一个通道：有界队列、工作线程与统计信息"""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=self.queue_size)
+        self.threads: List[threading.Thread] = []
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.active = 0
+        self.peak_depth = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # 排队等待时间直方图（桶上限同 metrics.LATENCY_BUCKETS_MS，最后一个为 +inf）
+        self.wait_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record_wait(self, waited: float) -> None:
+        """记录一次排队等待（调用方持有锁）"""
+        self.active += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        waited_ms = waited * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if waited_ms <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+    def wait_percentile(self, pct: float) -> Optional[float]:
+        """根据直方图估算排队等待的百分位（取所在桶的上限，不超过最大值，毫秒）"""
+        started = sum(self.wait_buckets)
+        if not started:
+            return None
+        target = started * pct / 100.0
+        cumulative = 0
+        max_ms = round(self.wait_max * 1000, 3)
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.wait_buckets):
+            cumulative += n
+            if cumulative >= target:
+                return min(float(bound), max_ms)
+        return max_ms
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.failed + self.active
+        return {
+            'workers': self.workers,
+            'active': self.active,
+            'queue_size': self.queue_size,
+            'queue_depth': self.queue.qsize(),
+            'peak_queue_depth': self.peak_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'avg_queue_ms': round(self.wait_total * 1000 / started, 3) if started else 0.0,
+            'p95_queue_ms': self.wait_percentile(95),
+            'p99_queue_ms': self.wait_percentile(99),
+            'max_queue_ms': round(self.wait_max * 1000, 3),
+        }
+
+
+class RequestScheduler:
+    """按通道划分的固定大小工作线程池 + 有界请求队列
+
+    workers、queue_size 为交互通道的线程数与队列上限；
+    lanes 为其他通道的 {通道名: (线程数, 队列上限)}，线程数为 0 的通道并入交互通道。
+    """
+
+    def __init__(self, workers: int = 20, queue_size: int = 256, name: str = 'library-worker',
+                 lanes: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.name = name
+        self._lanes: Dict[str, _Lane] = {LANE_INTERACTIVE: _Lane(LANE_INTERACTIVE, workers, queue_size)}
+        for lane, (lane_workers, lane_queue_size) in (lanes or {}).items():
+            if lane_workers > 0 and lane != LANE_INTERACTIVE:
+                self._lanes[lane] = _Lane(lane, lane_workers, lane_queue_size)
+        self.workers = sum(lane.workers for lane in self._lanes.values())
+        self.queue_size = sum(lane.queue_size for lane in self._lanes.values())
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def start(self) -> None:
+        """启动全部通道的工作线程"""
+        self._stopping = False
+        for lane in self._lanes.values():
+            lane.threads = []
+            for i in range(lane.workers):
+                t = threading.Thread(target=self._worker_loop, args=(lane,),
+                                     name=f"{self.name}-{lane.name}-{i}", daemon=True)
+                t.start()
+                lane.threads.append(t)
+
+    def shutdown(self) -> None:
+        """通知所有工作线程退出（不等待队列中剩余请求）
+        先设置停止标志（工作线程取到请求时检查），再清空队列中未开始的请求，
+        腾出位置后为每个工作线程放入一个结束标记，队列被并发写满也不会漏掉线程
+        """
+        self._stopping = True
+        for lane in self._lanes.values():
+            remaining = len(lane.threads) + self._drain(lane)
+            while remaining:
+                try:
+                    lane.queue.put(None, timeout=0.1)
+                    remaining -= 1
+                except queue.Full:
+                    remaining += self._drain(lane)
+
+    def _drain(self, lane: _Lane) -> int:
+        """取消队列中尚未开始的请求，返回一并取出的结束标记数（由调用方重新放入）"""
+        sentinels = 0
+        while True:
+            try:
+                item = lane.queue.get_nowait()
+            except queue.Empty:
+                return sentinels
+            if item is None:
+                sentinels += 1
+            else:
+                item[1].cancel()
+
+    def submit(self, func: Callable[..., Any], *args, lane: str = LANE_INTERACTIVE) -> Optional[Future]:
+        """提交任务到指定通道（不存在的通道按交互通道处理）；队列已满时返回 None，由调用方给出繁忙响应"""
+        target = self._lanes.get(lane) or self._lanes[LANE_INTERACTIVE]
+        if self._stopping:
+            return None
+        future: Future = Future()
+        try:
+            target.queue.put_nowait((time.monotonic(), future, func, args))
+        except queue.Full:
+            with self._lock:
+                target.rejected += 1
+            return None
+        with self._lock:
+            target.submitted += 1
+            target.peak_depth = max(target.peak_depth, target.queue.qsize())
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """队列与工作线程统计信息：全部通道的合计，以及各通道的排队等待时间"""
+        with self._lock:
+            lanes = {name: lane.stats() for name, lane in self._lanes.items()}
+            started = sum(lane.completed + lane.failed + lane.active for lane in self._lanes.values())
+            wait_total = sum(lane.wait_total for lane in self._lanes.values())
+        totals = {
+            key: sum(item[key] for item in lanes.values())
+            for key in ('active', 'queue_depth', 'peak_queue_depth', 'submitted', 'completed', 'failed', 'rejected')
+        }
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            **totals,
+            'avg_queue_ms': round(wait_total * 1000 / started, 3) if started else 0.0,
+            'max_queue_ms': max(item['max_queue_ms'] for item in lanes.values()),
+            'lanes': lanes,
+        }
+
+    def _worker_loop(self, lane: _Lane) -> None:
+        while True:
+            item = lane.queue.get()
+            if item is None:
+                break
+            enqueued_at, future, func, args = item
+            if self._stopping:
+                future.cancel()
+                continue
+            with self._lock:
+                lane.record_wait(time.monotonic() - enqueued_at)
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    lane.active -= 1
+                continue
+            try:
+                result = func(*args)
+            except BaseException as e:
+                future.set_exception(e)
+                with self._lock:
+                    lane.active -= 1
+                    lane.failed += 1
+            else:
+                future.set_result(result)
+                with self._lock:
+                    lane.active -= 1
+                    lane.completed += 1
@@ -2,103 +2,512 @@
 图书管理系统服务端
 处理客户端请求，提供远程访问功能
 """
+import argparse
+import os
+import selectors
 import socket
+import stat
+import sys
 import threading
-import json
-import struct
-from datetime import datetime, date
-from decimal import Decimal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from config import SERVER_CONFIG
 from database import Database
-from models import UserModel, BookModel, BorrowModel, EmailModel
+from models import UserModel, BookModel, BorrowModel, EmailModel, borrow_limit
 from openlibrary_import import OpenLibraryImporter
+from jobs import JobManager
+from codec import JSON_CODEC, choose_codec, get_codec
+from compression import choose_compression, get_compressor
+from events import (EVENT_BOOK_CHANGED, EVENT_BORROW_OVERDUE, EVENT_EMAIL_RECEIVED, TOPIC_BOOKS,
+                    TOPIC_BORROWS, TOPIC_EMAILS, TOPICS, EventHub)
+from metrics import ServerMetrics
+from response_cache import ResponseCache, make_key
+from sessions import Session, SessionStore
+from singleflight import SingleFlight
+from tracing import SlowRequestLog, annotate, span
+from protocol import (FEATURE_PUSH, FEATURE_REQUEST_ID, FEATURE_STREAMING, FLAG_CHUNK, FLAG_COMPRESSED, HELLO_ACTION,
+                      PROTOCOL_V1, PROTOCOL_V2, FrameReader, pack_frame)
+from scheduler import LANE_ANALYTICS, LANE_BULK, LANE_INTERACTIVE, RequestScheduler
 
+# 工作线程回写响应时的 socket 超时（秒），防止客户端不读数据时无限阻塞
+SEND_TIMEOUT = 30.0
+RECV_BUFFER_SIZE = 65536
+
+# I/O 线程产生的响应（握手响应、繁忙响应）交给这些线程写出，I/O 线程自身不做阻塞写入
+REPLY_THREADS = 2
+
+# 服务端支持的协议能力，hello 握手时与客户端取交集
+SERVER_FEATURES = (FEATURE_REQUEST_ID, FEATURE_STREAMING, FEATURE_PUSH)
+
+# I/O 线程只解码不超过该字节数的未压缩请求来确定通道，更大的请求直接归入批量通道
+CLASSIFY_MAX_BYTES = 16384
+# 通道的轻重顺序：batch 请求进入其子请求中最重的通道
+LANE_ORDER = (LANE_INTERACTIVE, LANE_ANALYTICS, LANE_BULK)
+
+# 流式响应每块的默认行数与上限
+STREAM_BATCH_SIZE = 500
+MAX_STREAM_BATCH_SIZE = 5000
+# 流式响应每块的最长发送时间（秒），以及请求未带截止时间时整个流式响应的最长时间；
+# 超过时停止读取并释放游标，读得慢或停止读取的客户端不会一直占用工作线程与数据库连接
+STREAM_CHUNK_TIMEOUT = 10.0
+STREAM_MAX_DURATION = 300.0
+
+# 工作线程正在处理的请求所属的连接（subscribe 需要知道是哪条连接）与会话
+_CURRENT = threading.local()
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    """请求操作的元数据"""
+
+    handler: str                # LibraryServer 上的处理方法名
+    admin_only: bool = False    # 是否仅管理员可用
+    write: bool = False         # 是否会修改数据
+    timeout: float = 2.0        # 期望的最长处理时间（秒），超出时计为慢请求
+    stream: Optional[str] = None  # 支持流式响应时，逐批产出数据的方法名
+    cache_ttl: float = 0.0      # 成功响应的缓存时间（秒），0 表示不缓存
+    cache_tags: Tuple[str, ...] = ()   # 缓存记录的失效标签，可引用请求参数，如 'book:{book_id}'
+    invalidates: Tuple[str, ...] = ()  # 写操作成功提交后失效的缓存标签
+    public: bool = False        # 是否允许未登录（不带会话令牌）调用
+    coalesce: bool = False      # 同时到达的相同请求（参数与编码相同）是否合并为一次执行，仅用于只读操作
+    lane: str = LANE_INTERACTIVE  # 执行通道（见 scheduler.py），耗时操作不占用交互操作的线程
+
+
+# 缓存标签：图书分类、借阅统计、管理员可视化数据；单本图书为 'book:<id>'
+# 'user:<id>' 与 'session:<令牌>' 不对应响应缓存，用于使会话缓存失效（见 apply_invalidation）
+CACHE_TAG_CATEGORIES = 'categories'
+CACHE_TAG_STATS = 'stats'
+CACHE_TAG_DASHBOARD = 'dashboard'
+# 图书增删改、借还影响的缓存
+BOOK_WRITE_TAGS = (CACHE_TAG_CATEGORIES, CACHE_TAG_STATS, CACHE_TAG_DASHBOARD)
+BORROW_WRITE_TAGS = (CACHE_TAG_STATS, CACHE_TAG_DASHBOARD)
+
+
+# 操作注册表：操作名 -> 元数据
+ACTIONS: Dict[str, ActionSpec] = {
+    # 用户操作
+    'login': ActionSpec('handle_login', public=True),
+    'logout': ActionSpec('handle_logout', public=True),
+    'register': ActionSpec('handle_register', write=True, public=True),
+    'get_user_info': ActionSpec('handle_get_user_info'),
+    'update_user_info': ActionSpec('handle_update_user_info', write=True),
+    'change_password': ActionSpec('handle_change_password', write=True),
+    'search_books': ActionSpec('handle_search_books', timeout=5.0, stream='stream_search_books', public=True,
+                               coalesce=True, lane=LANE_ANALYTICS),
+    'search_books_page': ActionSpec('handle_search_books_page', public=True, coalesce=True),
+    'get_book': ActionSpec('handle_get_book', cache_ttl=60.0, cache_tags=('book:{book_id}',), public=True,
+                           coalesce=True),
+    'borrow_book': ActionSpec('handle_borrow_book', write=True, invalidates=BORROW_WRITE_TAGS),
+    'return_book': ActionSpec('handle_return_book', write=True, invalidates=BORROW_WRITE_TAGS),
+    'get_my_borrows': ActionSpec('handle_get_my_borrows'),
+    'get_statistics': ActionSpec('handle_get_statistics', cache_ttl=60.0, cache_tags=(CACHE_TAG_STATS,),
+                                 coalesce=True, lane=LANE_ANALYTICS),
+    'get_categories': ActionSpec('handle_get_categories', cache_ttl=300.0, cache_tags=(CACHE_TAG_CATEGORIES,),
+                                 public=True, coalesce=True),
+    'get_user_emails': ActionSpec('handle_get_user_emails'),
+    # 管理员操作
+    'add_book': ActionSpec('handle_add_book', admin_only=True, write=True, invalidates=BOOK_WRITE_TAGS),
+    'update_book': ActionSpec('handle_update_book', admin_only=True, write=True, invalidates=BOOK_WRITE_TAGS),
+    'delete_book': ActionSpec('handle_delete_book', admin_only=True, write=True, invalidates=BOOK_WRITE_TAGS),
+    'get_all_borrows': ActionSpec('handle_get_all_borrows', admin_only=True, timeout=5.0,
+                                  stream='stream_get_all_borrows', coalesce=True, lane=LANE_ANALYTICS),
+    'get_all_borrows_page': ActionSpec('handle_get_all_borrows_page', admin_only=True, coalesce=True),
+    'get_borrow': ActionSpec('handle_get_borrow', admin_only=True),
+    'admin_update_borrow': ActionSpec('handle_admin_update_borrow', admin_only=True, write=True,
+                                      invalidates=BORROW_WRITE_TAGS),
+    'get_all_users': ActionSpec('handle_get_all_users', admin_only=True, timeout=5.0, coalesce=True,
+                                lane=LANE_ANALYTICS),
+    'get_all_users_page': ActionSpec('handle_get_all_users_page', admin_only=True, coalesce=True),
+    'send_email': ActionSpec('handle_send_email', admin_only=True, write=True, timeout=15.0, lane=LANE_BULK),
+    'send_emails': ActionSpec('handle_send_emails', admin_only=True, write=True, timeout=60.0, lane=LANE_BULK),
+    'get_all_emails': ActionSpec('handle_get_all_emails', admin_only=True, timeout=5.0, lane=LANE_ANALYTICS),
+    'admin_update_user': ActionSpec('handle_admin_update_user', admin_only=True, write=True),
+    'admin_add_user': ActionSpec('handle_admin_add_user', admin_only=True, write=True),
+    'admin_delete_user': ActionSpec('handle_admin_delete_user', admin_only=True, write=True),
+    'import_books_from_openlibrary': ActionSpec('handle_import_books_from_openlibrary', admin_only=True, write=True,
+                                                lane=LANE_BULK),
+    'get_job_status': ActionSpec('handle_get_job_status', admin_only=True),
+    'cancel_job': ActionSpec('handle_cancel_job', admin_only=True, write=True),
+    'get_admin_dashboard_data': ActionSpec('handle_get_admin_dashboard_data', admin_only=True, timeout=10.0,
+                                           cache_ttl=60.0, cache_tags=(CACHE_TAG_DASHBOARD,), coalesce=True,
+                                           lane=LANE_ANALYTICS),
+    'get_user_dashboard_data': ActionSpec('handle_get_user_dashboard_data', admin_only=True, timeout=10.0,
+                                          coalesce=True, lane=LANE_ANALYTICS),
+    'get_server_metrics': ActionSpec('handle_get_server_metrics', admin_only=True),
+    # 子请求各自检查权限；执行通道按子请求确定（见 classify_frame），lane 只用于无法在 I/O 线程解码的大请求
+    'batch': ActionSpec('handle_batch', write=True, timeout=60.0, public=True, lane=LANE_BULK),
+    # 未登录时只能订阅图书库存变化
+    'subscribe': ActionSpec('handle_subscribe', public=True),
+}
+
+# 后台任务类型
+JOB_OPENLIBRARY_IMPORT = 'openlibrary_import'
+
+# 未登录或令牌失效、权限不足时的响应
+UNAUTHORIZED_RESPONSE = {'success': False, 'error': 'unauthorized', 'message': '请先登录'}
+FORBIDDEN_RESPONSE = {'success': False, 'error': 'forbidden', 'message': '需要管理员权限'}
+# 超过客户端给出的截止时间（请求的 timeout_ms）时的响应，客户端可以稍后重试或降级显示
+DEADLINE_EXCEEDED_RESPONSE = {'success': False, 'error': 'deadline_exceeded', 'message': '请求处理超时，请稍后重试'}
+
+# 单个 batch 请求最多包含的子请求数
+MAX_BATCH_SIZE = 500
+# 单个 send_emails 请求最多的收件人数
+MAX_EMAIL_RECIPIENTS = 20000
+
+
+def create_unix_listener(path: str) -> socket.socket:
+    """创建并监听 Unix 域套接字
+    路径上遗留的套接字文件（上次未正常退出）先删除；已有服务端在该路径监听时抛出 OSError
+    """
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f"{path} 已存在且不是套接字文件")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise OSError(f"{path} 上已有服务端在监听")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        sock.listen(SERVER_CONFIG['backlog'])
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class _BatchAborted(Exception):
+    """事务模式的 batch 中某个子请求失败"""
 
-def json_serialize(obj):
-    """自定义JSON序列化函数，处理datetime、date和Decimal对象"""
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    elif isinstance(obj, Decimal):
-        # 将Decimal转换为float，保留精度
-        return float(obj)
-    raise TypeError(f"Type {type(obj)} not serializable")
 
 class LibraryServer:
     """图书管理系统服务端"""
     
-    def __init__(self, host='0.0.0.0', port=8888):
+    def __init__(self, host=SERVER_CONFIG['host'], port=SERVER_CONFIG['port'],
+                 workers=SERVER_CONFIG['workers'], queue_size=SERVER_CONFIG['queue_size'],
+                 compression=SERVER_CONFIG['compression'],
+                 compression_level=SERVER_CONFIG['compression_level'],
+                 compression_threshold=SERVER_CONFIG['compression_threshold'],
+                 response_cache=SERVER_CONFIG['response_cache'], reuse_port=False, session_secret=None,
+                 unix_socket=SERVER_CONFIG['unix_socket'], slow_log_ms=SERVER_CONFIG['slow_log_ms']):
         self.host = host
         self.port = port
         self.db = Database()
         self.user_model = UserModel(self.db)
         self.book_model = BookModel(self.db)
         self.borrow_model = BorrowModel(self.db)
+        self.scheduler = RequestScheduler(workers=workers, queue_size=queue_size, lanes={
+            LANE_ANALYTICS: (SERVER_CONFIG['analytics_workers'], SERVER_CONFIG['analytics_queue_size']),
+            LANE_BULK: (SERVER_CONFIG['bulk_workers'], SERVER_CONFIG['bulk_queue_size']),
+        })
+        self.metrics = ServerMetrics()
+        # 请求追踪：总耗时超过 slow_log_ms 的请求连同跨度树与 SQL 写入慢请求日志（见 tracing.py）
+        self.slow_log = SlowRequestLog(slow_log_ms, SERVER_CONFIG['slow_log_path'])
+        self.cache = ResponseCache(SERVER_CONFIG['response_cache_size'], enabled=response_cache)
+        # 会话：令牌 -> 用户ID、角色、借阅上限与当前借阅数（多进程模式下由监督进程统一传入签名密钥）
+        self.sessions = SessionStore(self._load_session_user,
+                                     secret=session_secret or SERVER_CONFIG['session_secret'],
+                                     ttl=SERVER_CONFIG['session_ttl'],
+                                     max_sessions=SERVER_CONFIG['session_cache_size'])
+        self.require_session = SERVER_CONFIG['require_session']
+        # 相同只读请求的合并执行
+        self.flights = SingleFlight()
+        self.coalesce_reads = SERVER_CONFIG['coalesce_reads']
+        # 操作名 -> (元数据, 绑定的处理方法)，一次字典查找完成分发
+        self._handlers = {
+            action: (spec, getattr(self, spec.handler)) for action, spec in ACTIONS.items()
+        }
+        self.busy_retry_ms = SERVER_CONFIG['busy_retry_ms']
+        # 允许的压缩算法（按优先顺序）、压缩级别与阈值
+        self.compression = list(compression or [])
+        self.compression_level = compression_level
+        self.compression_threshold = compression_threshold
+        self.max_frame_size = SERVER_CONFIG['max_frame_size']
+        # 变更事件推送与逾期检查
+        self.events = EventHub()
+        self.overdue_sweep_interval = SERVER_CONFIG['overdue_sweep_interval']
+        self._overdue_seen: Optional[set] = None
+        self._stop_event = threading.Event()
+        self._replies: Optional[ThreadPoolExecutor] = None
+        # 后台任务（独立线程池，不占用请求工作线程）
+        self.jobs = JobManager(self.db, workers=SERVER_CONFIG['job_workers'])
+        self.jobs.register(JOB_OPENLIBRARY_IMPORT, self._run_import_job)
+        # 启动时是否处理上次遗留的未完成任务（多进程模式下只由 0 号进程处理）
+        self.recover_jobs = True
+        # 多进程模式下由 prefork 设置：端口复用与进程间的缓存失效/事件转发
+        self.reuse_port = reuse_port
+        self.cluster = None
+        # 可选的 Unix 域套接字；多进程模式下由监督进程创建并设置 unix_listener，各工作进程共用
+        self.unix_socket = unix_socket
+        self.unix_listener: Optional[socket.socket] = None
+        self._owns_unix_listener = False
         self.running = False
     
-    def handle_request(self, request: dict) -> dict:
-        """处理客户端请求"""
+    def handle_request(self, request: dict, received_at: Optional[float] = None) -> dict:
+        """处理客户端请求：按操作注册表分发到对应的处理方法
+        请求带有 timeout_ms 时，从 received_at（I/O 线程收到请求的 time.monotonic()）起计算截止时间：
+        排队期间已经过期的请求不再处理，处理期间的数据库语句受剩余时间限制（见 Database.deadline）。
+        过期或查询被中断时返回 DEADLINE_EXCEEDED_RESPONSE；已成功的写操作照常返回结果。
+        batch 的子请求不带 timeout_ms，沿用外层请求的截止时间。
+        """
+        deadline = self._request_deadline(request, received_at)
+        if deadline is not None and time.monotonic() >= deadline:
+            return DEADLINE_EXCEEDED_RESPONSE
+        with self.db.deadline(deadline):
+            response = self._dispatch(request)
+            if not self.db.deadline_exceeded():
+                return response
+        entry = self._handlers.get(request.get('action'))
+        if entry is not None and entry[0].write and response.get('success'):
+            return response
+        return DEADLINE_EXCEEDED_RESPONSE
+    
+    @staticmethod
+    def _request_deadline(request: dict, received_at: Optional[float]) -> Optional[float]:
+        """请求的截止时间（time.monotonic()），未带有效 timeout_ms 时返回 None"""
+        timeout_ms = request.get('timeout_ms')
+        if isinstance(timeout_ms, bool) or not isinstance(timeout_ms, (int, float)) or timeout_ms <= 0:
+            return None
+        return (time.monotonic() if received_at is None else received_at) + timeout_ms / 1000.0
+    
+    def _dispatch(self, request: dict) -> dict:
         action = request.get('action')
         data = request.get('data', {})
         
+        entry = self._handlers.get(action)
+        if entry is None:
+            return {'success': False, 'message': f'未知操作: {action}'}
+        spec, handler = entry
+        session, denied = self._authorize(spec, request, data)
+        if denied is not None:
+            return denied
+        previous = getattr(_CURRENT, 'session', None)
+        _CURRENT.session = session
         try:
-            if action == 'login':
-                return self.handle_login(data)
-            elif action == 'register':
-                return self.handle_register(data)
-            elif action == 'get_user_info':
-                return self.handle_get_user_info(data)
-            elif action == 'update_user_info':
-                return self.handle_update_user_info(data)
-            elif action == 'change_password':
-                return self.handle_change_password(data)
-            elif action == 'search_books':
-                return self.handle_search_books(data)
-            elif action == 'get_book':
-                return self.handle_get_book(data)
-            elif action == 'borrow_book':
-                return self.handle_borrow_book(data)
-            elif action == 'return_book':
-                return self.handle_return_book(data)
-            elif action == 'get_my_borrows':
-                return self.handle_get_my_borrows(data)
-            # 管理员操作
-            elif action == 'add_book':
-                return self.handle_add_book(data)
-            elif action == 'update_book':
-                return self.handle_update_book(data)
-            elif action == 'delete_book':
-                return self.handle_delete_book(data)
-            elif action == 'get_all_borrows':
-                return self.handle_get_all_borrows(data)
-            elif action == 'admin_update_borrow':
-                return self.handle_admin_update_borrow(data)
-            elif action == 'get_statistics':
-                return self.handle_get_statistics(data)
-            elif action == 'get_categories':
-                return self.handle_get_categories(data)
-            elif action == 'get_all_users':
-                return self.handle_get_all_users(data)
-            elif action == 'send_email':
-                return self.handle_send_email(data)
-            elif action == 'get_all_emails':
-                return self.handle_get_all_emails(data)
-            elif action == 'get_user_emails':
-                return self.handle_get_user_emails(data)
-            elif action == 'admin_update_user':
-                return self.handle_admin_update_user(data)
-            elif action == 'admin_add_user':
-                return self.handle_admin_add_user(data)
-            elif action == 'admin_delete_user':
-                return self.handle_admin_delete_user(data)
-            elif action == 'import_books_from_openlibrary':
-                return self.handle_import_books_from_openlibrary(data)
-            elif action == 'get_admin_dashboard_data':
-                return self.handle_get_admin_dashboard_data(data)
-            elif action == 'get_user_dashboard_data':
-                return self.handle_get_user_dashboard_data(data)
-            else:
-                return {'success': False, 'message': f'未知操作: {action}'}
+            with span('handler', action=action):
+                # 事务中可能读到本事务未提交的修改，不读也不写缓存
+                if spec.cache_ttl and self.cache.enabled and not self.db.in_transaction():
+                    return self._cached_call(action, spec, handler, data)
+                response = handler(data)
+            if spec.invalidates and response.get('success'):
+                self.db.on_commit(lambda: self.invalidate_cache(*spec.invalidates))
+            return response
         except Exception as e:
-            return {'success': False, 'message': f'服务器错误: {str(e)}'}
+            return {'success': False, 'error': 'internal_error', 'message': f'服务器错误: {str(e)}'}
+        finally:
+            _CURRENT.session = previous
+    
+    def _authorize(self, spec: ActionSpec, request: dict, data) -> Tuple[Optional[Session], Optional[dict]]:
+        """确定请求所属的会话并检查权限，返回 (会话, 拒绝时的响应)
+        普通用户的请求参数中的 user_id 一律改为会话中的用户，不能代替他人操作
+        """
+        token = request.get('token')
+        if token is not None:
+            session = self.sessions.get(token)
+            if session is None and not spec.public:
+                return None, {**UNAUTHORIZED_RESPONSE, 'message': '登录已失效，请重新登录'}
+        else:
+            # batch 的子请求沿用外层请求的会话
+            session = getattr(_CURRENT, 'session', None)
+        if session is None:
+            if spec.public or not self.require_session:
+                return None, None
+            return None, UNAUTHORIZED_RESPONSE
+        if spec.admin_only and not session.is_admin:
+            return session, FORBIDDEN_RESPONSE
+        if not session.is_admin and isinstance(data, dict) and 'user_id' in data:
+            data['user_id'] = session.user_id
+        return session, None
+    
+    def _load_session_user(self, user_id: int) -> Optional[tuple]:
+        """会话缓存未命中时加载用户上下文"""
+        user = self.user_model.get_user(user_id)
+        if not user:
+            return None
+        max_borrows, role_name = borrow_limit(user.get('role', 'user'))
+        return user, max_borrows, role_name
+    
+    def _cached_call(self, action: str, spec: ActionSpec, handler, data) -> dict:
+        """先查响应缓存，未命中时调用处理方法并缓存成功的响应"""
+        key = make_key(action, data)
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        generation = self.cache.generation
+        response = handler(data)
+        # 查询因截止时间被拒绝或中断时结果不完整，不缓存
+        if response.get('success') and not self.db.deadline_exceeded():
+            try:
+                tags = [tag.format_map(data) for tag in spec.cache_tags]
+            except (KeyError, IndexError, ValueError, TypeError):
+                # 参数不完整时无法确定失效标签，不缓存
+                return response
+            self.cache.put(key, response, spec.cache_ttl, tags, generation)
+        return response
+    
+    def handle_get_server_metrics(self, data: dict) -> dict:
+        """获取服务端运行指标（管理员）"""
+        return {
+            'success': True,
+            'data': {
+                **self.metrics.snapshot(),
+                'scheduler': self.get_scheduler_stats(),
+                'db_pool': self.db.get_pool_stats(),
+                'events': self.events.stats(),
+                'response_cache': self.cache.stats(),
+                'sessions': self.sessions.stats(),
+                'coalescing': self.flights.stats(),
+                'slow_log': self.slow_log.stats(),
+                **({'cluster': self.cluster.snapshot()} if self.cluster is not None else {}),
+            }
+        }
+    
+    def handle_subscribe(self, data: dict) -> dict:
+        """订阅变更事件推送；user_id 为空时接收所有用户的事件（管理员界面使用）
+        普通用户只能接收自己的事件（不论是否传入 user_id 都按会话用户订阅），未登录时只能订阅图书主题
+        """
+        conn = getattr(_CURRENT, 'conn', None)
+        if conn is None or FEATURE_PUSH not in conn.features:
+            return {'success': False, 'message': '当前连接未协商推送能力'}
+        topics = data.get('topics')
+        if not isinstance(topics, list):
+            topics = list(TOPICS)
+        user_id = data.get('user_id')
+        session = getattr(_CURRENT, 'session', None)
+        if session is None and self.require_session:
+            topics = [topic for topic in topics if topic == TOPIC_BOOKS]
+            user_id = None
+        elif session is not None and not session.is_admin:
+            # 不带 user_id 的订阅会被当作“所有用户”，普通用户一律限定为自己
+            user_id = session.user_id
+        accepted = self.events.subscribe(conn, topics, user_id)
+        return {'success': True, 'data': {'topics': accepted}}
+    
+    def invalidate_cache(self, *tags: str) -> None:
+        """使带指定标签的响应缓存与会话缓存失效；多进程模式下同时通知其他工作进程"""
+        self.apply_invalidation(*tags)
+        if self.cluster is not None:
+            self.cluster.broadcast_invalidation(tags)
+    
+    def apply_invalidation(self, *tags: str) -> None:
+        """只在本进程内使缓存失效：'user:<id>' 丢弃该用户的会话上下文，'session:<令牌>' 注销令牌"""
+        self.cache.invalidate(*tags)
+        # 写操作提交前开始的只读请求可能读到旧数据，之后到达的请求不再与其合并
+        self.flights.forget()
+        for tag in tags:
+            kind, _, value = tag.partition(':')
+            if kind == 'user' and value.isdigit():
+                self.sessions.forget_user(int(value))
+            elif kind == 'session' and value:
+                self.sessions.revoke(value)
+    
+    def publish_event(self, topic: str, event: str, data: dict, user_id=None) -> None:
+        """推送变更事件；多进程模式下同时转发给其他工作进程的订阅者"""
+        self.events.publish(topic, event, data, user_id)
+        if self.cluster is not None:
+            self.cluster.broadcast_event(topic, event, data, user_id)
+    
+    def publish_book_changed(self, book_id) -> None:
+        """事务提交后使该图书的缓存失效，并推送图书的最新库存与状态（图书已删除时 deleted 为 True）"""
+        def push():
+            self.invalidate_cache(f'book:{book_id}')
+            book = self.book_model.get_book(book_id)
+            data = {'book_id': book_id, 'deleted': book is None}
+            if book is not None:
+                data.update(available_copies=book.get('available_copies'),
+                            total_copies=book.get('total_copies'),
+                            status=book.get('status'))
+            self.publish_event(TOPIC_BOOKS, EVENT_BOOK_CHANGED, data)
+        self.db.on_commit(push)
+    
+    def sweep_overdue(self) -> None:
+        """检查新出现的逾期借阅并推送给借阅人
+        第一次检查只记录已有的逾期记录，避免服务端重启后重复提醒
+        """
+        records = self.borrow_model.get_overdue_records()
+        seen = {record['id'] for record in records}
+        if self._overdue_seen is not None:
+            for record in records:
+                if record['id'] in self._overdue_seen:
+                    continue
+                self.publish_event(TOPIC_BORROWS, EVENT_BORROW_OVERDUE, {
+                    'record_id': record['id'],
+                    'book_id': record['book_id'],
+                    'title': record['title'],
+                    'due_date': record['due_date'],
+                }, user_id=record['user_id'])
+        self._overdue_seen = seen
+    
+    def _overdue_loop(self) -> None:
+        while True:
+            try:
+                self.sweep_overdue()
+            except Exception as e:
+                print(f"逾期检查失败: {e}")
+            if self._stop_event.wait(self.overdue_sweep_interval):
+                break
+    
+    def start_services(self) -> None:
+        """启动工作线程池、事件推送线程与逾期检查线程"""
+        self._stop_event.clear()
+        self._replies = ThreadPoolExecutor(max_workers=REPLY_THREADS, thread_name_prefix='reply')
+        self.scheduler.start()
+        self.events.start()
+        self.jobs.start(recover=self.recover_jobs, resume=SERVER_CONFIG['resume_jobs'])
+        if self.overdue_sweep_interval > 0:
+            threading.Thread(target=self._overdue_loop, name='overdue-sweep', daemon=True).start()
+    
+    def stop_services(self) -> None:
+        """停止 start_services 启动的后台线程"""
+        self._stop_event.set()
+        self.jobs.shutdown()
+        self.events.shutdown()
+        self.scheduler.shutdown()
+        if self._replies is not None:
+            self._replies.shutdown(wait=False)
+    
+    def handle_batch(self, data: dict) -> dict:
+        """批量执行多个请求，按顺序返回各自的结果
+        data: {'requests': [{'action': ..., 'data': {...}}, ...], 'transaction': bool}
+        transaction=True 时全部子请求在同一个数据库事务中执行，任一失败则整体回滚
+        """
+        items = data.get('requests')
+        if not isinstance(items, list):
+            return {'success': False, 'message': 'requests 必须是列表'}
+        if len(items) > MAX_BATCH_SIZE:
+            return {'success': False, 'message': f'单次批量请求最多 {MAX_BATCH_SIZE} 个'}
+        for item in items:
+            if not isinstance(item, dict) or item.get('action') == 'batch':
+                return {'success': False, 'message': '批量请求中包含无效的子请求'}
+        
+        if not data.get('transaction'):
+            return {'success': True, 'data': [self.handle_request(item) for item in items]}
+        
+        results = []
+        try:
+            with self.db.transaction():
+                for index, item in enumerate(items):
+                    result = self.handle_request(item)
+                    results.append(result)
+                    if not result.get('success'):
+                        raise _BatchAborted(index)
+        except _BatchAborted as e:
+            return {
+                'success': False,
+                'message': f'第 {e.args[0] + 1} 个请求失败，事务已回滚',
+                'data': results
+            }
+        except Exception as e:
+            return {'success': False, 'message': f'批量请求事务提交失败，已回滚: {str(e)}', 'data': results}
+        return {'success': True, 'data': results}
     
     def handle_login(self, data: dict) -> dict:
         """处理登录请求"""
@@ -106,15 +515,28 @@ class LibraryServer:
         password = data.get('password')
         user = self.user_model.login(username, password)
         if user:
-            return {'success': True, 'data': user}
+            max_borrows, role_name = borrow_limit(user.get('role', 'user'))
+            token = self.sessions.create(user, max_borrows, role_name)
+            return {'success': True, 'data': user, 'token': token}
         return {'success': False, 'message': '用户名或密码错误'}
     
+    def handle_logout(self, data: dict) -> dict:
+        """注销当前会话令牌（所有工作进程）"""
+        session = getattr(_CURRENT, 'session', None)
+        if session is not None:
+            self.invalidate_cache(f'session:{session.token}')
+        return {'success': True, 'message': '已退出登录'}
+    
     def handle_register(self, data: dict) -> dict:
         """处理注册请求"""
+        role = data.get('role', 'user')
+        session = getattr(_CURRENT, 'session', None)
+        if role == 'admin' and (session is None or not session.is_admin):
+            return {'success': False, 'message': '不能注册管理员账号'}
         success = self.user_model.register(
             data.get('username'),
             data.get('password'),
-            data.get('role', 'user'),
+            role,
             data.get('name'),
             data.get('email', ''),
             data.get('phone', ''),
@@ -159,6 +581,24 @@ class LibraryServer:
         )
         return {'success': True, 'data': books}
     
+    def handle_search_books_page(self, data: dict) -> dict:
+        """分页搜索图书（after_id/limit 游标分页）"""
+        page = self.book_model.search_books_page(
+            data.get('keyword', ''),
+            data.get('category', ''),
+            data.get('after_id'),
+            data.get('limit')
+        )
+        return {'success': True, 'data': page}
+    
+    def stream_search_books(self, data: dict):
+        """逐批产出搜索结果（流式响应）"""
+        return self.book_model.iter_search_books(
+            data.get('keyword', ''),
+            data.get('category', ''),
+            self._stream_batch_size(data)
+        )
+    
     def handle_get_book(self, data: dict) -> dict:
         """获取图书详情"""
         book = self.book_model.get_book(data.get('book_id'))
@@ -167,17 +607,33 @@ class LibraryServer:
         return {'success': False, 'message': '图书不存在'}
     
     def handle_borrow_book(self, data: dict) -> dict:
-        """借阅图书"""
+        """借阅图书
+        借阅上限取自会话缓存，当前借阅数由 borrow_book 在事务中锁定用户行后按数据库统计
+        """
+        user_id = data.get('user_id')
+        limit = None
+        session = getattr(_CURRENT, 'session', None)
+        if session is not None and session.user_id == user_id:
+            limit = (session.max_borrows, session.role_name)
         success, message = self.borrow_model.borrow_book(
-            data.get('user_id'),
+            user_id,
             data.get('book_id'),
-            data.get('days', 30)
+            data.get('days', 30),
+            limit=limit
         )
+        if success:
+            self.publish_book_changed(data.get('book_id'))
         return {'success': success, 'message': message}
     
     def handle_return_book(self, data: dict) -> dict:
-        """归还图书"""
+        """归还图书（普通用户只能归还自己的借阅）"""
+        record = self.borrow_model.get_borrow(data.get('record_id'))
+        session = getattr(_CURRENT, 'session', None)
+        if session is not None and not session.is_admin and (record is None or record['user_id'] != session.user_id):
+            return {'success': False, 'message': '借阅记录不存在'}
         success = self.borrow_model.return_book(data.get('record_id'))
+        if success and record:
+            self.publish_book_changed(record['book_id'])
         return {'success': success, 'message': '归还成功' if success else '归还失败'}
     
     def handle_get_my_borrows(self, data: dict) -> dict:
@@ -205,11 +661,15 @@ class LibraryServer:
         """更新图书（管理员）"""
         book_id = data.pop('book_id')
         success = self.book_model.update_book(book_id, **data)
+        if success:
+            self.publish_book_changed(book_id)
         return {'success': success, 'message': '更新成功' if success else '更新失败'}
     
     def handle_delete_book(self, data: dict) -> dict:
         """删除图书（管理员）"""
         success = self.book_model.delete_book(data.get('book_id'))
+        if success:
+            self.publish_book_changed(data.get('book_id'))
         return {'success': success, 'message': '删除成功' if success else '删除失败'}
     
     def handle_get_all_borrows(self, data: dict) -> dict:
@@ -217,6 +677,29 @@ class LibraryServer:
         borrows = self.borrow_model.get_all_borrows(data.get('status'))
         return {'success': True, 'data': borrows}
 
+    def handle_get_all_borrows_page(self, data: dict) -> dict:
+        """分页获取所有借阅记录（管理员）"""
+        page = self.borrow_model.get_all_borrows_page(data.get('status'), data.get('after_id'), data.get('limit'))
+        return {'success': True, 'data': page}
+    
+    def handle_get_borrow(self, data: dict) -> dict:
+        """获取单条借阅记录及书名、借阅人（管理员）"""
+        record = self.borrow_model.get_borrow(data.get('record_id'), details=True)
+        if record:
+            return {'success': True, 'data': record}
+        return {'success': False, 'message': '借阅记录不存在'}
+    
+    def stream_get_all_borrows(self, data: dict):
+        """逐批产出所有借阅记录（流式响应）"""
+        return self.borrow_model.iter_all_borrows(data.get('status'), self._stream_batch_size(data))
+    
+    def _stream_batch_size(self, data: dict) -> int:
+        try:
+            size = int(data.get('batch_size') or STREAM_BATCH_SIZE)
+        except (TypeError, ValueError):
+            size = STREAM_BATCH_SIZE
+        return max(1, min(size, MAX_STREAM_BATCH_SIZE))
+    
     def handle_admin_update_borrow(self, data: dict) -> dict:
         """管理员更新借阅记录"""
         try:
@@ -234,6 +717,10 @@ class LibraryServer:
                 return_date=return_date,
                 fine_amount=fine_amount
             )
+            if success:
+                record = self.borrow_model.get_borrow(record_id)
+                if record:
+                    self.publish_book_changed(record['book_id'])
             return {'success': success, 'message': '更新成功' if success else '更新失败'}
         except Exception as e:
             return {'success': False, 'message': f'更新借阅记录失败: {str(e)}'}
@@ -253,6 +740,11 @@ class LibraryServer:
         users = self.user_model.get_all_users()
         return {'success': True, 'data': users}
     
+    def handle_get_all_users_page(self, data: dict) -> dict:
+        """分页获取用户（管理员）"""
+        page = self.user_model.get_all_users_page(data.get('after_id'), data.get('limit'))
+        return {'success': True, 'data': page}
+    
     def handle_send_email(self, data: dict) -> dict:
         """管理员发送邮件（支持按用户id或直接按邮箱地址）"""
         try:
@@ -264,10 +756,56 @@ class LibraryServer:
             try_send = data.get('try_send', False)
             email_model = EmailModel(self.db)
             success = email_model.send_email(sender_id, recipient_user_id, recipient_email, subject, body, try_send=try_send)
+            if success and recipient_user_id:
+                message = {
+                    'recipient_user_id': recipient_user_id,
+                    'subject': subject,
+                    'body': body,
+                    'created_at': datetime.now(),
+                }
+                self.db.on_commit(lambda: self.publish_event(
+                    TOPIC_EMAILS, EVENT_EMAIL_RECEIVED, message, user_id=recipient_user_id))
             return {'success': success, 'message': '发送成功' if success else '发送失败'}
         except Exception as e:
             return {'success': False, 'message': f'发送邮件失败: {str(e)}'}
 
+    def handle_send_emails(self, data: dict) -> dict:
+        """管理员群发邮件：data['recipients'] 为 [[收件用户ID, 收件邮箱], ...]
+        邮件记录批量保存，data 为与收件人对应的是否保存成功列表
+        """
+        recipients = data.get('recipients')
+        if not isinstance(recipients, list) or not all(
+                isinstance(item, (list, tuple)) and len(item) == 2 for item in recipients):
+            return {'success': False, 'message': 'recipients 必须是 [收件用户ID, 收件邮箱] 的列表'}
+        if len(recipients) > MAX_EMAIL_RECIPIENTS:
+            return {'success': False, 'message': f'单次最多发送给 {MAX_EMAIL_RECIPIENTS} 个收件人'}
+        try:
+            subject = data.get('subject', '')
+            body = data.get('body', '')
+            saved = EmailModel(self.db).send_emails(
+                data.get('sender_id'),
+                [tuple(item) for item in recipients],
+                subject,
+                body,
+                try_send=data.get('try_send', False)
+            )
+        except Exception as e:
+            return {'success': False, 'message': f'发送邮件失败: {str(e)}'}
+        created_at = datetime.now()
+        for (recipient_user_id, _), ok in zip(recipients, saved):
+            if ok and recipient_user_id:
+                message = {
+                    'recipient_user_id': recipient_user_id,
+                    'subject': subject,
+                    'body': body,
+                    'created_at': created_at,
+                }
+                self.db.on_commit(lambda message=message: self.publish_event(
+                    TOPIC_EMAILS, EVENT_EMAIL_RECEIVED, message, user_id=message['recipient_user_id']))
+        count = sum(saved)
+        return {'success': count > 0 or not recipients, 'message': f'已保存 {count}/{len(recipients)} 封邮件',
+                'data': saved}
+
     def handle_get_all_emails(self, data: dict) -> dict:
         """获取所有邮件记录（管理员）"""
         try:
@@ -302,6 +840,9 @@ class LibraryServer:
         if 'age' in data:
             kwargs['age'] = data.get('age')
         success = self.user_model.admin_update_user(**kwargs)
+        if success:
+            # 角色可能改变，已登录的会话重新加载借阅上限
+            self.db.on_commit(lambda: self.invalidate_cache(f"user:{kwargs['user_id']}"))
         return {'success': success, 'message': '更新成功' if success else '更新失败'}
     
     def handle_admin_add_user(self, data: dict) -> dict:
@@ -319,14 +860,17 @@ class LibraryServer:
     
     def handle_admin_delete_user(self, data: dict) -> dict:
         """管理员删除用户"""
-        success = self.user_model.admin_delete_user(data.get('user_id'))
+        user_id = data.get('user_id')
+        success = self.user_model.admin_delete_user(user_id)
         if success:
+            # 已登录的会话在下次请求时因用户不存在而失效
+            self.db.on_commit(lambda: self.invalidate_cache(f'user:{user_id}'))
             return {'success': True, 'message': '删除成功'}
         else:
             return {'success': False, 'message': '删除失败，用户可能不存在或有未归还的图书'}
     
     def handle_import_books_from_openlibrary(self, data: dict) -> dict:
-        """从Open Library导入图书（管理员）"""
+        """提交从Open Library导入图书的后台任务（管理员），立即返回任务ID"""
         try:
             query = data.get('query', 'subject:fiction')
             target_count = data.get('count', 100)
@@ -340,25 +884,50 @@ class LibraryServer:
             delay = max(0.1, min(delay, 5.0))  # 限制在0.1-5.0秒之间
             copies = max(1, min(copies, 100))  # 限制在1-100之间
             
-            importer = OpenLibraryImporter(db=self.db, copies=copies)
-            stored, skipped = importer.import_books(
-                query=query,
-                target_count=target_count,
-                batch_size=batch_size,
-                delay=delay
-            )
-            
+            params = {'query': query, 'batch_size': batch_size, 'delay': delay, 'copies': copies}
+            session = getattr(_CURRENT, 'session', None)
+            created_by = session.user_id if session is not None else data.get('user_id')
+            job_id = self.jobs.submit(JOB_OPENLIBRARY_IMPORT, params, target_count, created_by)
+            if job_id is None:
+                return {'success': False, 'message': '导入任务提交失败'}
             return {
                 'success': True,
-                'message': f'导入完成：成功 {stored} 本，跳过 {skipped} 本',
-                'data': {
-                    'stored': stored,
-                    'skipped': skipped
-                }
+                'message': f'导入任务已提交（任务 {job_id}）',
+                'data': {'job_id': job_id}
             }
         except Exception as e:
             return {'success': False, 'message': f'导入失败: {str(e)}'}
     
+    def _run_import_job(self, ctx) -> str:
+        """执行导入任务；从断点继续时只导入剩余数量"""
+        params = ctx.params
+        done, skipped = ctx.done, ctx.skipped
+        importer = OpenLibraryImporter(db=self.db, copies=params['copies'])
+        stored, new_skipped = importer.import_books(
+            query=params['query'],
+            target_count=ctx.total - done,
+            batch_size=params['batch_size'],
+            delay=params['delay'],
+            start_page=ctx.checkpoint.get('page', 1),
+            progress=lambda s, k, page: ctx.report(done + s, skipped + k, {'page': page}),
+            should_cancel=ctx.cancelled,
+        )
+        ctx.report(done + stored, skipped + new_skipped)
+        self.invalidate_cache(*BOOK_WRITE_TAGS)
+        return f'成功 {ctx.done} 本，跳过 {ctx.skipped} 本'
+    
+    def handle_get_job_status(self, data: dict) -> dict:
+        """查询后台任务的状态与进度（管理员）"""
+        status = self.jobs.status(data.get('job_id'))
+        if status is None:
+            return {'success': False, 'message': '任务不存在'}
+        return {'success': True, 'data': status}
+    
+    def handle_cancel_job(self, data: dict) -> dict:
+        """取消后台任务（管理员）"""
+        success = self.jobs.cancel(data.get('job_id'))
+        return {'success': success, 'message': '已请求取消' if success else '任务不存在或已结束'}
+    
     def handle_get_admin_dashboard_data(self, data: dict) -> dict:
         """管理员可视化数据"""
         try:
@@ -390,88 +959,671 @@ class LibraryServer:
         except Exception as e:
             return {'success': False, 'message': f'用户统计数据获取失败: {str(e)}'}
     
-    def _receive_all_data(self, client_socket, expected_size):
-        """接收指定长度的所有数据"""
-        buffer = b''
-        while len(buffer) < expected_size:
-            chunk = client_socket.recv(expected_size - len(buffer))
-            if not chunk:
-                break
-            buffer += chunk
-        return buffer
-    
-    def _send_data(self, client_socket, data):
-        """发送数据（带长度前缀）"""
-        data_bytes = data.encode('utf-8')
-        length = len(data_bytes)
-        # 先发送4字节的长度（大端序）
-        client_socket.send(struct.pack('>I', length))
-        # 然后发送数据
-        client_socket.send(data_bytes)
-    
-    def handle_client(self, client_socket, client_addr):
-        """处理客户端连接"""
-        print(f"[{client_addr}] 客户端已连接")
+    def busy_payload(self, codec=JSON_CODEC) -> bytes:
+        """队列已满时返回给客户端的繁忙响应"""
+        retry_ms = self.busy_retry_ms
+        return codec.encode({
+            'success': False,
+            'error': 'server_busy',
+            'retry_after_ms': retry_ms,
+            'message': f'服务器繁忙，请 {retry_ms} 毫秒后重试'
+        })
+    
+    def get_scheduler_stats(self) -> dict:
+        """获取工作线程池与请求队列的统计信息"""
+        return self.scheduler.stats()
+    
+    def process_payload(self, payload: bytes, codec=JSON_CODEC, request: Optional[dict] = None,
+                        received_at: Optional[float] = None) -> bytes:
+        """解析一帧请求数据，处理后返回编码好的响应数据
+        线程模式与 asyncio 模式共用此方法；codec 为该连接协商的编码，request 为已在 I/O 线程解码的请求，
+        received_at 为 I/O 线程收到请求的时间（请求截止时间的起点）
+        """
+        start = time.perf_counter()
+        root = self.slow_log.begin(received_at=received_at)
         try:
-            while True:
-                # 先接收4字节的长度
-                length_data = self._receive_all_data(client_socket, 4)
-                if len(length_data) != 4:
-                    break
-                
-                # 解析长度
-                data_length = struct.unpack('>I', length_data)[0]
-                
-                # 接收完整数据
-                data = self._receive_all_data(client_socket, data_length)
-                if len(data) != data_length:
+            if request is None:
+                with span('decode', bytes=len(payload)):
+                    request = self.decode_request(payload, codec)
+            return self.process_request(request, len(payload), codec, start, received_at)
+        finally:
+            self.slow_log.end(root)
+    
+    def classify_frame(self, conn: 'ClientConnection', flags: int, payload: bytes) -> Tuple[str, Optional[dict]]:
+        """在 I/O 线程中确定请求帧的执行通道，返回 (通道, 已解码的请求)
+        解码出的请求交给工作线程，不再重复解码；压缩或较大的请求帧不在 I/O 线程解码，直接归入批量通道
+        """
+        if flags & FLAG_COMPRESSED or len(payload) > CLASSIFY_MAX_BYTES:
+            return LANE_BULK, None
+        request = self.decode_request(payload, conn.codec)
+        if request is None:
+            return LANE_INTERACTIVE, None
+        if request.get('action') == 'batch':
+            return self._batch_lane(request), request
+        entry = self._handlers.get(request.get('action'))
+        return (entry[0].lane if entry is not None else LANE_INTERACTIVE), request
+    
+    def _batch_lane(self, request: dict) -> str:
+        """batch 请求的执行通道：子请求所属通道中最重的一个，全部是交互操作时为交互通道
+        未带令牌时非公开的子请求会被拒绝，不计入（未登录的调用方不能用 batch 占用批量通道）
+        """
+        data = request.get('data')
+        items = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return LANE_INTERACTIVE
+        anonymous = self.require_session and not request.get('token')
+        lane = LANE_INTERACTIVE
+        for item in items:
+            entry = self._handlers.get(item.get('action')) if isinstance(item, dict) else None
+            if entry is None or entry[0].handler == 'handle_batch' or (anonymous and not entry[0].public):
+                # 无效、嵌套的 batch 与会被拒绝的子请求不会执行
+                continue
+            if LANE_ORDER.index(entry[0].lane) > LANE_ORDER.index(lane):
+                lane = entry[0].lane
+                if lane == LANE_BULK:
                     break
-                
+        return lane
+    
+    def decode_request(self, payload: bytes, codec=JSON_CODEC) -> Optional[dict]:
+        """解码请求数据，格式无效时返回 None"""
+        try:
+            request = codec.decode(payload)
+        except ValueError:
+            return None
+        return request if isinstance(request, dict) else None
+    
+    def process_request(self, request: Optional[dict], request_bytes: int, codec, start: float,
+                        received_at: Optional[float] = None) -> bytes:
+        """处理已解码的请求，返回编码好的响应数据并记录指标"""
+        if request is not None:
+            action = request.get('action')
+            annotate(action=action)
+            key = self._coalesce_key(request, codec)
+            if key is None:
+                response = self.handle_request(request, received_at)
+                with span('encode'):
+                    body = codec.encode(response)
+            else:
+                # 相同的请求共用一次执行和同一份编码好的响应（按发起执行的请求的截止时间处理）
+                with span('coalesce') as current:
+                    (response, body), shared = self.flights.do(
+                        key, lambda: self._handle_and_encode(request, codec, received_at), label=action)
+                    current.set(shared=shared)
+        else:
+            response = {'success': False, 'message': '无效的请求格式'}
+            action = None
+            body = codec.encode(response)
+        annotate(success=bool(response.get('success')), response_bytes=len(body))
+        if 'error' in response:
+            annotate(error=response['error'])
+        self._record_metrics(action, time.perf_counter() - start, request_bytes, len(body), response)
+        return body
+    
+    def _coalesce_key(self, request: dict, codec) -> Optional[tuple]:
+        """可以合并执行的请求返回合并键（编码 + 操作名 + 规范化参数），否则返回 None
+        先按会话检查权限并改写 user_id，合并键只取决于实际执行的参数，不同管理员的相同请求也能合并
+        """
+        if not self.coalesce_reads:
+            return None
+        entry = self._handlers.get(request.get('action'))
+        if entry is None or not entry[0].coalesce:
+            return None
+        data = request.get('data', {})
+        if not isinstance(data, dict):
+            return None
+        _, denied = self._authorize(entry[0], request, data)
+        if denied is not None:
+            return None
+        return codec.name, make_key(request['action'], data)
+    
+    def _handle_and_encode(self, request: dict, codec, received_at: Optional[float]) -> Tuple[dict, bytes]:
+        response = self.handle_request(request, received_at)
+        with span('encode'):
+            return response, codec.encode(response)
+    
+    def _record_metrics(self, action, elapsed: float, request_bytes: int,
+                        response_bytes: int, response: dict) -> None:
+        """记录单次请求的延迟、字节数与错误"""
+        entry = self._handlers.get(action)
+        if entry is None:
+            # 未知操作统一归类，避免任意字符串撑大指标表
+            action = '<unknown>'
+        self.metrics.record_request(
+            action,
+            elapsed,
+            request_bytes,
+            response_bytes,
+            success=bool(response.get('success')),
+            error='error' in response,
+            slow=entry is not None and elapsed > entry[0].timeout,
+            expired=response.get('error') == 'deadline_exceeded',
+        )
+    
+    def handle_hello(self, conn: 'ClientConnection', payload: bytes) -> Optional[Tuple[bytes, int]]:
+        """处理连接的第一帧
+        如果是 hello 握手请求，协商协议版本、能力与编码，返回 (响应数据, 协商后的协议版本)；
+        否则返回 None，按普通请求处理
+        """
+        try:
+            request = JSON_CODEC.decode(payload)
+        except ValueError:
+            return None
+        if not isinstance(request, dict) or request.get('action') != HELLO_ACTION:
+            return None
+        data = request.get('data') or {}
+        try:
+            version = PROTOCOL_V2 if int(data.get('protocol', PROTOCOL_V1)) >= PROTOCOL_V2 else PROTOCOL_V1
+        except (TypeError, ValueError):
+            version = PROTOCOL_V1
+        features = sorted(set(data.get('features') or []) & set(SERVER_FEATURES)) if version >= PROTOCOL_V2 else []
+        conn.features = frozenset(features)
+        # 编码按客户端给出的优先顺序选择；旧客户端不带 codecs 时保持 JSON
+        codec_name = choose_codec(data.get('codecs'))
+        # 服务端把扩展类型解码成与 JSON 相同的表示，处理方法不必区分编码
+        conn.codec = get_codec(codec_name, native=False)
+        # 压缩依赖 v2 帧头中的标志位，按服务端配置的优先顺序选择双方都支持的算法
+        compression = None
+        if version >= PROTOCOL_V2:
+            algorithm = choose_compression(data.get('compression'), self.compression)
+            conn.compressor = get_compressor(algorithm)
+            if conn.compressor is not None:
+                compression = {'algorithm': algorithm, 'threshold': self.compression_threshold}
+        body = JSON_CODEC.encode({
+            'success': True,
+            'data': {'protocol': version, 'features': features, 'codec': codec_name,
+                     'compression': compression}
+        })
+        return body, version
+    
+    def compress_frame(self, conn: 'ClientConnection', body: bytes) -> Tuple[bytes, int]:
+        """连接协商了压缩且数据超过阈值时压缩，返回 (发送的数据, 帧标志)
+        压缩后没有变小时按原样发送
+        """
+        compressor = conn.compressor
+        if compressor is None or len(body) < self.compression_threshold:
+            return body, 0
+        start = time.perf_counter()
+        with span('compress', algorithm=compressor.name, bytes=len(body)):
+            compressed = compressor.compress(body, self.compression_level)
+        elapsed = time.perf_counter() - start
+        if len(compressed) >= len(body):
+            self.metrics.record_compression(compressor.name, len(body), len(body), elapsed)
+            return body, 0
+        self.metrics.record_compression(compressor.name, len(body), len(compressed), elapsed)
+        return compressed, FLAG_COMPRESSED
+    
+    def decompress_frame(self, conn: 'ClientConnection', payload: bytes, flags: int) -> Optional[bytes]:
+        """按帧标志解压请求数据，数据无效或解压后超过 max_frame_size 时返回 None"""
+        if not flags & FLAG_COMPRESSED:
+            return payload
+        compressor = conn.compressor
+        if compressor is None:
+            return None
+        start = time.perf_counter()
+        try:
+            raw = compressor.decompress(payload, self.max_frame_size)
+        except ValueError as e:
+            print(f"[{conn.addr}] 请求数据解压失败: {e}")
+            return None
+        self.metrics.record_decompression(compressor.name, len(payload), len(raw),
+                                          time.perf_counter() - start)
+        return raw
+    
+    def _serve_frame(self, conn: 'ClientConnection', request_id: int, flags: int, payload: bytes,
+                     request: Optional[dict] = None, received_at: Optional[float] = None) -> None:
+        """在工作线程中处理一帧请求并回写响应（带回原请求ID），压缩与解压也在工作线程完成
+        request 为 classify_frame 已解码的请求，为 None 时在这里解压并解码；received_at 为收到请求的时间
+        """
+        start = time.perf_counter()
+        root = self.slow_log.begin(received_at=received_at)
+        streamed = False
+        try:
+            if request is None:
+                with span('decode', bytes=len(payload)):
+                    payload = self.decompress_frame(conn, payload, flags)
+                    if payload is not None:
+                        request = self.decode_request(payload, conn.codec)
+            if payload is None:
+                body = conn.codec.encode({'success': False, 'message': '请求数据解压失败'})
+            else:
+                spec = self._stream_spec(conn, request)
+                if spec is not None:
+                    # 流式响应的耗时取决于客户端的读取速度，不计入慢请求
+                    streamed = True
+                    self._serve_stream(conn, request_id, request, spec, len(payload), start, received_at)
+                    return
+                _CURRENT.conn = conn
                 try:
-                    request = json.loads(data.decode('utf-8'))
-                    # 处理请求
-                    response = self.handle_request(request)
-                    # 发送响应（带长度前缀）
-                    response_json = json.dumps(response, default=json_serialize, ensure_ascii=False)
-                    self._send_data(client_socket, response_json)
-                except json.JSONDecodeError:
-                    error_response = json.dumps({
-                        'success': False,
-                        'message': '无效的请求格式'
-                    }, ensure_ascii=False)
-                    self._send_data(client_socket, error_response)
-        except Exception as e:
-            print(f"[{client_addr}] 连接错误: {e}")
+                    body = self.process_request(request, len(payload), conn.codec, start, received_at)
+                finally:
+                    _CURRENT.conn = None
+            body, flags = self.compress_frame(conn, body)
+            with span('send', bytes=len(body)):
+                conn.send_frame(body, request_id, flags)
         finally:
-            client_socket.close()
-            print(f"[{client_addr}] 客户端已断开")
+            self.slow_log.end(root, discard=streamed)
+    
+    def _stream_spec(self, conn: 'ClientConnection', request: Optional[dict]) -> Optional[ActionSpec]:
+        """请求要求流式响应、连接协商了该能力且操作支持时返回操作元数据"""
+        if request is None or not request.get('stream') or FEATURE_STREAMING not in conn.features:
+            return None
+        entry = self._handlers.get(request.get('action'))
+        if entry is None or entry[0].stream is None:
+            return None
+        return entry[0]
+    
+    def _serve_stream(self, conn: 'ClientConnection', request_id: int, request: dict,
+                      spec: ActionSpec, request_bytes: int, start: float,
+                      received_at: Optional[float] = None) -> None:
+        """把数据库游标读出的每一批行作为中间块发出，最后发送带总行数的结束帧
+        发送在工作线程中同步进行，客户端读得慢时服务端随之放慢读取游标，内存占用与结果集大小无关
+        整个流式响应受截止时间限制（请求未带时为 STREAM_MAX_DURATION），每块的发送不超过 STREAM_CHUNK_TIMEOUT；
+        超过时停止读取、关闭游标，结束帧为 deadline_exceeded（发送超时的连接已无法继续使用）
+        """
+        action = request.get('action')
+        data = request.get('data')
+        if not isinstance(data, dict):
+            data = {}
+        deadline = self._request_deadline(request, received_at)
+        if deadline is not None and time.monotonic() >= deadline:
+            denied = DEADLINE_EXCEEDED_RESPONSE
+        else:
+            _, denied = self._authorize(spec, request, data)
+        if denied is not None:
+            body = conn.codec.encode(denied)
+            conn.send_frame(body, request_id)
+            self._record_metrics(action, time.perf_counter() - start, request_bytes, len(body), denied)
+            return
+        if deadline is None:
+            deadline = time.monotonic() + STREAM_MAX_DURATION
+        count = 0
+        sent_bytes = 0
+        expired = False
+        try:
+            with closing(getattr(self, spec.stream)(data)) as batches:
+                for rows in batches:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        expired = True
+                        break
+                    body, flags = self.compress_frame(conn, conn.codec.encode({'data': rows}))
+                    if not conn.send_frame(body, request_id, flags | FLAG_CHUNK,
+                                           timeout=min(STREAM_CHUNK_TIMEOUT, remaining)):
+                        expired = True
+                        break
+                    count += len(rows)
+                    sent_bytes += len(body)
+            if expired:
+                response = dict(DEADLINE_EXCEEDED_RESPONSE, count=count)
+            else:
+                response = {'success': True, 'count': count}
+        except Exception as e:
+            response = {'success': False, 'error': 'internal_error', 'count': count,
+                        'message': f'服务器错误: {str(e)}'}
+        body = conn.codec.encode(response)
+        conn.send_frame(body, request_id, timeout=STREAM_CHUNK_TIMEOUT)
+        self._record_metrics(action, time.perf_counter() - start, request_bytes,
+                             sent_bytes + len(body), response)
+    
+    def open_unix_listener(self) -> Optional[socket.socket]:
+        """返回要监听的 Unix 域套接字，未配置或创建失败时返回 None（只监听 TCP）"""
+        if not self.unix_socket or self.unix_listener is not None:
+            return self.unix_listener
+        if not hasattr(socket, 'AF_UNIX'):
+            print("当前平台不支持 Unix 域套接字，只监听 TCP")
+            return None
+        try:
+            self.unix_listener = create_unix_listener(self.unix_socket)
+        except OSError as e:
+            print(f"监听 Unix 域套接字 {self.unix_socket} 失败: {e}")
+            return None
+        self._owns_unix_listener = True
+        return self.unix_listener
+    
+    def close_unix_listener(self) -> None:
+        """关闭 Unix 域套接字，由本进程创建时同时删除套接字文件"""
+        if self.unix_listener is None:
+            return
+        self.unix_listener.close()
+        if self._owns_unix_listener:
+            try:
+                os.unlink(self.unix_socket)
+            except OSError:
+                pass
+        self.unix_listener = None
+        self._owns_unix_listener = False
+    
+    def listen_address(self) -> str:
+        """启动信息中显示的监听地址"""
+        if self.unix_listener is not None:
+            return f"{self.host}:{self.port} 与 {self.unix_socket}"
+        return f"{self.host}:{self.port}"
+    
+    def _accept_client(self, selector, server_socket) -> None:
+        """接受新连接并注册到 selector"""
+        client_socket, client_addr = server_socket.accept()
+        if client_socket.family == socket.AF_INET or client_socket.family == socket.AF_INET6:
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            # Unix 域套接字的对端地址为空
+            client_addr = f"unix:{self.unix_socket}"
+
+        # 带超时的 socket：读取只在 selector 报告可读时进行，写入由工作线程完成
+        client_socket.settimeout(SEND_TIMEOUT)
+        conn = _SocketConnection(client_socket, client_addr)
+        selector.register(client_socket, selectors.EVENT_READ, conn)
+        print(f"[{client_addr}] 客户端已连接")
+    
+    def _read_client(self, selector, conn: '_SocketConnection') -> None:
+        """读取客户端数据，把完整的请求帧提交给工作线程池"""
+        try:
+            chunk = conn.sock.recv(RECV_BUFFER_SIZE)
+        except (socket.timeout, BlockingIOError):
+            return
+        except OSError as e:
+            print(f"[{conn.addr}] 连接错误: {e}")
+            chunk = b''
+        if not chunk:
+            selector.unregister(conn.sock)
+            conn.close()
+            self.events.unsubscribe(conn)
+            print(f"[{conn.addr}] 客户端已断开")
+            return
+        conn.reader.feed(chunk)
+        received_at = time.monotonic()
+        while True:
+            frame = conn.reader.next_frame()
+            if frame is None:
+                break
+            request_id, flags, payload = frame
+            if conn.handshake_pending:
+                conn.handshake_pending = False
+                hello = self.handle_hello(conn, payload)
+                if hello is not None:
+                    # 握手响应仍按 v1 发送（入队时即按当前版本打包），之后双方切换到协商的版本
+                    body, version = hello
+                    conn.queue_frame(body, self._replies)
+                    conn.version = conn.reader.version = version
+                    continue
+            # v2 连接上的多个请求各自进入所属通道的队列并发处理，响应按完成顺序带请求ID返回
+            lane, request = self.classify_frame(conn, flags, payload)
+            if self.scheduler.submit(self._serve_frame, conn, request_id, flags, payload, request, received_at,
+                                     lane=lane) is None:
+                # 队列已满，立即返回繁忙响应而不是排队等待
+                conn.queue_frame(self.busy_payload(conn.codec), self._replies, request_id)
     
     def start(self):
-        """启动服务器"""
+        """启动服务器
+        一个 I/O 线程通过 selector 管理全部连接，完整的请求帧交给固定数量的工作线程处理
+        """
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # 多个工作进程监听同一端口，由内核分配新连接
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         server_socket.bind((self.host, self.port))
-        server_socket.listen(10)
+        server_socket.listen(SERVER_CONFIG['backlog'])
+        server_socket.setblocking(False)
+        
+        selector = selectors.DefaultSelector()
+        selector.register(server_socket, selectors.EVENT_READ, None)
+        unix_listener = self.open_unix_listener()
+        if unix_listener is not None:
+            unix_listener.setblocking(False)
+            selector.register(unix_listener, selectors.EVENT_READ, None)
+        self.start_services()
         
         self.running = True
-        print(f"图书管理系统服务端已启动，监听 {self.host}:{self.port}")
+        print(f"图书管理系统服务端已启动（{self.scheduler.workers} 个工作线程，"
+              f"队列上限 {self.scheduler.queue_size}），监听 {self.listen_address()}")
         
         try:
             while self.running:
-                client_socket, client_addr = server_socket.accept()
-                client_thread = threading.Thread(
-                    target=self.handle_client,
-                    args=(client_socket, client_addr)
-                )
-                client_thread.daemon = True
-                client_thread.start()
+                for key, _ in selector.select(timeout=1.0):
+                    if key.data is None:
+                        try:
+                            self._accept_client(selector, key.fileobj)
+                        except OSError as e:
+                            print(f"接受连接失败: {e}")
+                    else:
+                        self._read_client(selector, key.data)
         except KeyboardInterrupt:
             print("\n服务端正在关闭...")
         finally:
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    key.data.close()
+            selector.close()
             server_socket.close()
+            self.close_unix_listener()
+            self.stop_services()
             self.running = False
 
-if __name__ == "__main__":
-    server = LibraryServer()
+
+class ClientConnection:
+    """服务端视角的一条客户端连接，保存协商后的协议状态
+    线程模式与 asyncio 模式各自实现 send_frame
+    """
+    
+    def __init__(self, addr):
+        self.addr = addr
+        self.version = PROTOCOL_V1
+        self.features = frozenset()
+        # 协商的消息编码，握手前及旧客户端为 JSON
+        self.codec = JSON_CODEC
+        # 协商的压缩器，未协商时为 None
+        self.compressor = None
+        # 第一帧可能是 hello 握手请求
+        self.handshake_pending = True
+        self.closed = False
+    
+    def send_frame(self, body: bytes, request_id: int = 0, flags: int = 0,
+                   timeout: Optional[float] = None) -> bool:
+        """按当前协议版本发送一帧，可在任意线程调用；timeout 为这一帧最长的发送时间（秒，默认 SEND_TIMEOUT）"""
+        raise NotImplementedError
+
+
+class _SocketConnection(ClientConnection):
+    """线程模式下的一条客户端连接
+    I/O 线程负责读取并切分请求帧，工作线程通过 send_frame 回写响应
+
+    待发送的帧在入队时按当前协议版本打包，按入队顺序由一个线程写出：
+    工作线程调用 send_frame 时若没有其他线程在写就自己写出，否则等到自己的帧写完；
+    I/O 线程调用 queue_frame 只入队，由回写线程池写出，不会因客户端不读数据而阻塞。
+    """
+    
+    def __init__(self, sock: socket.socket, addr):
+        super().__init__(addr)
+        self.sock = sock
+        self.reader = FrameReader()
+        self._cond = threading.Condition()
+        self._pending: deque = deque()
+        # 已入队与已写出（或因连接出错丢弃）的帧序号
+        self._queued = 0
+        self._written = 0
+        self._writing = False
+        self._broken = False
+    
+    def send_frame(self, body: bytes, request_id: int = 0, flags: int = 0,
+                   timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            seq = self._enqueue(body, request_id, flags, timeout)
+            if seq is None:
+                return False
+            if self._writing:
+                if not self._cond.wait_for(lambda: self._written >= seq, timeout):
+                    # 超时仍未轮到：还在队列中就撤回，已开始写出的帧等它写完（受自身的超时限制）
+                    for item in self._pending:
+                        if item[0] == seq:
+                            self._pending.remove(item)
+                            return False
+                    self._cond.wait_for(lambda: self._written >= seq)
+                return not self._broken
+            self._writing = True
+        self._drain()
+        return not self._broken
+    
+    def queue_frame(self, body: bytes, executor: ThreadPoolExecutor, request_id: int = 0, flags: int = 0) -> None:
+        """入队一帧后立即返回（供 I/O 线程使用），没有线程在写时交给 executor 写出"""
+        with self._cond:
+            if self._enqueue(body, request_id, flags, None) is None or self._writing:
+                return
+            self._writing = True
+        try:
+            executor.submit(self._drain)
+        except RuntimeError:
+            # 服务端正在关闭，线程池已停止
+            self._fail()
+    
+    def _enqueue(self, body: bytes, request_id: int, flags: int, timeout: Optional[float]) -> Optional[int]:
+        """调用方持有 _cond；连接已关闭或已出错时返回 None"""
+        if self.closed or self._broken:
+            return None
+        self._queued += 1
+        self._pending.append((self._queued, pack_frame(body, self.version, request_id, flags), timeout))
+        return self._queued
+    
+    def _drain(self) -> None:
+        """依次写出队列中的帧，直到队列为空"""
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._writing = False
+                    return
+                seq, frame, timeout = self._pending.popleft()
+            try:
+                # 只有写线程写入套接字；sendall 的超时是写完整帧的总时间，超时后帧不完整，连接随之关闭
+                self.sock.settimeout(SEND_TIMEOUT if timeout is None else max(timeout, 0.001))
+                self.sock.sendall(frame)
+            except OSError as e:
+                if not self.closed:
+                    print(f"[{self.addr}] 发送失败: {e}")
+                self._fail()
+                return
+            with self._cond:
+                self._written = seq
+                self._cond.notify_all()
+    
+    def _fail(self) -> None:
+        """丢弃未写出的帧并唤醒等待的线程，之后的发送直接失败"""
+        with self._cond:
+            self._broken = True
+            self._pending.clear()
+            self._written = self._queued
+            self._writing = False
+            self._cond.notify_all()
+        # 交给 I/O 线程在下一次读取时发现连接已断开并清理
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def close(self) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+        # 先中断可能正阻塞在 sendall 中的写入，等写线程退出后再关闭，避免套接字在写入中途被释放
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writing, timeout=SEND_TIMEOUT)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """命令行参数解析"""
+    parser = argparse.ArgumentParser(description="图书管理系统服务端")
+    parser.add_argument(
+        "--mode",
+        choices=["threaded", "asyncio"],
+        default=SERVER_CONFIG['mode'],
+        help="服务端运行模式：threaded 使用 selector + 工作线程池，asyncio 使用事件循环，默认取 SERVER_CONFIG。",
+    )
+    parser.add_argument("--host", default=SERVER_CONFIG['host'], help="监听地址。")
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG['port'], help="监听端口。")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SERVER_CONFIG['workers'],
+        help="交互通道（登录、借还书等）的工作线程数，其他通道见 SERVER_CONFIG。",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=SERVER_CONFIG['queue_size'],
+        help="等待处理的请求队列上限，超出时直接返回繁忙响应。",
+    )
+    parser.add_argument(
+        "--compression",
+        nargs="*",
+        default=SERVER_CONFIG['compression'],
+        help="允许的帧压缩算法（按优先顺序，可选 zstd、lz4、zlib），不带值表示关闭压缩。",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=SERVER_CONFIG['compression_level'],
+        help="压缩级别，默认使用算法自身的默认级别。",
+    )
+    parser.add_argument(
+        "--compression-threshold",
+        type=int,
+        default=SERVER_CONFIG['compression_threshold'],
+        help="响应超过该字节数才压缩。",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="response_cache",
+        action="store_false",
+        default=SERVER_CONFIG['response_cache'],
+        help="关闭只读操作的响应缓存（调试时使用）。",
+    )
+    parser.add_argument(
+        "--unix-socket",
+        default=SERVER_CONFIG['unix_socket'],
+        help="同时监听的 Unix 域套接字路径，供同一台机器上的客户端使用。",
+    )
+    parser.add_argument(
+        "--slow-log-ms",
+        type=float,
+        default=SERVER_CONFIG['slow_log_ms'],
+        help="总耗时（含排队）超过该毫秒数的请求连同各阶段耗时与 SQL 写入慢请求日志，负数表示不追踪。",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=SERVER_CONFIG['processes'],
+        help="工作进程数，大于 1 时启用多进程模式（各进程通过 SO_REUSEPORT 监听同一端口，见 prefork.py）。",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """服务端入口"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    options = dict(
+        host=args.host, port=args.port, workers=args.workers, queue_size=args.queue_size,
+        compression=args.compression, compression_level=args.compression_level,
+        compression_threshold=args.compression_threshold, response_cache=args.response_cache,
+        unix_socket=args.unix_socket, slow_log_ms=args.slow_log_ms,
+    )
+    if args.processes > 1:
+        from prefork import PreforkSupervisor
+        PreforkSupervisor(args.processes, args.mode, options).run()
+        return
+    if args.mode == "asyncio":
+        from server_async import AsyncLibraryServer
+        server = AsyncLibraryServer(**options)
+    else:
+        server = LibraryServer(**options)
     server.start()
 
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+图书管理系统服务端 - asyncio 模式
+使用单个事件循环管理所有客户端连接，业务请求交给有界线程池执行。
+协议与线程模式完全一致（见 protocol.py）。
+"""
+import asyncio
+import time
+from typing import Optional
+
+from config import SERVER_CONFIG
+from protocol import PROTOCOL_V2, header_size, pack_frame, unpack_header
+from server import SEND_TIMEOUT, ClientConnection, LibraryServer
+
+
+class _AsyncConnection(ClientConnection):
+    """asyncio 模式下的一条客户端连接"""
+
+    def __init__(self, addr, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop):
+        super().__init__(addr)
+        self.writer = writer
+        self.loop = loop
+        self._write_lock = asyncio.Lock()
+
+    async def send(self, body: bytes, request_id: int = 0, flags: int = 0) -> None:
+        """在事件循环中发送一帧"""
+        async with self._write_lock:
+            self.writer.write(pack_frame(body, self.version, request_id, flags))
+            await self.writer.drain()
+
+    def send_frame(self, body: bytes, request_id: int = 0, flags: int = 0,
+                   timeout: Optional[float] = None) -> bool:
+        """供工作线程调用：把写操作交给事件循环并等待完成"""
+        if self.closed:
+            return False
+        future = asyncio.run_coroutine_threadsafe(self.send(body, request_id, flags), self.loop)
+        try:
+            future.result(SEND_TIMEOUT if timeout is None else timeout)
+            return True
+        except Exception as e:
+            print(f"[{self.addr}] 发送失败: {e}")
+            future.cancel()
+            return False
+
+
+class AsyncLibraryServer(LibraryServer):
+    """基于 asyncio 事件循环的图书管理系统服务端
+
+    空闲连接只占用一个协程和少量缓冲区，不再为每个连接分配线程栈；
+    数据库相关的同步调用与线程模式一样交给有界的 RequestScheduler 执行。
+    """
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """处理单个客户端连接"""
+        # Unix 域套接字的对端地址为空
+        client_addr = writer.get_extra_info('peername') or f"unix:{self.unix_socket}"
+        conn = _AsyncConnection(client_addr, writer, asyncio.get_running_loop())
+        print(f"[{client_addr}] 客户端已连接")
+        try:
+            while True:
+                # 先接收帧头，再接收完整数据
+                header = await reader.readexactly(header_size(conn.version))
+                data_length, request_id, flags = unpack_header(header, conn.version)
+                data = await reader.readexactly(data_length)
+                received_at = time.monotonic()
+
+                if conn.handshake_pending:
+                    conn.handshake_pending = False
+                    hello = self.handle_hello(conn, data)
+                    if hello is not None:
+                        body, version = hello
+                        await conn.send(body)
+                        conn.version = version
+                        continue
+
+                if conn.version >= PROTOCOL_V2:
+                    # 带请求ID的连接：不等待结果，继续读取下一帧，响应由工作线程按完成顺序回写
+                    lane, request = self.classify_frame(conn, flags, data)
+                    if self.scheduler.submit(self._serve_frame, conn, request_id, flags, data, request,
+                                             received_at, lane=lane) is None:
+                        await conn.send(self.busy_payload(conn.codec), request_id)
+                    continue
+
+                # 业务处理可能阻塞（数据库查询），放到工作线程池执行；队列满时直接返回繁忙响应
+                lane, request = self.classify_frame(conn, flags, data)
+                future = self.scheduler.submit(self.process_payload, data, conn.codec, request, received_at,
+                                               lane=lane)
+                if future is None:
+                    response = self.busy_payload(conn.codec)
+                else:
+                    response = await asyncio.wrap_future(future)
+                await conn.send(response)
+        except asyncio.IncompleteReadError:
+            pass
+        except (ConnectionError, OSError) as e:
+            print(f"[{client_addr}] 连接错误: {e}")
+        finally:
+            conn.closed = True
+            self.events.unsubscribe(conn)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            print(f"[{client_addr}] 客户端已断开")
+
+    async def serve(self) -> None:
+        """启动事件循环并持续接受连接"""
+        self.start_services()
+        server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port, backlog=SERVER_CONFIG['backlog'],
+            reuse_port=self.reuse_port or None
+        )
+        unix_server = None
+        unix_listener = self.open_unix_listener()
+        if unix_listener is not None:
+            unix_server = await asyncio.start_unix_server(
+                self.handle_connection, sock=unix_listener, backlog=SERVER_CONFIG['backlog'])
+        self.running = True
+        print(f"图书管理系统服务端已启动（asyncio 模式，{self.scheduler.workers} 个工作线程，"
+              f"队列上限 {self.scheduler.queue_size}），监听 {self.listen_address()}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if unix_server is not None:
+                unix_server.close()
+            self.close_unix_listener()
+            self.running = False
+            self.stop_services()
+
+    def start(self):
+        """启动服务器"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\n服务端正在关闭...")
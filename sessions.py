@@ -0,0 +1,166 @@
+"""
+会话模块
+login 返回会话令牌，之后的请求在请求信封中带上 token，服务端据此确定当前用户，不再信任客户端传来的 user_id。
+
+令牌为 用户ID.过期时间.随机数.签名（HMAC-SHA256），任何持有相同密钥的进程都能校验，
+多进程模式下由监督进程生成密钥传给全部工作进程。
+校验通过的令牌对应的用户上下文（角色、借阅上限）缓存在内存中，
+有过期时间与数量上限（LRU 淘汰），处理请求时不必每次重新查询 users 表。
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_TTL = 8 * 3600
+DEFAULT_MAX_SESSIONS = 10000
+
+
+class Session:
+    """一个已登录用户的上下文"""
+
+    __slots__ = ('token', 'user_id', 'username', 'role', 'max_borrows', 'role_name',
+                 'expires', 'last_seen')
+
+    def __init__(self, token: str, user: Dict[str, Any], expires: float,
+                 max_borrows: int, role_name: str):
+        self.token = token
+        self.user_id = user['id']
+        self.username = user.get('username')
+        self.role = user.get('role', 'user')
+        self.max_borrows = max_borrows
+        self.role_name = role_name
+        self.expires = expires
+        self.last_seen = time.time()
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == 'admin'
+
+
+class SessionStore:
+    """签名令牌 + 内存中的会话缓存，线程安全
+
+    load_user(user_id) 在缓存未命中时加载用户信息，返回 (用户字典, 借阅上限, 角色名称)，
+    用户不存在时返回 None（令牌随之失效）。
+    """
+
+    def __init__(self, load_user: Callable[[int], Optional[tuple]], secret: Optional[str] = None,
+                 ttl: float = DEFAULT_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self._load_user = load_user
+        self._secret = (secret or secrets.token_hex(32)).encode('utf-8')
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # 已注销但尚未过期的令牌 -> 过期时间
+        self._revoked: Dict[str, float] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._rejected = 0
+
+    def create(self, user: Dict[str, Any], max_borrows: int, role_name: str) -> str:
+        """为登录成功的用户签发令牌并缓存其上下文"""
+        expires = int(time.time() + self.ttl)
+        payload = f"{user['id']}.{expires}.{secrets.token_hex(8)}"
+        token = f"{payload}.{self._sign(payload)}"
+        self._store(Session(token, user, expires, max_borrows, role_name))
+        return token
+
+    def get(self, token: Any) -> Optional[Session]:
+        """校验令牌并返回会话；令牌无效、过期、已注销或用户已不存在时返回 None"""
+        if not isinstance(token, str):
+            return None
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None:
+                if session.expires > now:
+                    self._sessions.move_to_end(token)
+                    session.last_seen = now
+                    self._hits += 1
+                    return session
+                del self._sessions[token]
+        with self._lock:
+            user_id, expires = self._verify(token, now)
+            if user_id is None:
+                self._rejected += 1
+                return None
+        # 签名有效但不在本进程缓存中（被淘汰、用户信息已变更或令牌由其他进程签发）
+        loaded = self._load_user(user_id)
+        with self._lock:
+            self._misses += 1
+            if loaded is None:
+                self._rejected += 1
+                return None
+        user, max_borrows, role_name = loaded
+        session = Session(token, user, expires, max_borrows, role_name)
+        self._store(session)
+        return session
+
+    def revoke(self, token: str) -> None:
+        """注销令牌"""
+        now = time.time()
+        with self._lock:
+            for expired in [t for t, e in self._revoked.items() if e <= now]:
+                del self._revoked[expired]
+            session = self._sessions.pop(token, None)
+            _, expires = self._verify(token, now)
+            if expires is not None:
+                self._revoked[token] = expires
+            elif session is not None:
+                self._revoked[token] = session.expires
+
+    def forget_user(self, user_id: int) -> None:
+        """丢弃该用户的缓存上下文（角色变化后），下次请求时重新加载"""
+        with self._lock:
+            for token in [t for t, s in self._sessions.items() if s.user_id == user_id]:
+                del self._sessions[token]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'rejected': self._rejected,
+                'revoked': len(self._revoked),
+            }
+
+    def _store(self, session: Session) -> None:
+        with self._lock:
+            self._sessions[session.token] = session
+            self._sessions.move_to_end(session.token)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evictions += 1
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _verify(self, token: str, now: float):
+        """返回 (用户ID, 过期时间)，令牌无效时返回 (None, None)；调用方需持有锁"""
+        parts = token.split('.')
+        if len(parts) != 4:
+            return None, None
+        payload, signature = '.'.join(parts[:3]), parts[3]
+        if not hmac.compare_digest(self._sign(payload), signature):
+            return None, None
+        try:
+            user_id, expires = int(parts[0]), int(parts[1])
+        except ValueError:
+            return None, None
+        if expires <= now:
+            return None, None
+        revoked = self._revoked.get(token)
+        if revoked is not None:
+            if revoked > now:
+                return None, None
+            self._revoked.pop(token, None)
+        return user_id, expires
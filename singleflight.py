@@ -0,0 +1,86 @@
+"""
+请求合并（singleflight）模块
+同一时刻到达的多个相同只读请求（如图书馆开门时几十个窗口同时加载统计数据）只执行一次，
+其余请求等待并共用这次执行的结果，不再各自重复相同的数据库查询。
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """一次正在进行的执行"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """按键合并并发调用，线程安全
+
+    do(key, fn) 在没有相同键的调用正在执行时执行 fn，否则等待那次执行并返回同一个结果。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executions = 0
+        self._shared = 0
+        self._forgotten = 0
+        # 标签（操作名）-> [执行次数, 合并次数]
+        self._by_label: Dict[str, list] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: Optional[str] = None) -> Tuple[Any, bool]:
+        """返回 (结果, 是否共用了其他请求的执行)；fn 抛出的异常同样传给等待的请求"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+            else:
+                self._shared += 1
+            if label is not None:
+                counts = self._by_label.setdefault(label, [0, 0])
+                counts[0 if leader else 1] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def forget(self) -> None:
+        """之后到达的请求不再加入正在进行的执行（数据已被修改，进行中的执行可能读到旧数据）"""
+        with self._lock:
+            self._forgotten += len(self._calls)
+            self._calls.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._executions + self._shared
+            return {
+                'in_flight': len(self._calls),
+                'executions': self._executions,
+                # 合并掉的请求数，即省下的处理（数据库查询）次数
+                'saved': self._shared,
+                'saved_rate': round(self._shared / total, 4) if total else 0.0,
+                'forgotten': self._forgotten,
+                'actions': {
+                    label: {'executions': counts[0], 'saved': counts[1]}
+                    for label, counts in sorted(self._by_label.items())
+                },
+            }
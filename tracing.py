@@ -0,0 +1,239 @@
+"""
+请求追踪模块
+服务端为每个请求记录一棵跨度（span）树：解码、处理方法、模型方法、每条 SQL 语句、编码、压缩与发送，
+超过阈值的请求连同跨度树与 SQL 文本写入慢请求日志（每行一个 JSON 对象），
+用户反映某个操作慢时可以直接看出时间花在了排队、哪一个模型方法还是哪一条 SQL 上。
+
+追踪状态保存在线程本地变量中，只在服务端工作线程处理请求期间有效；
+没有进行中的追踪时 span() 返回共用的空对象，模型和数据库模块在其他场合（脚本、测试数据生成）调用时几乎没有开销。
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+# 单个请求最多记录的跨度数（如上千个子请求的 batch），超出的只计数
+MAX_SPANS = 500
+# 慢请求日志中 SQL 文本的最大长度
+MAX_SQL_CHARS = 2000
+# get_server_metrics 中保留的最近慢请求条数
+RECENT_SLOW_REQUESTS = 20
+
+_LOCAL = threading.local()
+
+
+class _NullSpan:
+    """没有进行中的追踪时使用的空跨度"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一段计时：名称、起止时间、附加属性与子跨度"""
+
+    __slots__ = ('name', 'start', 'end', 'attrs', 'children', '_trace', '_parent')
+
+    def __init__(self, trace: 'Trace', name: str, parent: Optional['Span'], attrs: Dict[str, Any]):
+        self.name = name
+        self.start = 0.0
+        self.end = 0.0
+        self.attrs = attrs
+        self.children: List[Span] = []
+        self._trace = trace
+        self._parent = parent
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        self._trace.current = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self._trace.current = self._parent
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """转换为日志中的结构：相对请求开始的时间与耗时（毫秒）、属性、子跨度"""
+        item: Dict[str, Any] = {
+            'name': self.name,
+            'at_ms': round((self.start - origin) * 1000, 3),
+            'ms': round(self.duration_ms, 3),
+        }
+        item.update(self.attrs)
+        if 'sql' in item:
+            item['sql'] = _sql_text(item['sql'])
+        if self.children:
+            item['children'] = [child.to_dict(origin) for child in self.children]
+        return item
+
+
+class Trace:
+    """一个请求的跨度树"""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.root = Span(self, name, None, attrs)
+        self.current = self.root
+        self.spans = 0
+        self.dropped = 0
+
+    def child(self, name: str, attrs: Dict[str, Any]):
+        if self.spans >= MAX_SPANS:
+            self.dropped += 1
+            return NULL_SPAN
+        self.spans += 1
+        span = Span(self, name, self.current, attrs)
+        self.current.children.append(span)
+        return span
+
+
+def span(name: str, **attrs):
+    """在当前请求的追踪中开始一个子跨度（with 语句使用）；没有进行中的追踪时返回空跨度"""
+    trace = getattr(_LOCAL, 'trace', None)
+    if trace is None:
+        return NULL_SPAN
+    return trace.child(name, attrs)
+
+
+def annotate(**attrs) -> None:
+    """给当前请求的根跨度添加属性（如操作名、是否成功）"""
+    trace = getattr(_LOCAL, 'trace', None)
+    if trace is not None:
+        trace.root.attrs.update(attrs)
+
+
+def _sql_text(query: str) -> str:
+    """日志中记录的 SQL 文本（合并空白并截断，不含参数）"""
+    text = ' '.join(query.split())
+    return text if len(text) <= MAX_SQL_CHARS else text[:MAX_SQL_CHARS] + '...'
+
+
+def traced(cls):
+    """类装饰器：类中公开方法的调用记录为 '类名.方法名' 跨度（生成器方法除外）"""
+    for name, value in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+            continue
+        setattr(cls, name, _traced_method(f'{cls.__name__}.{name}', value))
+    return cls
+
+
+def _traced_method(label: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_LOCAL, 'trace', None)
+        if trace is None:
+            return func(*args, **kwargs)
+        with trace.child(label, {}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class SlowRequestLog:
+    """为每个请求建立追踪，总耗时（含排队）超过 threshold_ms 的请求写入慢请求日志
+
+    threshold_ms 为 None 或负数时不追踪；path 为 None 时只在内存中保留最近的慢请求。
+    多进程模式下各进程追加写入同一个文件，每条记录带有进程号。
+    """
+
+    def __init__(self, threshold_ms: Optional[float], path: Optional[str] = None,
+                 keep: int = RECENT_SLOW_REQUESTS):
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._lock = threading.Lock()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._traced = 0
+        self._logged = 0
+        self._write_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None and self.threshold_ms >= 0
+
+    def begin(self, name: str = 'request', received_at: Optional[float] = None):
+        """开始追踪一个请求，返回根跨度（已进入计时）；未启用或已在追踪中时返回空跨度
+        received_at 为 I/O 线程收到请求的 time.monotonic()，用于计算排队时间
+        """
+        if not self.enabled or getattr(_LOCAL, 'trace', None) is not None:
+            return NULL_SPAN
+        attrs: Dict[str, Any] = {}
+        if received_at is not None:
+            attrs['queue_ms'] = round((time.monotonic() - received_at) * 1000, 3)
+        trace = Trace(name, attrs)
+        _LOCAL.trace = trace
+        return trace.root.__enter__()
+
+    def end(self, root, discard: bool = False) -> None:
+        """结束 begin() 开始的追踪，超过阈值时写入日志；discard=True 时丢弃（如耗时取决于客户端的流式响应）"""
+        if root is NULL_SPAN:
+            return
+        root.__exit__(None, None, None)
+        trace = root._trace
+        _LOCAL.trace = None
+        if discard:
+            return
+        total_ms = root.duration_ms + root.attrs.get('queue_ms', 0.0)
+        with self._lock:
+            self._traced += 1
+        if total_ms < self.threshold_ms:
+            return
+        record = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'total_ms': round(total_ms, 3),
+            **root.to_dict(root.start),
+        }
+        if trace.dropped:
+            record['dropped_spans'] = trace.dropped
+        summary = {key: record.get(key) for key in ('time', 'action', 'total_ms', 'queue_ms', 'success')}
+        with self._lock:
+            self._logged += 1
+            self._recent.append(summary)
+        self._write(record)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError as e:
+            with self._lock:
+                self._write_errors += 1
+            print(f"写入慢请求日志失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'threshold_ms': self.threshold_ms,
+                'path': self.path,
+                'traced': self._traced,
+                'logged': self._logged,
+                'write_errors': self._write_errors,
+                'recent': list(self._recent),
+            }